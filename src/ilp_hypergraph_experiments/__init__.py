@@ -1,99 +1,105 @@
-from ilp_hypergraph_experiments.ilps.graph import run_model as graph_model
-from ilp_hypergraph_experiments.ilps.hypergraph import run_hyper_model, configure_model
-from ilp_hypergraph_experiments.benchmark import benchmark, mean, var
-from tqdm import tqdm
-import gurobipy as gp
-import time
-import argparse
+from ilp_hypergraph_experiments.instance import Instance, example_instance
+from ilp_hypergraph_experiments.timing import PhaseTimer, Tracer, span
 
+# The models import the solvers, which takes most of the startup time. They are only
+# imported when first used, so light commands like --help start fast.
+_lazy_attributes: dict[str, tuple[str, str]] = {
+    "graph_model": ("ilp_hypergraph_experiments.ilps.graph", "run_model"),
+    "run_hyper_model": (
+        "ilp_hypergraph_experiments.ilps.hypergraph",
+        "run_hyper_model",
+    ),
+    "run_priced_model": ("ilp_hypergraph_experiments.ilps.pricing", "run_priced_model"),
+    "load_scenarios": ("ilp_hypergraph_experiments.ilps.scenarios", "load_scenarios"),
+    "run_scenarios": ("ilp_hypergraph_experiments.ilps.scenarios", "run_scenarios"),
+}
 
-def main_benchmark():
+
+def __getattr__(name: str):
+    if name in _lazy_attributes:
+        import importlib
+
+        module, attribute = _lazy_attributes[name]
+        return getattr(importlib.import_module(module), attribute)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def main_benchmark(instance: Instance | None = None):
     """Entry point for the application script"""
-    n = 10
-    res_graph = benchmark(graph_model, n=n)
-
-    times_hypergraph_gen: list[int] = []
-    times_hypergraph_solve: list[int] = []
-    with gp.Env(empty=True) as env:
-        env.setParam("OutputFlag", 0)
-        env.start()
-        print("Benchmark 'configure_model' and solving it seperatly:")
-        for _ in tqdm(range(n)):
-            with gp.Model(env=env) as m:
-                tic = time.perf_counter()
-                configure_model(m, verbose=False)
-                toc = time.perf_counter()
-                times_hypergraph_gen.append(toc - tic)
-
-                tic = time.perf_counter()
-                m.optimize()
-                toc = time.perf_counter()
-                times_hypergraph_solve.append(toc - tic)
-
-    times_hypergraph_total = list(
-        x + y for x, y in zip(times_hypergraph_gen, times_hypergraph_solve)
-    )
+    from ilp_hypergraph_experiments.benchmark import benchmark_suite, format_results
 
-    print()
-    res_hypergraph_gen = (
-        "Benchmarked function 'configure_model'.\nMean: "
-        + str(mean(times_hypergraph_gen))
-        + ", Variance: "
-        + str(var(times_hypergraph_gen))
-        + ", Range: "
-        + str(min(times_hypergraph_gen))
-        + "-"
-        + str(max(times_hypergraph_gen))
-    )
-    res_hypergraph_solve = (
-        "Benchmarked solving model.\nMean: "
-        + str(mean(times_hypergraph_solve))
-        + ", Variance: "
-        + str(var(times_hypergraph_solve))
-        + ", Range: "
-        + str(min(times_hypergraph_solve))
-        + "-"
-        + str(max(times_hypergraph_solve))
-    )
-    res_hypergraph_total = (
-        "Benchmarked hypergraph combined.\nMean: "
-        + str(mean(times_hypergraph_total))
-        + ", Variance: "
-        + str(var(times_hypergraph_total))
-        + ", Range: "
-        + str(min(times_hypergraph_total))
-        + "-"
-        + str(max(times_hypergraph_total))
+    results = benchmark_suite(
+        [("instance" if instance else "example", instance or example_instance())],
+        n=10,
+        verbose=True,
     )
-    print(res_graph)
-    print(res_hypergraph_gen)
-    print(res_hypergraph_solve)
-    print(res_hypergraph_total)
+    print()
+    print(format_results(results))
+
+
+def _timer(tracer: Tracer | None) -> PhaseTimer | None:
+    # Without a tracer the models skip the timing and counting completely.
+    return PhaseTimer(tracer) if tracer is not None else None
+
 
+def main_run(
+    instance: Instance | None = None,
+    backend="gurobi",
+    prune=True,
+    lazy=False,
+    column_generation=False,
+    tracer: Tracer | None = None,
+    use_cache=True,
+    naming="none",
+):
+    """
+    -@ tracer: Records the phases and counters of both models.
+    -@ use_cache: Read the hyperedges, the built models and their solutions from the
+        disk caches and store them there.
+    -@ naming: How the variables of both models are named. See backends.variable_names.
+    """
+    from ilp_hypergraph_experiments.cache import ModelCache
+    from ilp_hypergraph_experiments.ilps.graph import run_model as graph_model
+    from ilp_hypergraph_experiments.ilps.hypergraph import run_hyper_model
+    from ilp_hypergraph_experiments.ilps.pricing import run_priced_model
 
-def main_run():
-    graph_model(verbose=True)
+    with span(tracer, "graph model"):
+        graph_model(
+            verbose=True,
+            instance=instance,
+            backend=backend,
+            lazy=lazy,
+            timer=_timer(tracer),
+            model_cache=ModelCache() if use_cache else None,
+            naming=naming,
+        )
     print("\n#####################\nCompleted Graph Model\n#####################\n")
-    run_hyper_model(verbose=True)
+    with span(tracer, "hypergraph model"):
+        if column_generation:
+            run_priced_model(
+                verbose=True,
+                instance=instance,
+                backend=backend,
+                timer=_timer(tracer),
+            )
+        else:
+            run_hyper_model(
+                verbose=True,
+                instance=instance,
+                backend=backend,
+                prune=prune,
+                timer=_timer(tracer),
+                use_cache=use_cache,
+                model_cache=ModelCache() if use_cache else None,
+                naming=naming,
+            )
 
 
 def main():
-    parser = argparse.ArgumentParser(
-        description="Experiment to hypergraphs.\nPer default both the graph and hypergraph model will be solved."
-    )
-    parser.add_argument(
-        "--bench",
-        dest="bench",
-        action="store_const",
-        const=True,
-        default=False,
-        help="Run the benchmark instead of solving the model.",
-    )
-    args = parser.parse_args()
-    if args.bench:
-        main_benchmark()
-    else:
-        main_run()
+    """Entry point of the command line. See cli."""
+    from ilp_hypergraph_experiments.cli import main as cli_main
+
+    cli_main()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,3 @@
+from ilp_hypergraph_experiments.cli import main
+
+main()
@@ -1,5 +1,25 @@
-import time
+from ilp_hypergraph_experiments.instance import Instance, example_instance
+from ilp_hypergraph_experiments.generator import generate_instance, instance_file_name
+from ilp_hypergraph_experiments.cache import ModelCache, model_fingerprint
+from ilp_hypergraph_experiments.model_objects import Connection, Hyperedge
+from ilp_hypergraph_experiments.ilps import graph, hypergraph, pricing
+from ilp_hypergraph_experiments.settings import variable_namings
+from ilp_hypergraph_experiments.ilps.reporting import solution_values
+from ilp_hypergraph_experiments.timing import PhaseTimer, Tracer, span
 from tqdm import tqdm
+import gurobipy as gp
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from typing import Any, Callable, Iterable
 
 
 def mean(values):
@@ -22,3 +42,688 @@ def benchmark(func: callable, *func_args, n: int = 10, **func_kwargs):
     m = mean(times)
     variance = var(times)
     return f"Benchmarked function '{func.__name__}'. Mean: {m}, Variance: {variance}, Range: {min(times)}-{max(times)}"
+
+
+# Summary statistics of the timings of a phase.
+statistic_names: tuple[str, ...] = (
+    "runs",
+    "mean",
+    "variance",
+    "median",
+    "p10",
+    "p90",
+    "min",
+    "max",
+)
+# Columns of a benchmark result.
+result_fields: tuple[str, ...] = (
+    "model",
+    "instance",
+    "stations",
+    "trips",
+    "phase",
+) + statistic_names
+
+
+def percentile(values, q: float) -> float:
+    """
+    Percentile with linear interpolation between the closest ranks.
+
+    -@ q: Percentile between 0 and 100.
+    """
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def median(values) -> float:
+    return percentile(values, 50)
+
+
+def summarize(times: list[float]) -> dict[str, float]:
+    return {
+        "runs": len(times),
+        "mean": mean(times),
+        "variance": var(times),
+        "median": median(times),
+        "p10": percentile(times, 10),
+        "p90": percentile(times, 90),
+        "min": min(times),
+        "max": max(times),
+    }
+
+
+def _fresh_instance(instance: Instance) -> Instance:
+    # The connections of an instance are only build once, so each run gets a copy.
+    return Instance.from_dict(instance.to_dict())
+
+
+def _run_cached_model(
+    instance: Instance,
+    env: gp.Env,
+    timer: PhaseTimer,
+    build: Callable[[gp.Model], dict[Connection, gp.Var] | dict[Hyperedge, gp.Var]],
+    model_cache: ModelCache,
+    fingerprint: str,
+    solve=True,
+):
+    """
+    Reads the model from the model cache or builds it and stores it there. Unless the
+    cache has the solution of the model, it is optimized and its solution stored.
+
+    -@ build: Configures a new model and returns its variables by their objects.
+    """
+    with timer.phase("model cache"):
+        path = model_cache.model_path(fingerprint)
+        m = gp.read(path, env=env) if path is not None else None
+    if m is None:
+        m = gp.Model(env=env)
+        variable_map = build(m)
+        with timer.phase("model cache store"):
+            model_cache.store_model(fingerprint, m, instance, list(variable_map))
+    with m:
+        if not solve:
+            return
+        with timer.phase("solution cache"):
+            solution = model_cache.load_solution(fingerprint)
+        if solution is None:
+            with timer.phase("optimize"):
+                m.optimize()
+            if m.Status == gp.GRB.OPTIMAL:
+                model_cache.store_solution(
+                    fingerprint, m.ObjVal, solution_values(m, m.getVars()).tolist()
+                )
+
+
+def run_graph_phases(
+    instance: Instance,
+    env: gp.Env,
+    timer: PhaseTimer,
+    solve=True,
+    lazy=False,
+    model_cache: ModelCache | None = None,
+    naming="objects",
+    **kwargs,
+):
+    """
+    -@ lazy: Add the length and positioning constraints lazily while solving.
+    -@ model_cache: Time reading the model and its solution from this cache once they
+        are stored instead of building and solving it. Not used with lazy or with
+        naming after the objects, which the model files can not hold.
+    -@ naming: How the variables are named. See backends.variable_names.
+    """
+    if model_cache is not None and not lazy and naming != "objects":
+        _run_cached_model(
+            instance,
+            env,
+            timer,
+            lambda m: graph.configure_model(m, instance, timer=timer, naming=naming),
+            model_cache,
+            model_fingerprint(instance, "graph", naming=naming),
+            solve=solve,
+        )
+        return
+    with gp.Model(env=env) as m:
+        variable_map = graph.configure_model(
+            m, instance, timer=timer, lazy=lazy, naming=naming
+        )
+        if solve:
+            with timer.phase("optimize"):
+                if lazy:
+                    graph.optimize_lazy(m, variable_map, instance)
+                else:
+                    m.optimize()
+
+
+def run_hypergraph_phases(
+    instance: Instance,
+    env: gp.Env,
+    timer: PhaseTimer,
+    solve=True,
+    constructive=True,
+    prune=True,
+    stream=False,
+    chunk_size: int | None = None,
+    model_cache: ModelCache | None = None,
+    naming="objects",
+    **kwargs,
+):
+    """
+    -@ constructive: Time the constructive enumeration instead of generating all
+        hyperedges and filtering them.
+    -@ prune: Remove dominated hyperedges before building the model.
+    -@ stream: Generate the hyperedges lazily while building the model, so their
+        generation is timed as part of the phase consuming them.
+    -@ chunk_size: Create the variables in chunks. See hypergraph.configure_model.
+    -@ model_cache: Time reading the model and its solution from this cache once they
+        are stored instead of building and solving it. Not used with naming after the
+        objects, which the model files can not hold.
+    -@ naming: How the variables are named. See backends.variable_names.
+    """
+
+    def build(m: gp.Model) -> dict[Hyperedge, gp.Var]:
+        with timer.phase("connections"):
+            timer.count("connections", len(instance.connections))
+        if stream:
+            hyperedges = hypergraph.stream_hyperedges(instance, constructive)
+        elif constructive:
+            with timer.phase("hyperedge enumeration"):
+                hyperedges = hypergraph.generate_hyperedges_constructive(instance)
+            timer.count("hyperedges generated", len(hyperedges))
+        else:
+            with timer.phase("hyperedge enumeration"):
+                hyperedges = hypergraph.generate_hyperedges(instance)
+            # Times each of the filters as its own phase.
+            hyperedges = hypergraph.filter_hyperedges(hyperedges, instance, timer)
+        return hypergraph.configure_model(
+            m,
+            instance,
+            hyperedges=hyperedges,
+            timer=timer,
+            prune=prune,
+            chunk_size=chunk_size,
+            naming=naming,
+        )
+
+    if model_cache is not None and naming != "objects":
+        _run_cached_model(
+            instance,
+            env,
+            timer,
+            build,
+            model_cache,
+            model_fingerprint(instance, "hypergraph", prune=prune, naming=naming),
+            solve=solve,
+        )
+        return
+    with gp.Model(env=env) as m:
+        build(m)
+        if solve:
+            with timer.phase("optimize"):
+                m.optimize()
+
+
+def run_pricing_phases(
+    instance: Instance,
+    env: gp.Env,
+    timer: PhaseTimer,
+    solve=True,
+    backend="gurobi",
+    **kwargs,
+):
+    """
+    Times the hypergraph model solved by column generation. Without solving only the
+    restricted master problem is build.
+
+    -@ backend: Solver of the master and pricing problems.
+    """
+    if solve:
+        pricing.solve_column_generation(instance, backend=backend, timer=timer)
+        return
+    with timer.phase("master problem"):
+        pricing.ColumnGeneration(instance, backend).close()
+
+
+model_runs: dict[str, callable] = {
+    "graph": run_graph_phases,
+    "hypergraph": run_hypergraph_phases,
+    "pricing": run_pricing_phases,
+}
+
+
+def benchmark_phases(
+    model: str,
+    instance: Instance,
+    env: gp.Env,
+    n: int = 10,
+    warmup: int = 1,
+    verbose=False,
+    tracer: Tracer | None = None,
+    **kwargs,
+) -> dict[str, list[float]]:
+    """
+    Runs the model n times after warmup runs and returns the times of each phase.
+    The phase 'total' is the sum of all phases of a run.
+
+    -@ model: One of model_runs.
+    -@ tracer: Records the phases and counters of the measured runs.
+    -@ kwargs: Passed to the run of the model.
+    """
+    run = model_runs[model]
+    for _ in range(warmup):
+        run(_fresh_instance(instance), env, PhaseTimer(), **kwargs)
+    times: dict[str, list[float]] = {}
+    for i in tqdm(range(n), disable=not verbose):
+        timer = PhaseTimer(tracer)
+        with span(tracer, f"{model} run {i}"):
+            run(_fresh_instance(instance), env, timer, **kwargs)
+        timer.times["total"] = sum(timer.times.values())
+        for name, t in timer.times.items():
+            times.setdefault(name, []).append(t)
+    return times
+
+
+def benchmark_suite(
+    instances: Iterable[tuple[str, Instance]],
+    models: Iterable[str] = ("graph", "hypergraph"),
+    n: int = 10,
+    warmup: int = 1,
+    verbose=False,
+    tracer: Tracer | None = None,
+    **kwargs,
+) -> list[dict[str, Any]]:
+    """
+    Benchmarks the phases of each model on each instance.
+    Returns one result with the fields result_fields per model, instance and phase.
+
+    -@ instances: Pairs of the name of an instance and the instance.
+    -@ tracer: Records the phases and counters of the measured runs.
+    """
+    results: list[dict[str, Any]] = []
+    with gp.Env(empty=True) as env:
+        env.setParam("OutputFlag", 0)
+        env.start()
+        for name, instance in instances:
+            for model in models:
+                if verbose:
+                    print(f"Benchmark {model} model on '{name}'")
+                with span(tracer, f"{model} on {name}"):
+                    times = benchmark_phases(
+                        model,
+                        instance,
+                        env,
+                        n=n,
+                        warmup=warmup,
+                        verbose=verbose,
+                        tracer=tracer,
+                        **kwargs,
+                    )
+                for phase_name, phase_times in times.items():
+                    results.append(
+                        {
+                            "model": model,
+                            "instance": name,
+                            "stations": len(instance.stations),
+                            "trips": len(instance.timetable_trips),
+                            "phase": phase_name,
+                            **summarize(phase_times),
+                        }
+                    )
+    return results
+
+
+def object_memory(instance: Instance | None = None) -> dict[str, float]:
+    """
+    Micro-benchmark of the model objects. Measures the memory per connection and per
+    hyperedge of the instance and the time of the membership queries of the filters and
+    constraints of the hypergraph model on all hyperedges.
+    """
+    instance = _fresh_instance(instance or example_instance())
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        connections = instance.connections
+        built_connections = tracemalloc.get_traced_memory()[0]
+        hyperedges = hypergraph.generate_hyperedges_constructive(instance)
+        built_hyperedges = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    tic = time.perf_counter()
+    for h in hyperedges:
+        hypergraph.filter_invalid_timetable_trip(h, instance)
+    toc = time.perf_counter()
+    for station in instance.stations:
+        for h in hyperedges:
+            h.comes_from_station(station)
+    queried = time.perf_counter()
+    return {
+        "connections": len(connections),
+        "bytes per connection": (built_connections - start) / len(connections),
+        "hyperedges": len(hyperedges),
+        "bytes per hyperedge": (built_hyperedges - built_connections) / len(hyperedges),
+        "trip queries": toc - tic,
+        "station queries": queried - toc,
+    }
+
+
+def _run_command(command: Iterable[str]) -> list[str]:
+    return [sys.executable, "-m", "ilp_hypergraph_experiments", *command]
+
+
+def cold_start(
+    commands: Iterable[Iterable[str]] | None = None, n: int = 5
+) -> list[dict[str, Any]]:
+    """
+    Measures the wall time of running light subcommands of the command line in a new
+    interpreter and which of the heavy modules they import.
+
+    -@ commands: Arguments of the subcommands. Per default cli.light_commands.
+    -@ n: Measured runs of each subcommand.
+    """
+    from ilp_hypergraph_experiments import cli
+
+    results: list[dict[str, Any]] = []
+    for command in commands or cli.light_commands:
+        command = list(command)
+        times: list[float] = []
+        for _ in range(n):
+            tic = time.perf_counter()
+            subprocess.run(_run_command(command), check=True, capture_output=True)
+            times.append(time.perf_counter() - tic)
+        imported = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys\n"
+                "from ilp_hypergraph_experiments import cli\n"
+                "try:\n"
+                f"    cli.main({command!r})\n"
+                "except SystemExit:\n"
+                "    pass\n"
+                "print(' '.join(m for m in cli.heavy_modules if m in sys.modules), file=sys.stderr)",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stderr.split()
+        results.append(
+            {
+                "command": " ".join(command),
+                "heavy imports": imported,
+                **summarize(times),
+            }
+        )
+    return results
+
+
+def sweep_instances(
+    sizes: Iterable[tuple[int, int]], seed: int = 0, **kwargs
+) -> list[tuple[str, Instance]]:
+    """
+    Synthetic instances for each (number of stations, number of trips).
+
+    -@ kwargs: Passed to generator.generate_instance.
+    """
+    return [
+        (
+            os.path.splitext(
+                instance_file_name(num_stations, num_trips, seed, **kwargs)
+            )[0],
+            Instance.from_dict(
+                generate_instance(num_stations, num_trips, seed=seed, **kwargs)
+            ),
+        )
+        for num_stations, num_trips in sizes
+    ]
+
+
+def write_results(results: list[dict[str, Any]], path: str):
+    """
+    Writes the results as CSV if the path ends with '.csv' and as JSON otherwise.
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=result_fields)
+            writer.writeheader()
+            writer.writerows(results)
+        return
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "python": platform.python_version(),
+                "gurobi": ".".join(map(str, gp.gurobi.version())),
+                "machine": platform.machine(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+def load_results(path: str) -> list[dict[str, Any]]:
+    """
+    Loads results written by write_results as JSON.
+    """
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare_results(
+    results: list[dict[str, Any]],
+    baseline: list[dict[str, Any]],
+    threshold: float = 0.1,
+    min_seconds: float = 0.001,
+) -> list[dict[str, Any]]:
+    """
+    Compares the median times with the ones of the same model, instance and phase of the
+    baseline. Returns the regressions with the baseline median and the ratio.
+
+    -@ threshold: Relative slowdown flagged as regression.
+    -@ min_seconds: Slowdowns smaller than this are noise and never flagged.
+    """
+    base: dict[tuple[str, str, str], float] = dict(
+        ((r["model"], r["instance"], r["phase"]), r["median"]) for r in baseline
+    )
+    regressions: list[dict[str, Any]] = []
+    for result in results:
+        before = base.get((result["model"], result["instance"], result["phase"]))
+        if before is None:
+            continue
+        after: float = result["median"]
+        if after > before * (1 + threshold) and after - before > min_seconds:
+            regressions.append(
+                dict(
+                    result,
+                    baseline_median=before,
+                    ratio=after / before if before else math.inf,
+                )
+            )
+    return regressions
+
+
+def format_results(results: list[dict[str, Any]]) -> str:
+    lines: list[str] = [
+        f"{'model':<11} {'instance':<28} {'phase':<26} {'median':>10} {'p10':>10} {'p90':>10}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r['model']:<11} {r['instance']:<28} {r['phase']:<26} {r['median']:>10.4f} {r['p10']:>10.4f} {r['p90']:>10.4f}"
+        )
+    return "\n".join(lines)
+
+
+def _size(text: str) -> tuple[int, int]:
+    stations, _, trips = text.partition("x")
+    return int(stations), int(trips or 2 * int(stations))
+
+
+def main(argv: list[str] | None = None):
+    """
+    -@ argv: The arguments. Per default the ones of the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the phases of building and solving the models."
+    )
+    parser.add_argument(
+        "--instance",
+        nargs="+",
+        default=[],
+        help="JSON or TOML files of instances. Per default the example instance.",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=_size,
+        nargs="+",
+        default=[],
+        help="Sweep over synthetic instances given as STATIONSxTRIPS, e.g. 10x20.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        choices=list(model_runs),
+        default=["graph", "hypergraph"],
+    )
+    parser.add_argument("-n", type=int, default=10, help="Measured runs.")
+    parser.add_argument("--warmup", type=int, default=1, help="Discarded runs.")
+    parser.add_argument(
+        "--no-solve",
+        dest="solve",
+        action="store_false",
+        help="Only build the models.",
+    )
+    parser.add_argument(
+        "--filter",
+        dest="constructive",
+        action="store_false",
+        help="Time generating all hyperedges and filtering them.",
+    )
+    parser.add_argument(
+        "--no-prune",
+        dest="prune",
+        action="store_false",
+        help="Keep hyperedges dominated by a cheaper one.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Generate the hyperedges lazily while building the hypergraph model.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Create the variables of the hypergraph model in chunks of this size.",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Add the length and positioning constraints of the graph model lazily.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["gurobi", "highs", "auto"],
+        default="gurobi",
+        help="Solver of the column generation of the pricing model.",
+    )
+    parser.add_argument(
+        "--naming",
+        choices=variable_namings,
+        default="objects",
+        help="Name the variables of the graph and hypergraph models after their connections and hyperedges, by their index or not at all.",
+    )
+    parser.add_argument(
+        "--model-cache",
+        action="store_true",
+        help="Read the built graph and hypergraph models and their solutions from the model cache once stored. Needs --naming index or none.",
+    )
+    parser.add_argument("-o", "--output", help="Write the results to JSON or CSV.")
+    parser.add_argument(
+        "--trace",
+        help="Write the phases and counters of the measured runs as Chrome trace JSON.",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Trace the peak memory of each phase. Slows down the runs.",
+    )
+    parser.add_argument(
+        "--cold-start",
+        action="store_true",
+        help="Only measure the startup of the light subcommands of the command line against their budget.",
+    )
+    parser.add_argument(
+        "--object-memory",
+        action="store_true",
+        help="Only measure the memory of the connections and hyperedges and the time of their queries.",
+    )
+    parser.add_argument(
+        "--baseline", help="JSON results to compare the median times against."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown flagged as regression.",
+    )
+    args = parser.parse_args(argv)
+
+    if args.cold_start:
+        from ilp_hypergraph_experiments.cli import cold_start_budget
+
+        over_budget: bool = False
+        for result in cold_start(n=args.n):
+            slow: bool = result["median"] > cold_start_budget
+            over_budget = over_budget or slow or bool(result["heavy imports"])
+            print(
+                f"{result['command']:<10} median {result['median']:.3f}s of budget {cold_start_budget:.3f}s{' (over budget)' if slow else ''}, heavy imports: {', '.join(result['heavy imports']) or 'none'}"
+            )
+        if over_budget:
+            sys.exit(1)
+        return
+
+    instances: list[tuple[str, Instance]] = [
+        (os.path.basename(path), Instance.load(path)) for path in args.instance
+    ]
+    instances.extend(sweep_instances(args.sizes, seed=args.seed, density=args.density))
+    if not instances:
+        instances.append(("example", example_instance()))
+
+    if args.object_memory:
+        for name, instance in instances:
+            result = object_memory(instance)
+            print(
+                f"{name}: {result['bytes per connection']:.0f} bytes per connection, {result['bytes per hyperedge']:.0f} bytes per hyperedge, queries of {result['hyperedges']} hyperedges: trips {result['trip queries']:.3f}s, stations {result['station queries']:.3f}s"
+            )
+        return
+
+    kwargs: dict[str, Any] = {
+        "solve": args.solve,
+        "lazy": args.lazy,
+        "naming": args.naming,
+    }
+    if args.model_cache:
+        kwargs["model_cache"] = ModelCache()
+    if "hypergraph" in args.models:
+        kwargs["constructive"] = args.constructive
+        kwargs["prune"] = args.prune
+        kwargs["stream"] = args.stream
+        kwargs["chunk_size"] = args.chunk_size
+    if "pricing" in args.models:
+        kwargs["backend"] = args.backend
+    tracer = Tracer(memory=args.trace_memory) if args.trace else None
+    results = benchmark_suite(
+        instances,
+        args.models,
+        n=args.n,
+        warmup=args.warmup,
+        verbose=True,
+        tracer=tracer,
+        **kwargs,
+    )
+    print(format_results(results))
+    if args.output:
+        write_results(results, args.output)
+    if tracer is not None:
+        tracer.close()
+        tracer.write(args.trace)
+
+    if args.baseline:
+        regressions = compare_results(
+            results, load_results(args.baseline), threshold=args.threshold
+        )
+        for r in regressions:
+            print(
+                f"Regression: {r['model']} '{r['instance']}' {r['phase']}: {r['baseline_median']:.4f}s -> {r['median']:.4f}s ({r['ratio']:.2f}x)"
+            )
+        if regressions:
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
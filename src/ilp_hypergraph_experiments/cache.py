@@ -0,0 +1,404 @@
+from ilp_hypergraph_experiments.model_objects import Connection, Hyperedge
+from ilp_hypergraph_experiments.instance import Instance
+from ilp_hypergraph_experiments.ilps.reporting import chosen_indices
+import errno
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import warnings
+import numpy as np
+
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Sequence
+
+if TYPE_CHECKING:
+    import gurobipy as gp
+
+# Bump this if the generated hyperedges change for the same instance.
+CACHE_VERSION: int = 1
+# Bump this if the built models change for the same instance and options.
+MODEL_CACHE_VERSION: int = 2
+
+# Directory of the cache. Can be set by the environment variable ILP_HYPERGRAPH_CACHE.
+default_cache_dir: str = os.environ.get(
+    "ILP_HYPERGRAPH_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "ilp_hypergraph_experiments"),
+)
+# Upper bound of the size of all cache entries together in bytes.
+default_max_bytes: int = 1 << 30
+# Prefixes of the entries of all kinds of caches in the cache directory.
+cache_prefixes: tuple[str, ...] = ("hyperedges-", "model-")
+# Prefix of the directories new entries are written to before moving them into place.
+tmp_prefix: str = ".tmp-"
+# Age in seconds after which a temporary directory is left over from a failed write.
+stale_tmp_seconds: float = 3600
+
+
+def canonical_connections(connections: Iterable[Connection]) -> list[Connection]:
+    """
+    Orders connections independent of their iteration order.
+    """
+    return sorted(connections, key=lambda con: (con.key, con.weight))
+
+
+def instance_fingerprint(instance: Instance) -> str:
+    """
+    Hash of everything the generated hyperedges depend on.
+    """
+    h = hashlib.sha256()
+
+    def feed(obj):
+        h.update(repr(obj).encode())
+        h.update(b"\n")
+
+    feed(
+        (
+            "version",
+            CACHE_VERSION,
+            instance.train_types,
+            instance.max_train_len_global,
+        )
+    )
+    for station in instance.stations:
+        feed(
+            (
+                station.name,
+                station.max_train_len,
+                sorted(station.allowed_arrangements),
+            )
+        )
+    for trip in instance.timetable_trips:
+        feed((trip.origin.name, trip.destination.name))
+    for con in canonical_connections(instance.connections):
+        feed((con.key, con.weight))
+    return h.hexdigest()
+
+
+def _npy_writer(array: np.ndarray) -> Callable[[str], None]:
+    return lambda path: np.save(path, array)
+
+
+def _hyperedge_files(
+    connections: Sequence[Connection], hyperedges: Iterable[Hyperedge]
+) -> dict[str, Callable[[str], None]]:
+    """
+    Writers of the CSR style arrays of the hyperedges as ids into connections.
+    """
+    connection_ids: dict[Connection, int] = dict(
+        (con, i) for i, con in enumerate(connections)
+    )
+    indptr: list[int] = [0]
+    arces: list[int] = []
+    inside: list[bool] = []
+    for h in hyperedges:
+        arces.extend(sorted(connection_ids[arc] for arc in h.arces))
+        indptr.append(len(arces))
+        inside.append(h.inside)
+    return {
+        "indptr.npy": _npy_writer(np.array(indptr, dtype=np.int64)),
+        "arces.npy": _npy_writer(np.array(arces, dtype=np.int32)),
+        "inside.npy": _npy_writer(np.array(inside, dtype=np.bool_)),
+    }
+
+
+def _hyperedge(
+    connections: Sequence[Connection],
+    indptr: Sequence[int] | np.ndarray,
+    arces: Sequence[int] | np.ndarray,
+    inside: bool,
+    i: int,
+) -> Hyperedge:
+    return Hyperedge(
+        *(connections[arc] for arc in arces[indptr[i] : indptr[i + 1]]),
+        inside=inside,
+    )
+
+
+class DiskCache(object):
+    """
+    Directory of cache entries sharing one size limit.
+    The least recently used entries of all kinds are evicted when the cache grows above
+    max_bytes. Subclasses store their entries as directories starting with prefix.
+    """
+
+    prefix: str = ""
+
+    def __init__(self, directory: str | None = None, max_bytes: int | None = None):
+        self.directory: str = directory or default_cache_dir
+        self.max_bytes: int = default_max_bytes if max_bytes is None else max_bytes
+
+    def _entry(self, fingerprint: str) -> str:
+        return os.path.join(self.directory, f"{self.prefix}{fingerprint}")
+
+    def _store_entry(self, fingerprint: str, files: dict[str, callable]):
+        """
+        Writes the files of a new entry to a temporary directory and moves it into place.
+
+        -@ files: Name of each file and a function writing it to the given path.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = tempfile.mkdtemp(dir=self.directory, prefix=tmp_prefix)
+        except OSError as e:
+            warnings.warn(f"Can not write to the cache {self.directory}: {e}")
+            return
+        try:
+            for name, write in files.items():
+                write(os.path.join(tmp, name))
+            os.rename(tmp, self._entry(fingerprint))
+        except OSError as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            # Unless another process stored the same entry meanwhile.
+            if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                warnings.warn(f"Can not store the cache entry {fingerprint}: {e}")
+                return
+        self.evict(keep=fingerprint)
+
+    def _load_arrays(
+        self, fingerprint: str, names: Iterable[str]
+    ) -> tuple[np.ndarray, ...] | None:
+        """
+        Loads the arrays of the entry into memory or returns None on a miss.
+        They are small next to the objects decoded from them, so they are not
+        memory-mapped.
+        """
+        entry = self._entry(fingerprint)
+        try:
+            arrays = tuple(
+                np.load(os.path.join(entry, f"{name}.npy")) for name in names
+            )
+            # Mark the entry as recently used.
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        return arrays
+
+    def _entries(self, prefixes: tuple[str, ...]) -> list[tuple[float, int, str]]:
+        """
+        Last use, size and path of the entries with one of the prefixes. Entries removed
+        by another process while listing them are skipped.
+        """
+        entries: list[tuple[float, int, str]] = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if not name.startswith(prefixes):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def evict(self, keep: str | None = None):
+        """
+        Removes the least recently used entries until the cache fits into max_bytes.
+        The temporary directories of writes in progress count to the size, while the
+        ones older than stale_tmp_seconds are left over from failed writes and removed.
+        """
+        stale_before = time.time() - stale_tmp_seconds
+        entries: list[tuple[float, int, str]] = []
+        pending: int = 0
+        for entry in self._entries(cache_prefixes + (tmp_prefix,)):
+            used, size, path = entry
+            if not os.path.basename(path).startswith(tmp_prefix):
+                entries.append(entry)
+            elif used < stale_before:
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                pending += size
+        entries.sort()
+        total: int = pending + sum(size for _, size, _ in entries)
+        keep_entry = self._entry(keep) if keep else None
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep_entry:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """
+        Removes all entries of this kind.
+        """
+        for _, _, path in self._entries((self.prefix,)):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class HyperedgeCache(DiskCache):
+    """
+    Disk cache of generated hyperedges keyed by an instance fingerprint.
+    Each entry stores the hyperedges as CSR style arrays of ids into the canonical
+    connections.
+    """
+
+    prefix: str = "hyperedges-"
+
+    def load_arrays(
+        self, fingerprint: str
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+        """
+        Loads indptr, arces and inside of the entry or returns None on a miss.
+        """
+        return self._load_arrays(fingerprint, ("indptr", "arces", "inside"))
+
+    def load(
+        self, fingerprint: str, connections: Sequence[Connection]
+    ) -> list[Hyperedge] | None:
+        """
+        -@ connections: The canonical connections of the instance.
+        """
+        arrays = self.load_arrays(fingerprint)
+        if arrays is None:
+            return None
+        indptr, arces, inside = arrays
+        bounds: list[int] = indptr.tolist()
+        arces: list[int] = arces.tolist()
+        return [
+            _hyperedge(connections, bounds, arces, h_inside, i)
+            for i, h_inside in enumerate(inside.tolist())
+        ]
+
+    def store(
+        self,
+        fingerprint: str,
+        connections: Sequence[Connection],
+        hyperedges: Iterable[Hyperedge],
+    ):
+        """
+        -@ connections: The canonical connections of the instance.
+        """
+        self._store_entry(fingerprint, _hyperedge_files(connections, hyperedges))
+
+
+def model_fingerprint(instance: Instance, model: str, **options: Any) -> str:
+    """
+    Hash of everything a built model depends on.
+
+    -@ model: Name of the model, e.g. 'graph' or 'hypergraph'.
+    -@ options: Options of building the model, e.g. prune=True.
+    """
+    h = hashlib.sha256()
+    h.update(instance_fingerprint(instance).encode())
+    h.update(repr((MODEL_CACHE_VERSION, model, sorted(options.items()))).encode())
+    return h.hexdigest()
+
+
+class ModelCache(DiskCache):
+    """
+    Disk cache of built Gurobi models keyed by model_fingerprint.
+    Each entry stores the model as compressed MPS file with the connections or
+    hyperedges of its variables as ids into the canonical connections, and once solved
+    its optimal solution. Solutions are decoded by the index of the variables, so the
+    variables need no names.
+    """
+
+    prefix: str = "model-"
+
+    def model_path(self, fingerprint: str) -> str | None:
+        """
+        The path of the MPS file of the model or None on a miss.
+        """
+        entry = self._entry(fingerprint)
+        path = os.path.join(entry, "model.mps.gz")
+        if not os.path.isfile(path):
+            return None
+        # Mark the entry as recently used.
+        os.utime(entry)
+        return path
+
+    def model_objects(
+        self, fingerprint: str, instance: Instance, indices: Iterable[int]
+    ) -> list[Connection | Hyperedge]:
+        """
+        The connections or hyperedges of the variables with the indices. Only these
+        objects are created.
+        """
+        connections = canonical_connections(instance.connections)
+        arrays = self._load_arrays(fingerprint, ("connections",))
+        if arrays is not None:
+            (ids,) = arrays
+            return [connections[ids[i]] for i in indices]
+        arrays = self._load_arrays(fingerprint, ("indptr", "arces", "inside"))
+        if arrays is None:
+            raise RuntimeError(f"The model cache has no model {fingerprint}.")
+        indptr, arces, inside = arrays
+        return [
+            _hyperedge(connections, indptr, arces, bool(inside[i]), i) for i in indices
+        ]
+
+    def store_model(
+        self,
+        fingerprint: str,
+        m: "gp.Model",
+        instance: Instance,
+        objects: Sequence[Connection] | Sequence[Hyperedge],
+    ):
+        """
+        -@ objects: The connections or hyperedges of the variables of m in their order.
+        """
+        import gurobipy as gp
+
+        def write_model(path: str):
+            try:
+                m.write(path)
+            except gp.GurobiError as e:
+                raise OSError(f"Gurobi can not write the model: {e}")
+
+        connections = canonical_connections(instance.connections)
+        files: dict[str, Callable[[str], None]] = {"model.mps.gz": write_model}
+        if objects and isinstance(objects[0], Hyperedge):
+            files.update(_hyperedge_files(connections, objects))
+        else:
+            connection_ids: dict[Connection, int] = dict(
+                (con, i) for i, con in enumerate(connections)
+            )
+            files["connections.npy"] = _npy_writer(
+                np.array([connection_ids[con] for con in objects], dtype=np.int32)
+            )
+        m.update()
+        self._store_entry(fingerprint, files)
+
+    def load_solution(self, fingerprint: str) -> dict[str, Any] | None:
+        """
+        The optimal solution of the model as dict with its objective_value, the values
+        of the variables and the indices of the chosen ones, or None on a miss.
+        See model_objects to decode them.
+        """
+        entry = self._entry(fingerprint)
+        try:
+            with open(os.path.join(entry, "solution.json")) as f:
+                solution: dict[str, Any] = json.load(f)
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        return solution
+
+    def store_solution(
+        self, fingerprint: str, objective_value: float, values: Sequence[float]
+    ):
+        """
+        Stores the optimal solution of a model already in the cache.
+        """
+        entry = self._entry(fingerprint)
+        try:
+            tmp = os.path.join(entry, ".solution.json")
+            with open(tmp, "w") as f:
+                json.dump(
+                    {
+                        "objective_value": objective_value,
+                        "values": list(values),
+                        "chosen": chosen_indices(values),
+                    },
+                    f,
+                )
+            os.replace(tmp, os.path.join(entry, "solution.json"))
+        except OSError:
+            # The model is not cached, so neither is its solution.
+            return
+        self.evict(keep=fingerprint)
@@ -0,0 +1,251 @@
+from ilp_hypergraph_experiments.settings import variable_namings
+import argparse
+
+# Subcommands which must not import the solvers or the models.
+light_commands: tuple[tuple[str, ...], ...] = (("--help",), ("validate",), ("stats",))
+# Modules only the heavy subcommands may import.
+heavy_modules: tuple[str, ...] = ("gurobipy", "highspy", "numpy", "scipy", "tqdm")
+# Upper bound of the median wall time in seconds of starting a light subcommand in a
+# new interpreter. See benchmark.cold_start.
+cold_start_budget: float = 0.25
+
+
+def _load_instance(path: str | None):
+    from ilp_hypergraph_experiments.instance import Instance, example_instance
+
+    return Instance.load(path) if path else example_instance()
+
+
+def solve(args: argparse.Namespace):
+    from ilp_hypergraph_experiments import main_run
+    from ilp_hypergraph_experiments.timing import Tracer
+
+    instance = _load_instance(args.instance)
+    if args.scenarios:
+        from ilp_hypergraph_experiments.ilps.scenarios import (
+            load_scenarios,
+            run_scenarios,
+        )
+
+        run_scenarios(
+            load_scenarios(args.scenarios),
+            verbose=True,
+            instance=instance,
+            backend=args.backend,
+            multi_scenario=args.multi_scenario,
+        )
+        return
+    tracer = Tracer(memory=args.trace_memory) if args.trace else None
+    main_run(
+        instance,
+        backend=args.backend,
+        prune=args.prune,
+        lazy=args.lazy,
+        column_generation=args.column_generation,
+        tracer=tracer,
+        use_cache=args.cache,
+        naming=args.naming,
+    )
+    if tracer is not None:
+        tracer.close()
+        tracer.write(args.trace)
+
+
+def bench(args: argparse.Namespace):
+    from ilp_hypergraph_experiments.benchmark import main as benchmark_main
+
+    benchmark_main(args.arguments)
+
+
+def validate(args: argparse.Namespace):
+    # Test if the instance is configured right.
+    _load_instance(args.instance).validate()
+    print("Configuration looks fine.")
+
+
+def generate_hyperedges(args: argparse.Namespace):
+    from ilp_hypergraph_experiments.ilps.hypergraph import (
+        get_filtered_hyperedges,
+        prune_dominated,
+    )
+
+    hyperedges = get_filtered_hyperedges(
+        _load_instance(args.instance),
+        verbose=True,
+        constructive=args.constructive,
+        use_cache=args.cache,
+        workers=args.workers or None,
+    )
+    if args.prune:
+        hyperedges = prune_dominated(hyperedges, verbose=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write("\n".join(str(h) for h in hyperedges))
+
+
+def stats(args: argparse.Namespace):
+    instance = _load_instance(args.instance)
+    connections = instance.connections
+    inside: int = sum(1 for con in connections if con.inside)
+    print(f"Stations:         {len(instance.stations)}")
+    print(f"Timetable trips:  {len(instance.timetable_trips)}")
+    print(f"Connections:      {len(connections)} ({inside} inside of stations)")
+    print(f"Connection rules: {len(instance.connection_rules)}")
+    print(f"Train types:      {instance.train_types}")
+    print(f"Max train length: {instance.max_train_len_global}")
+    print(
+        f"Arrangements:     {sum(len(s.allowed_arrangements) for s in instance.stations)} allowed over all stations"
+    )
+
+
+def _add_instance(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--instance",
+        dest="instance",
+        default=None,
+        help="JSON or TOML file of the instance. Per default the example instance.",
+    )
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ilp-hypergraph-experiments",
+        description="Experiment to hypergraphs.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    solve_parser = commands.add_parser(
+        "solve", help="Solve the graph and the hypergraph model."
+    )
+    _add_instance(solve_parser)
+    solve_parser.add_argument(
+        "--backend",
+        dest="backend",
+        choices=["gurobi", "highs", "auto"],
+        default="gurobi",
+        help="Solver of the models. 'auto' uses HiGHS if Gurobi is not installed or only has the size-limited license.",
+    )
+    solve_parser.add_argument(
+        "--no-prune",
+        dest="prune",
+        action="store_false",
+        help="Keep hyperedges dominated by a cheaper one in the hypergraph model.",
+    )
+    solve_parser.add_argument(
+        "--lazy",
+        dest="lazy",
+        action="store_true",
+        help="Add the length and positioning constraints of the graph model lazily.",
+    )
+    solve_parser.add_argument(
+        "--column-generation",
+        dest="column_generation",
+        action="store_true",
+        help="Generate the hyperedges of the hypergraph model by pricing instead of enumerating all.",
+    )
+    solve_parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="Neither read the hyperedges, models and solutions from the disk cache nor store them there.",
+    )
+    solve_parser.add_argument(
+        "--naming",
+        dest="naming",
+        choices=variable_namings,
+        default="none",
+        help="Name the variables after their connections and hyperedges, by their index or not at all. The chosen edges are printed either way.",
+    )
+    solve_parser.add_argument(
+        "--trace",
+        dest="trace",
+        default=None,
+        help="Write the phases of building and solving the models and their sizes as Chrome trace JSON.",
+    )
+    solve_parser.add_argument(
+        "--trace-memory",
+        dest="trace_memory",
+        action="store_true",
+        help="Trace the peak memory of each phase. Slows down the models.",
+    )
+    solve_parser.add_argument(
+        "--scenarios",
+        dest="scenarios",
+        default=None,
+        help="JSON file of scenarios of the instance to solve with one shared hypergraph model instead.",
+    )
+    solve_parser.add_argument(
+        "--multi-scenario",
+        dest="multi_scenario",
+        action="store_true",
+        help="Solve all scenarios at once with the multi-scenario optimization of Gurobi.",
+    )
+    solve_parser.set_defaults(run=solve)
+
+    bench_parser = commands.add_parser(
+        "bench",
+        help="Benchmark the phases of the models. Takes the arguments of the benchmark module.",
+        add_help=False,
+    )
+    bench_parser.set_defaults(run=bench)
+
+    validate_parser = commands.add_parser(
+        "validate", help="Check that every timetable trip can be serviced."
+    )
+    _add_instance(validate_parser)
+    validate_parser.set_defaults(run=validate)
+
+    hyperedges_parser = commands.add_parser(
+        "generate-hyperedges", help="Generate the hyperedges of the instance."
+    )
+    _add_instance(hyperedges_parser)
+    hyperedges_parser.add_argument(
+        "--filter",
+        dest="constructive",
+        action="store_false",
+        help="Generate all hyperedges and filter them instead of only the valid ones.",
+    )
+    hyperedges_parser.add_argument(
+        "--no-prune",
+        dest="prune",
+        action="store_false",
+        help="Keep hyperedges dominated by a cheaper one.",
+    )
+    hyperedges_parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="Neither load the hyperedges from the disk cache nor store them there.",
+    )
+    hyperedges_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes generating the hyperedges. 0 uses one per CPU.",
+    )
+    hyperedges_parser.add_argument(
+        "-o", "--output", help="Write the hyperedges as text to this file."
+    )
+    hyperedges_parser.set_defaults(run=generate_hyperedges)
+
+    stats_parser = commands.add_parser("stats", help="Print the size of the instance.")
+    _add_instance(stats_parser)
+    stats_parser.set_defaults(run=stats)
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    """
+    -@ argv: The arguments. Per default the ones of the command line.
+    """
+    cli_parser = parser()
+    # The arguments of bench are parsed by the benchmark itself.
+    args, arguments = cli_parser.parse_known_args(argv)
+    if args.command != "bench" and arguments:
+        cli_parser.error(f"unrecognized arguments: {' '.join(arguments)}")
+    args.arguments = arguments
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+from ilp_hypergraph_experiments.model_objects import (
+    TrainStation,
+    TrainArrangment,
+    Connection,
+    Hyperedge,
+    TimeTableTrip,
+)
+from ilp_hypergraph_experiments.instance import Instance
+from ilp_hypergraph_experiments.settings import max_train_len_global
+import numpy as np
+
+from typing import Iterable, Sequence, Self
+
+connection_dtype: np.dtype = np.dtype(
+    [
+        ("origin", np.int32),
+        ("destination", np.int32),
+        ("arrangement_origin", np.int32),
+        ("arrangement_destination", np.int32),
+        ("weight", np.int64),
+        ("inside", np.bool_),
+    ]
+)
+
+
+def arrangement_id(
+    arrangement: TrainArrangment, max_train_len: int = max_train_len_global
+) -> int:
+    """
+    Packs the train type, orientation and position of an arrangement into one int.
+    """
+    train_type, orientation, position = arrangement
+    return (train_type * 2 + int(orientation)) * max_train_len + position
+
+
+def arrangement_from_id(
+    arrangement: int, max_train_len: int = max_train_len_global
+) -> TrainArrangment:
+    rest, position = divmod(int(arrangement), max_train_len)
+    train_type, orientation = divmod(rest, 2)
+    return (train_type, bool(orientation), position)
+
+
+def arrangement_position(
+    arrangements: np.ndarray, max_train_len: int = max_train_len_global
+) -> np.ndarray:
+    """
+    Vectorised position of arrangement ids.
+    """
+    return arrangements % max_train_len
+
+
+def group_indices(
+    keys: np.ndarray, values: np.ndarray | None = None
+) -> dict[int, np.ndarray]:
+    """
+    Groups the values by their keys. Per default the values are the indices of the keys.
+    The values of a group keep their order.
+    """
+    if values is None:
+        values = np.arange(len(keys))
+    if len(keys) == 0:
+        return {}
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+    starts = np.concatenate(([0], bounds))
+    return dict(zip(sorted_keys[starts].tolist(), np.split(values[order], bounds)))
+
+
+class CompactModel(object):
+    """
+    Array backed representation of the stations, connections and hyperedges of a model.
+    Stations are ids into 'stations' and arrangements are packed by 'arrangement_id'.
+    Connections are a structured array of 'connection_dtype' and hyperedges are CSR style
+    lists of connection ids.
+    The model objects can be recovered with 'connection' and 'hyperedge'.
+    """
+
+    def __init__(
+        self,
+        stations: Sequence[TrainStation],
+        connections: np.ndarray,
+        trips: np.ndarray,
+        hyperedge_indptr: np.ndarray | None = None,
+        hyperedge_arces: np.ndarray | None = None,
+        hyperedge_inside: np.ndarray | None = None,
+        max_train_len: int = max_train_len_global,
+    ):
+        """
+        -@ max_train_len: The maximum length of a train the arrangement ids are packed by.
+        """
+        self.max_train_len: int = max_train_len
+        self.stations: tuple[TrainStation, ...] = tuple(stations)
+        self.station_ids: dict[TrainStation, int] = dict(
+            (station, i) for i, station in enumerate(self.stations)
+        )
+        self.station_max_len: np.ndarray = np.array(
+            [station.max_train_len for station in self.stations], dtype=np.int32
+        )
+        # Allowed arrangements of each station in CSR layout.
+        # The order is the iteration order of 'TrainStation.allowed_arrangements'.
+        allowed: list[list[int]] = [
+            [arrangement_id(arr, max_train_len) for arr in station.allowed_arrangements]
+            for station in self.stations
+        ]
+        self.allowed_indptr: np.ndarray = np.cumsum(
+            [0] + [len(arrs) for arrs in allowed], dtype=np.int64
+        )
+        self.allowed_arrangements: np.ndarray = np.array(
+            [arr for arrs in allowed for arr in arrs], dtype=np.int32
+        )
+
+        self.connections: np.ndarray = connections
+        # Arrangement ids are in range(num_arrangement_ids).
+        self.num_arrangement_ids: int = max(
+            (
+                int(ids.max()) + 1
+                for ids in (
+                    self.allowed_arrangements,
+                    connections["arrangement_origin"],
+                    connections["arrangement_destination"],
+                )
+                if len(ids)
+            ),
+            default=1,
+        )
+        # Pairs (origin, destination) of station ids.
+        self.trips: np.ndarray = trips.reshape(-1, 2)
+
+        if hyperedge_indptr is None:
+            hyperedge_indptr = np.zeros(1, dtype=np.int64)
+            hyperedge_arces = np.zeros(0, dtype=np.int32)
+        self.hyperedge_indptr: np.ndarray = hyperedge_indptr
+        self.hyperedge_arces: np.ndarray = hyperedge_arces
+        # Hyperedge of each entry of 'hyperedge_arces'.
+        self.hyperedge_owner: np.ndarray = np.repeat(
+            np.arange(self.num_hyperedges, dtype=np.int32),
+            np.diff(self.hyperedge_indptr),
+        )
+        self.hyperedge_weight: np.ndarray = np.bincount(
+            self.hyperedge_owner,
+            weights=self.connections["weight"][self.hyperedge_arces],
+            minlength=self.num_hyperedges,
+        ).astype(np.int64)
+        if hyperedge_inside is None:
+            # Same as in 'Hyperedge': inside iff all arces are inside.
+            outside_arces = np.bincount(
+                self.hyperedge_owner,
+                weights=~self.connections["inside"][self.hyperedge_arces],
+                minlength=self.num_hyperedges,
+            )
+            hyperedge_inside = outside_arces == 0
+        self.hyperedge_inside: np.ndarray = hyperedge_inside
+
+    @classmethod
+    def from_objects(
+        cls,
+        stations: Sequence[TrainStation],
+        connections: Iterable[Connection],
+        timetable_trips: Iterable[TimeTableTrip],
+        hyperedges: Iterable[Hyperedge] | None = None,
+        max_train_len: int = max_train_len_global,
+    ) -> Self:
+        """
+        Builds the compact representation of the model objects.
+        Connections and hyperedges keep the order they are given in.
+        """
+        station_ids: dict[TrainStation, int] = dict(
+            (station, i) for i, station in enumerate(stations)
+        )
+        connections = list(connections)
+        compact_connections = np.array(
+            [
+                (
+                    station_ids[con.origin],
+                    station_ids[con.destination],
+                    arrangement_id(con.arrangement_origin, max_train_len),
+                    arrangement_id(con.arrangement_destination, max_train_len),
+                    con.weight,
+                    con.inside,
+                )
+                for con in connections
+            ],
+            dtype=connection_dtype,
+        )
+        trips = np.array(
+            [
+                (station_ids[trip.origin], station_ids[trip.destination])
+                for trip in timetable_trips
+            ],
+            dtype=np.int32,
+        )
+        if hyperedges is None:
+            return cls(
+                stations, compact_connections, trips, max_train_len=max_train_len
+            )
+
+        connection_ids: dict[Connection, int] = dict(
+            (con, i) for i, con in enumerate(connections)
+        )
+        indptr: list[int] = [0]
+        arces: list[int] = []
+        inside: list[bool] = []
+        for h in hyperedges:
+            arces.extend(sorted(connection_ids[arc] for arc in h.arces))
+            indptr.append(len(arces))
+            inside.append(h.inside)
+        return cls(
+            stations,
+            compact_connections,
+            trips,
+            hyperedge_indptr=np.array(indptr, dtype=np.int64),
+            hyperedge_arces=np.array(arces, dtype=np.int32),
+            hyperedge_inside=np.array(inside, dtype=np.bool_),
+            max_train_len=max_train_len,
+        )
+
+    @classmethod
+    def from_instance(
+        cls,
+        instance: Instance,
+        connections: Iterable[Connection] | None = None,
+        hyperedges: Iterable[Hyperedge] | None = None,
+    ) -> Self:
+        """
+        -@ connections: The connections in the order to use. Per default the ones of the
+            instance.
+        """
+        return cls.from_objects(
+            instance.stations,
+            instance.connections if connections is None else connections,
+            instance.timetable_trips,
+            hyperedges=hyperedges,
+            max_train_len=instance.max_train_len_global,
+        )
+
+    @property
+    def num_connections(self) -> int:
+        return len(self.connections)
+
+    @property
+    def num_hyperedges(self) -> int:
+        return len(self.hyperedge_indptr) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            arr.nbytes
+            for arr in (
+                self.station_max_len,
+                self.allowed_indptr,
+                self.allowed_arrangements,
+                self.connections,
+                self.trips,
+                self.hyperedge_indptr,
+                self.hyperedge_arces,
+                self.hyperedge_owner,
+                self.hyperedge_weight,
+                self.hyperedge_inside,
+            )
+        )
+
+    def allowed_arrangements_of(self, station: int) -> np.ndarray:
+        return self.allowed_arrangements[
+            self.allowed_indptr[station] : self.allowed_indptr[station + 1]
+        ]
+
+    def node_ids(self, stations: np.ndarray, arrangements: np.ndarray) -> np.ndarray:
+        """
+        Combines station and arrangement ids into one id of the (station, arrangement) node.
+        """
+        return stations.astype(np.int64) * self.num_arrangement_ids + arrangements
+
+    def hyperedge_arces_of(self, hyperedge: int) -> np.ndarray:
+        return self.hyperedge_arces[
+            self.hyperedge_indptr[hyperedge] : self.hyperedge_indptr[hyperedge + 1]
+        ]
+
+    def hyperedge_incidence(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Maps a key per connection to the distinct (hyperedge, key) pairs of all hyperedges.
+        Returns the hyperedges and keys sorted by hyperedge.
+        """
+        keys = keys[self.hyperedge_arces].astype(np.int64)
+        span = int(keys.max()) + 1 if len(keys) else 1
+        pairs = np.unique(self.hyperedge_owner.astype(np.int64) * span + keys)
+        return pairs // span, pairs % span
+
+    def connection(self, i: int) -> Connection:
+        """
+        The connection with id i as model object.
+        """
+        con = self.connections[i]
+        return Connection(
+            self.stations[con["origin"]],
+            self.stations[con["destination"]],
+            int(con["weight"]),
+            arrangement_from_id(con["arrangement_origin"], self.max_train_len),
+            arrangement_from_id(con["arrangement_destination"], self.max_train_len),
+            inside=bool(con["inside"]),
+        )
+
+    def hyperedge(self, i: int) -> Hyperedge:
+        """
+        The hyperedge with id i as model object.
+        """
+        return Hyperedge(
+            *(self.connection(arc) for arc in self.hyperedge_arces_of(i)),
+            inside=bool(self.hyperedge_inside[i]),
+        )
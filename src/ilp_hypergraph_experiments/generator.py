@@ -0,0 +1,222 @@
+from ilp_hypergraph_experiments.instance import Instance
+from ilp_hypergraph_experiments.settings import train_types, max_train_len_global
+import argparse
+import hashlib
+import inspect
+import os
+import random
+
+from typing import Any, Iterable
+
+# Connection rules of a station modelled after the stations of the example instance.
+# The rules connect a station with itself.
+station_rules: dict[str, list[dict[str, Any]]] = {
+    # Like station A: direct turns, turnarounds with coupling and deadhead trips.
+    "hub": [
+        {"kind": "direct", "weight": 0, "inside": True},
+        {"kind": "turnaround", "weight": 1, "preserve_position": False, "inside": True},
+        {"kind": "deadhead", "weight": 10, "inside": True},
+    ],
+    # Like stations B and C: trains can be split up.
+    "split_up": [
+        {"kind": "direct", "weight": 0, "preserve_position": False, "inside": True},
+    ],
+    # Like station D: only direct through turns.
+    "direct_only": [
+        {"kind": "direct", "weight": 0, "inside": True},
+    ],
+    # Like station E: direct through turns and turnarounds.
+    "turnaround": [
+        {"kind": "direct", "weight": 0, "inside": True},
+        {"kind": "turnaround", "weight": 0, "inside": True},
+    ],
+}
+
+default_rule_weights: dict[str, float] = {
+    "hub": 0.1,
+    "split_up": 0.3,
+    "direct_only": 0.3,
+    "turnaround": 0.3,
+}
+
+# Number of sampled tours repeating a trip after which no more tours are generated.
+max_failed_tours: int = 100
+# Bump this if generate_instance generates different instances for the same arguments.
+GENERATOR_VERSION: int = 2
+
+
+def generate_instance(
+    num_stations: int,
+    num_trips: int,
+    density: float = 0.3,
+    train_types: int = train_types,
+    max_train_len_global: int = max_train_len_global,
+    rule_weights: dict[str, float] | None = None,
+    distance_range: tuple[int, int] = (5, 30),
+    deadhead_extra_weight: int | None = 10,
+    seed: int = 0,
+) -> dict[str, Any]:
+    """
+    Generates a random instance in the format read by 'Instance.from_dict'.
+    The same arguments always generate the same instance.
+    Trips are generated as closed tours, so the last tour can add one trip more than
+    num_trips. There are fewer trips if the stations can't take more trains or no new
+    tour without a repeated trip is found.
+
+    -@ density: Probability that a station can be reached from another station.
+    -@ rule_weights: Relative frequency of the kinds in 'station_rules'.
+    -@ deadhead_extra_weight: Extra weight of deadhead trips between reachable stations.
+    """
+    if num_stations < 2:
+        raise RuntimeError("An instance needs at least two stations.")
+    rng = random.Random(seed)
+    rule_weights = rule_weights or default_rule_weights
+    kinds: list[str] = sorted(rule_weights)
+    names: list[str] = [f"S{i}" for i in range(num_stations)]
+
+    distance: dict[str, dict[str, int]] = dict((name, {}) for name in names)
+    for origin in names:
+        for dest in names:
+            if origin != dest and rng.random() < density:
+                distance[origin][dest] = rng.randint(*distance_range)
+
+    # Trips are closed tours, so that trains can return to where they started.
+    # The models bound the trains arriving at a station by its maximal train length,
+    # so a station is part of at most max_train_len_global trips.
+    # The hypergraph model services all trips between two stations by one hyperedge,
+    # so each pair of stations has at most one trip.
+    arrivals: dict[str, int] = dict((name, 0) for name in names)
+    trips: list[list[str]] = []
+    failed_tours: int = 0
+    while len(trips) < num_trips and failed_tours < max_failed_tours:
+        free: list[str] = [n for n in names if arrivals[n] < max_train_len_global]
+        if len(free) < 2:
+            break
+        tour_len = rng.randint(2, max(2, min(len(free), num_trips - len(trips))))
+        tour: list[str] = rng.sample(free, tour_len)
+        pairs: list[list[str]] = [
+            [origin, dest] for origin, dest in zip(tour, tour[1:] + tour[:1])
+        ]
+        if any(pair in trips for pair in pairs):
+            failed_tours += 1
+            continue
+        for origin, dest in pairs:
+            # Every trip needs a connection between its stations.
+            distance[origin].setdefault(dest, rng.randint(*distance_range))
+            trips.append([origin, dest])
+            arrivals[dest] += 1
+
+    stations: list[dict[str, Any]] = [
+        {
+            "name": name,
+            "max_train_len": max(arrivals[name], rng.randint(1, max_train_len_global)),
+        }
+        for name in names
+    ]
+
+    connections: list[dict[str, Any]] = []
+    for name in names:
+        kind = rng.choices(kinds, weights=[rule_weights[k] for k in kinds])[0]
+        connections.extend(
+            dict(rule, origin=name, destination=name) for rule in station_rules[kind]
+        )
+
+    return {
+        "settings": {
+            "train_types": train_types,
+            "max_train_len_global": max_train_len_global,
+        },
+        "stations": stations,
+        "timetable_trips": trips,
+        "distance": distance,
+        "connections": connections,
+        "deadhead_extra_weight": deadhead_extra_weight,
+    }
+
+
+def instance_file_name(
+    num_stations: int, num_trips: int, seed: int = 0, **kwargs
+) -> str:
+    """
+    File name of a generated instance. It ends with a hash of all arguments of
+    generate_instance, so instances generated with other settings get other names.
+
+    -@ kwargs: Passed to generate_instance.
+    """
+    arguments = inspect.signature(generate_instance).bind(
+        num_stations, num_trips, seed=seed, **kwargs
+    )
+    arguments.apply_defaults()
+    parameters: dict[str, Any] = dict(arguments.arguments)
+    parameters["rule_weights"] = sorted(
+        (parameters["rule_weights"] or default_rule_weights).items()
+    )
+    parameters["distance_range"] = tuple(parameters["distance_range"])
+    digest = hashlib.sha256(
+        repr((GENERATOR_VERSION, sorted(parameters.items()))).encode()
+    ).hexdigest()[:8]
+    return f"synthetic-s{num_stations}-t{num_trips}-seed{seed}-{digest}.json"
+
+
+def write_instances(
+    directory: str,
+    sizes: Iterable[tuple[int, int]],
+    seed: int = 0,
+    **kwargs,
+) -> list[str]:
+    """
+    Generates an instance for each (number of stations, number of trips) and saves it
+    in the directory. Existing files generated with the same arguments are reused.
+    Returns the paths of the instances.
+
+    -@ kwargs: Passed to generate_instance.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths: list[str] = []
+    for num_stations, num_trips in sizes:
+        path = os.path.join(
+            directory, instance_file_name(num_stations, num_trips, seed, **kwargs)
+        )
+        if not os.path.exists(path):
+            Instance.from_dict(
+                generate_instance(num_stations, num_trips, seed=seed, **kwargs)
+            ).save(path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic rolling stock instances."
+    )
+    parser.add_argument("--stations", type=int, nargs="+", default=[5])
+    parser.add_argument(
+        "--trips",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Number of trips per number of stations. Per default twice the stations.",
+    )
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--train-types", type=int, default=train_types)
+    parser.add_argument("--max-train-len", type=int, default=max_train_len_global)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="instances")
+    args = parser.parse_args()
+
+    trips: list[int] = args.trips or [2 * n for n in args.stations]
+    if len(trips) != len(args.stations):
+        parser.error("Give as many numbers of trips as numbers of stations.")
+    for path in write_instances(
+        args.output,
+        zip(args.stations, trips),
+        seed=args.seed,
+        density=args.density,
+        train_types=args.train_types,
+        max_train_len_global=args.max_train_len,
+    ):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
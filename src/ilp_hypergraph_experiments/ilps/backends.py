@@ -0,0 +1,549 @@
+from ilp_hypergraph_experiments.ilps.matrix import (
+    Row,
+    rows_to_matrix,
+    violated_rows,
+    lazy_callback,
+)
+from ilp_hypergraph_experiments.settings import variable_namings
+from ilp_hypergraph_experiments.timing import PhaseTimer
+from abc import ABC, abstractmethod
+import numpy as np
+import scipy.sparse as sp
+
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Self
+
+if TYPE_CHECKING:
+    import gurobipy as gp
+
+# Status of a solved model independent of the solver.
+OPTIMAL: str = "optimal"
+INFEASIBLE: str = "infeasible"
+TIME_LIMIT: str = "time_limit"
+UNKNOWN: str = "unknown"
+
+# Variables a model needs to be too large for the size-limited license of Gurobi.
+size_limited_variables: int = 2001
+
+
+def variable_name(naming: str, i: int, model_object: Any) -> str:
+    """
+    Name of the variable with index i standing for the model object. Unnamed variables
+    get the empty name.
+
+    -@ naming: One of variable_namings.
+    """
+    if naming == "objects":
+        return str(model_object)
+    if naming == "index":
+        return f"x{i}"
+    if naming == "none":
+        return ""
+    raise RuntimeError(
+        f"Unknown variable naming '{naming}'. Use one of {', '.join(variable_namings)}."
+    )
+
+
+def variable_names(
+    naming: str, num: int, model_object: Callable[[int], Any], start: int = 0
+) -> list[str] | None:
+    """
+    Names of num variables or None to leave them unnamed.
+
+    -@ naming: One of variable_namings.
+    -@ model_object: The object of the variable with an index, only called to name the
+        variables after their objects.
+    -@ start: Index of the first of the variables in the model.
+    """
+    if naming == "none":
+        return None
+    if naming == "index":
+        return [f"x{i}" for i in range(start, start + num)]
+    return [variable_name(naming, start + i, model_object(i)) for i in range(num)]
+
+
+def gurobi_status(m: "gp.Model") -> str:
+    """
+    Status of a solved Gurobi model as one of the statuses above.
+    """
+    import gurobipy as gp
+
+    status: int = m.Status
+    if status == gp.GRB.OPTIMAL:
+        return OPTIMAL
+    if status in (gp.GRB.INFEASIBLE, gp.GRB.INF_OR_UNBD):
+        return INFEASIBLE
+    if status == gp.GRB.TIME_LIMIT:
+        return TIME_LIMIT
+    return UNKNOWN
+
+
+class Backend(ABC):
+    """
+    Interface of the solvers the models are build for.
+    A model has variables, referenced by their index, with a cost in a minimized
+    objective and linear constraints given as rows over these indices.
+    Variables are binary, or continuous between 0 and 1 for the linear relaxation.
+    """
+
+    name: str = ""
+
+    def __init__(self):
+        self.num_variables: int = 0
+        self.num_rows: int = 0
+        self.num_nonzeros: int = 0
+
+    def add_variables(
+        self,
+        objective: np.ndarray,
+        names: list[str] | None = None,
+        columns: sp.csc_matrix | None = None,
+        binary=True,
+    ) -> np.ndarray:
+        """
+        Adds one variable per entry of objective with it as cost.
+        Returns the indices of the new variables, by which solutions are decoded.
+
+        -@ names: Names of the new variables. Per default they are unnamed.
+        -@ columns: Coefficients of the new variables in the existing rows.
+        -@ binary: Binary variables or continuous ones between 0 and 1.
+        """
+        start = self.num_variables
+        if columns is None:
+            columns = sp.csc_matrix((self.num_rows, len(objective)))
+        self.num_variables += len(objective)
+        self.num_nonzeros += columns.nnz
+        self._add_variables(
+            np.asarray(objective, dtype=np.float64), names, columns, binary
+        )
+        return np.arange(start, self.num_variables)
+
+    @abstractmethod
+    def _add_variables(
+        self,
+        objective: np.ndarray,
+        names: list[str] | None,
+        columns: sp.csc_matrix,
+        binary: bool,
+    ): ...
+
+    def add_rows(self, rows: Iterable[Row]):
+        matrix, senses, rhs, names = rows_to_matrix(rows, self.num_variables)
+        self._add_rows(matrix, senses, rhs, names)
+        self.num_rows += matrix.shape[0]
+        self.num_nonzeros += matrix.nnz
+
+    @abstractmethod
+    def _add_rows(
+        self,
+        matrix: sp.csr_matrix,
+        senses: np.ndarray,
+        rhs: np.ndarray,
+        names: list[str],
+    ): ...
+
+    @abstractmethod
+    def set_objective(self, objective: np.ndarray):
+        """
+        Replaces the cost of all variables.
+        """
+
+    @abstractmethod
+    def set_binary(self, binary=True):
+        """
+        Makes all variables binary or relaxes them to continuous ones.
+        """
+
+    @abstractmethod
+    def set_bounds(self, indices: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+        """
+        Changes the bounds of the variables with the indices.
+        """
+
+    @abstractmethod
+    def duals(self) -> np.ndarray:
+        """
+        Dual values of the rows in the solution of a linear program.
+        The reduced cost of a variable is its cost minus its column times the duals.
+        """
+
+    @abstractmethod
+    def set_start(self, values: np.ndarray):
+        """
+        Passes a MIP start with a value per variable. NaN leaves a variable open.
+        """
+
+    @abstractmethod
+    def solve(self, time_limit: float | None = None) -> str:
+        """
+        Solves the model and returns its status.
+        """
+
+    def solve_lazy(self, rows: Iterable[Row], time_limit: float | None = None) -> str:
+        """
+        Solves the model with rows that are only added once a solution violates them.
+        Without callbacks the model is solved again after adding the violated rows,
+        until a solution violates none.
+        """
+        rows = list(rows)
+        matrix, senses, rhs, _ = rows_to_matrix(rows, self.num_variables)
+        added: np.ndarray = np.zeros(len(rows), dtype=np.bool_)
+        while True:
+            status = self.solve(time_limit)
+            if status != OPTIMAL:
+                return status
+            violated = np.flatnonzero(
+                ~added & violated_rows(matrix, senses, rhs, self.values())
+            )
+            if len(violated) == 0:
+                return status
+            added[violated] = True
+            self.add_rows(rows[i] for i in violated.tolist())
+
+    @property
+    @abstractmethod
+    def objective_value(self) -> float: ...
+
+    @abstractmethod
+    def values(self) -> np.ndarray:
+        """
+        Values of all variables in the found solution.
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class GurobiBackend(Backend):
+    name: str = "gurobi"
+
+    def __init__(self, env: "gp.Env | None" = None, verbose=False):
+        """
+        -@ env: Environment of the model. Per default an own one is started.
+        """
+        super().__init__()
+        try:
+            import gurobipy
+        except ImportError:
+            raise RuntimeError(
+                "The Gurobi backend needs gurobipy. Install it with 'pip install gurobipy'."
+            )
+        self._gp = gurobipy
+        self._own_env: gp.Env | None = None
+        if env is None:
+            env = self._own_env = self._gp.Env(empty=True)
+            if not verbose:
+                env.setParam("OutputFlag", 0)
+            env.start()
+        self.env: gp.Env = env
+        self.model: gp.Model = self._gp.Model(env=env)
+        self.variables: list[gp.Var] = []
+        self.constrs: list[gp.Constr] = []
+
+    def read(self, path: str):
+        """
+        Replaces the model by the one of a model file written by Gurobi.
+        """
+        self.model.dispose()
+        self.model = self._gp.read(path, env=self.env)
+        self.variables = self.model.getVars()
+        self.constrs = self.model.getConstrs()
+        self.num_variables = len(self.variables)
+        self.num_rows = self.model.NumConstrs
+        self.num_nonzeros = self.model.NumNZs
+
+    def _add_variables(
+        self,
+        objective: np.ndarray,
+        names: list[str] | None,
+        columns: sp.csc_matrix,
+        binary: bool,
+    ):
+        vtype: str = "B" if binary else "C"
+        if columns.nnz == 0:
+            x: gp.MVar = self.model.addMVar(
+                len(objective),
+                ub=1,
+                vtype=vtype,
+                obj=objective,
+                name=None if names is None else np.array(names),
+            )
+            self.variables.extend(x.tolist())
+            return
+        for i in range(len(objective)):
+            start, end = columns.indptr[i], columns.indptr[i + 1]
+            column = self._gp.Column(
+                columns.data[start:end].tolist(),
+                [self.constrs[j] for j in columns.indices[start:end].tolist()],
+            )
+            self.variables.append(
+                self.model.addVar(
+                    ub=1,
+                    obj=objective[i],
+                    vtype=vtype,
+                    name="" if names is None else names[i],
+                    column=column,
+                )
+            )
+
+    def _add_rows(
+        self,
+        matrix: sp.csr_matrix,
+        senses: np.ndarray,
+        rhs: np.ndarray,
+        names: list[str],
+    ):
+        if not self.variables:
+            # The matrix API needs at least one variable.
+            constrs: list[gp.Constr] = [
+                self.model.addLConstr(self._gp.LinExpr(), sense, row_rhs, name)
+                for sense, row_rhs, name in zip(senses.tolist(), rhs.tolist(), names)
+            ]
+        else:
+            constrs = self.model.addMConstr(
+                matrix, self.variables, senses, rhs
+            ).tolist()
+            self.model.setAttr("ConstrName", constrs, names)
+        self.constrs.extend(constrs)
+
+    def set_objective(self, objective: np.ndarray):
+        self.model.setAttr("Obj", self.variables, np.asarray(objective).tolist())
+
+    def set_binary(self, binary=True):
+        self.model.setAttr(
+            "VType", self.variables, ["B" if binary else "C"] * self.num_variables
+        )
+
+    def set_bounds(self, indices: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+        variables: list[gp.Var] = [self.variables[i] for i in indices]
+        self.model.setAttr("LB", variables, np.asarray(lower).tolist())
+        self.model.setAttr("UB", variables, np.asarray(upper).tolist())
+
+    def duals(self) -> np.ndarray:
+        return np.array(self.model.getAttr("Pi", self.constrs))
+
+    def set_start(self, values: np.ndarray):
+        self.model.setAttr(
+            "Start",
+            self.variables,
+            np.where(np.isnan(values), self._gp.GRB.UNDEFINED, values).tolist(),
+        )
+
+    def solve(self, time_limit: float | None = None) -> str:
+        if time_limit is not None:
+            self.model.Params.TimeLimit = time_limit
+        self.model.optimize()
+        return self._status()
+
+    def solve_lazy(self, rows: Iterable[Row], time_limit: float | None = None) -> str:
+        """
+        Adds the violated rows in a callback whenever Gurobi finds a new incumbent.
+        """
+        if time_limit is not None:
+            self.model.Params.TimeLimit = time_limit
+        self.model.Params.LazyConstraints = 1
+        self.model.optimize(lazy_callback(self.variables, rows))
+        return self._status()
+
+    def _status(self) -> str:
+        return gurobi_status(self.model)
+
+    @property
+    def objective_value(self) -> float:
+        return self.model.ObjVal
+
+    def values(self) -> np.ndarray:
+        return np.array(self.model.getAttr("X", self.variables))
+
+    def close(self):
+        self.model.dispose()
+        if self._own_env is not None:
+            self._own_env.dispose()
+
+
+class HighsBackend(Backend):
+    """
+    Solves the model in process with HiGHS, which needs no license.
+    Variables and rows are passed to HiGHS as sparse arrays.
+    """
+
+    name: str = "highs"
+
+    def __init__(self, verbose=False, threads: int | None = None):
+        """
+        -@ threads: Threads HiGHS may use. Per default its own choice.
+        """
+        super().__init__()
+        try:
+            import highspy
+        except ImportError:
+            raise RuntimeError(
+                "The HiGHS backend needs highspy. Install it with 'pip install highspy'."
+            )
+        self._highspy = highspy
+        self.highs = highspy.Highs()
+        self.highs.setOptionValue("output_flag", verbose)
+        if threads is not None:
+            self.highs.setOptionValue("threads", threads)
+
+    def _add_variables(
+        self,
+        objective: np.ndarray,
+        names: list[str] | None,
+        columns: sp.csc_matrix,
+        binary: bool,
+    ):
+        n = len(objective)
+        start = self.highs.getNumCol()
+        self.highs.addCols(
+            n,
+            objective,
+            np.zeros(n),
+            np.ones(n),
+            columns.nnz,
+            columns.indptr[:-1].astype(np.int32),
+            columns.indices.astype(np.int32),
+            columns.data.astype(np.float64),
+        )
+        if binary:
+            self.highs.changeColsIntegrality(
+                n,
+                np.arange(start, start + n, dtype=np.int32),
+                np.full(n, self._highspy.HighsVarType.kInteger),
+            )
+
+    def _add_rows(
+        self,
+        matrix: sp.csr_matrix,
+        senses: np.ndarray,
+        rhs: np.ndarray,
+        names: list[str],
+    ):
+        inf: float = self.highs.getInfinity()
+        lower = np.where(senses == "<", -inf, rhs)
+        upper = np.where(senses == ">", inf, rhs)
+        self.highs.addRows(
+            matrix.shape[0],
+            lower,
+            upper,
+            matrix.nnz,
+            matrix.indptr[:-1].astype(np.int32),
+            matrix.indices.astype(np.int32),
+            matrix.data,
+        )
+
+    def set_objective(self, objective: np.ndarray):
+        n = self.num_variables
+        self.highs.changeColsCost(
+            n,
+            np.arange(n, dtype=np.int32),
+            np.asarray(objective, dtype=np.float64),
+        )
+
+    def set_binary(self, binary=True):
+        n = self.num_variables
+        var_type = self._highspy.HighsVarType
+        self.highs.changeColsIntegrality(
+            n,
+            np.arange(n, dtype=np.int32),
+            np.full(n, var_type.kInteger if binary else var_type.kContinuous),
+        )
+
+    def set_bounds(self, indices: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+        self.highs.changeColsBounds(
+            len(indices),
+            np.asarray(indices, dtype=np.int32),
+            np.asarray(lower, dtype=np.float64),
+            np.asarray(upper, dtype=np.float64),
+        )
+
+    def duals(self) -> np.ndarray:
+        return np.array(self.highs.getSolution().row_dual)
+
+    def set_start(self, values: np.ndarray):
+        # HiGHS completes a partial solution with a sub-MIP.
+        indices = np.flatnonzero(~np.isnan(values))
+        self.highs.setSolution(len(indices), indices.astype(np.int32), values[indices])
+
+    def solve(self, time_limit: float | None = None) -> str:
+        if time_limit is not None:
+            self.highs.setOptionValue("time_limit", float(time_limit))
+        self.highs.run()
+        status = self.highs.getModelStatus()
+        model_status = self._highspy.HighsModelStatus
+        if status == model_status.kOptimal:
+            return OPTIMAL
+        if status in (model_status.kInfeasible, model_status.kUnboundedOrInfeasible):
+            return INFEASIBLE
+        if status == model_status.kTimeLimit:
+            return TIME_LIMIT
+        return UNKNOWN
+
+    @property
+    def objective_value(self) -> float:
+        return self.highs.getInfo().objective_function_value
+
+    def values(self) -> np.ndarray:
+        return np.array(self.highs.getSolution().col_value)
+
+
+backends: dict[str, type[Backend]] = {
+    GurobiBackend.name: GurobiBackend,
+    HighsBackend.name: HighsBackend,
+}
+
+
+def gurobi_available() -> bool:
+    """
+    Whether Gurobi is installed and licensed for models of any size. The size-limited
+    license of the gurobipy package starts an environment, but fails to optimize models
+    with more than a few thousand variables or constraints.
+    """
+    try:
+        import gurobipy as gp
+    except ImportError:
+        return False
+    try:
+        with gp.Env(params={"OutputFlag": 0}) as env, gp.Model(env=env) as m:
+            m.addVars(size_limited_variables)
+            m.optimize()
+    except gp.GurobiError:
+        return False
+    return True
+
+
+def get_backend(name: str = "auto", verbose=False) -> Backend:
+    """
+    -@ name: One of backends or 'auto', which uses Gurobi if it is available and HiGHS
+        otherwise. See gurobi_available.
+    """
+    if name == "auto":
+        if gurobi_available():
+            return GurobiBackend(verbose=verbose)
+        return HighsBackend(verbose=verbose)
+    if name not in backends:
+        raise RuntimeError(
+            f"Unknown backend '{name}'. Use one of {', '.join(backends)} or auto."
+        )
+    return backends[name](verbose=verbose)
+
+
+def count_model(timer: PhaseTimer | None, m: "gp.Model | Backend"):
+    """
+    Counts the variables, constraints and nonzeros of a Gurobi model or a backend if a
+    timer is given.
+    """
+    if timer is None:
+        return
+    if isinstance(m, Backend):
+        sizes = (m.num_variables, m.num_rows, m.num_nonzeros)
+    else:
+        m.update()
+        sizes = (m.NumVars, m.NumConstrs, m.NumNZs)
+    for name, size in zip(("variables", "constraints", "nonzeros"), sizes):
+        timer.count(f"model {name}", size)
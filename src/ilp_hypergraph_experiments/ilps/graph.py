@@ -1,71 +1,182 @@
-from ilp_hypergraph_experiments.model import connections, stations, timetable_trips
-from ilp_hypergraph_experiments.model_objects import Connection
-from ilp_hypergraph_experiments.settings import max_train_len_global
+from ilp_hypergraph_experiments.instance import Instance, example_instance
+from ilp_hypergraph_experiments.model_objects import (
+    Connection,
+    TrainArrangment,
+    TrainStation,
+)
+from ilp_hypergraph_experiments.compact import (
+    CompactModel,
+    arrangement_position,
+    group_indices,
+)
+from ilp_hypergraph_experiments.ilps.matrix import (
+    EQUAL,
+    GREATER_EQUAL,
+    LESS_EQUAL,
+    Row,
+    add_rows,
+    add_matrix_rows,
+    lazy_callback,
+)
+from ilp_hypergraph_experiments.ilps.backends import (
+    Backend,
+    GurobiBackend,
+    OPTIMAL,
+    count_model,
+    get_backend,
+    variable_name,
+    variable_names,
+)
+from ilp_hypergraph_experiments.ilps.reporting import (
+    chosen_indices,
+    chosen_objects,
+    print_solution,
+)
+from ilp_hypergraph_experiments.cache import ModelCache, model_fingerprint
+from ilp_hypergraph_experiments.timing import PhaseTimer, count, phase
 import gurobipy as gp
+import numpy as np
 import time
 
+from typing import Iterator
 
-def configure_model(m: gp.Model) -> dict[Connection, gp.Var]:
-    variable_map: dict[Connection, gp.Var] = dict(
-        (connection, m.addVar(vtype="B", name=str(connection)))
-        for connection in connections
-    )
+
+def configure_model(
+    m: gp.Model,
+    instance: Instance | None = None,
+    matrix=False,
+    timer: PhaseTimer | None = None,
+    lazy=False,
+    naming="objects",
+) -> dict[Connection, gp.Var]:
+    """
+    -@ instance: The instance to model. Per default the example instance.
+    -@ matrix: Build the same model in bulk with the matrix API.
+    -@ timer: Records the time of each phase of building the model and its size.
+    -@ lazy: Leave out length_train and valid_positioning. Solve the model with
+        optimize_lazy to add them when an incumbent violates them.
+    -@ naming: How the variables are named. See backends.variable_names.
+    """
+    instance = instance or example_instance()
+    with phase(timer, "connections"):
+        cons: list[Connection] = list(instance.connections)
+    count(timer, "connections", len(cons))
+    if matrix:
+        with phase(timer, "compact model"):
+            compact = CompactModel.from_instance(instance, connections=cons)
+        with phase(timer, "matrix model"):
+            variables = configure_compact_model(
+                m,
+                compact,
+                matrix=True,
+                names=variable_names(naming, len(cons), cons.__getitem__),
+                naming=naming,
+                lazy=lazy,
+            )
+        count_model(timer, m)
+        return dict(zip(cons, variables))
+
+    with phase(timer, "variables"):
+        variable_map: dict[Connection, gp.Var] = dict(
+            (connection, m.addVar(vtype="B", name=variable_name(naming, i, connection)))
+            for i, connection in enumerate(cons)
+        )
 
     # Set objective function
-    m.setObjective(
-        gp.quicksum(con.weight * var for con, var in variable_map.items()),
-        gp.GRB.MINIMIZE,
-    )
+    with phase(timer, "objective"):
+        m.setObjective(
+            gp.quicksum(con.weight * var for con, var in variable_map.items()),
+            gp.GRB.MINIMIZE,
+        )
 
     # Add constraints
-    fullfill_timetable_trips(m, variable_map)
-    flow_constraints(m, variable_map)
-    length_train(m, variable_map)
-    valid_positioning(m, variable_map)
+    with phase(timer, "connection index"):
+        index = ConnectionIndex(variable_map)
+    families = [fullfill_timetable_trips, flow_constraints]
+    if not lazy:
+        families.extend((length_train, valid_positioning))
+    for constraints in families:
+        with phase(timer, constraints.__name__):
+            constraints(m, variable_map, instance, index)
+    count_model(timer, m)
 
     return variable_map
 
 
-def fullfill_timetable_trips(m: gp.Model, variable_map: dict[Connection, gp.Var]):
-    # Fullfill timetable trips
-    for trip in timetable_trips:
-        trip_connections = tuple(
-            var
-            for con, var in variable_map.items()
-            if con.origin == trip.origin and con.destination == trip.destination
+class ConnectionIndex(object):
+    """
+    The variables of the connections grouped by the constraints they appear in.
+    Build in one pass over the connections, keeping their order in each group.
+    """
+
+    def __init__(self, variable_map: dict[Connection, gp.Var]):
+        # Key: (origin, destination)
+        self.by_pair: dict[tuple[TrainStation, TrainStation], list[gp.Var]] = {}
+        # Key: (station, arrangement, inside, into station)
+        self.by_node: dict[
+            tuple[TrainStation, TrainArrangment, bool, bool], list[gp.Var]
+        ] = {}
+        # Connections outside of stations. Key: destination
+        self.into_station: dict[TrainStation, list[gp.Var]] = {}
+        # Connections outside of stations. Key: (destination, origin, origin position)
+        self.by_position: dict[tuple[TrainStation, TrainStation, int], list[gp.Var]] = (
+            {}
         )
+        for con, var in variable_map.items():
+            self.by_pair.setdefault((con.origin, con.destination), []).append(var)
+            self.by_node.setdefault(
+                (con.destination, con.arrangement_destination, con.inside, True), []
+            ).append(var)
+            self.by_node.setdefault(
+                (con.origin, con.arrangement_origin, con.inside, False), []
+            ).append(var)
+            if not con.inside:
+                self.into_station.setdefault(con.destination, []).append(var)
+                self.by_position.setdefault(
+                    (con.destination, con.origin, con.arrangement_origin[2]), []
+                ).append(var)
+
+
+def fullfill_timetable_trips(
+    m: gp.Model,
+    variable_map: dict[Connection, gp.Var],
+    instance: Instance,
+    index: ConnectionIndex | None = None,
+):
+    """
+    -@ index: Index of the variables. Per default build from variable_map.
+    """
+    index = index or ConnectionIndex(variable_map)
+    # Fullfill timetable trips
+    for trip in instance.timetable_trips:
+        trip_connections = index.by_pair.get((trip.origin, trip.destination), ())
         m.addConstr(
             gp.quicksum(trip_connections) >= 1, name="Trips need to be implemented"
         )
 
 
-def flow_constraints(m: gp.Model, variable_map: dict[Connection, gp.Var]):
+def flow_constraints(
+    m: gp.Model,
+    variable_map: dict[Connection, gp.Var],
+    instance: Instance,
+    index: ConnectionIndex | None = None,
+):
+    index = index or ConnectionIndex(variable_map)
     # Flow constraints trainstations
     # Since the arrangements of each station represent the trains coming into and out of the trainstation,
     # we need to differ between edges which only flow inside the station and flow outside the station.
-    for station in stations:
+    for station in instance.stations:
         for arrangement in station.allowed_arrangements:
-            in_edges_outside: list[Connection, ...] = []
-            in_edges_inside: list[Connection, ...] = []
-            out_edges_outside: list[Connection, ...] = []
-            out_edges_inside: list[Connection, ...] = []
-            for con in connections:
-                if con.inside:
-                    if (
-                        con.destination == station
-                        and arrangement == con.arrangement_destination
-                    ):
-                        in_edges_inside.append(variable_map[con])
-                    if con.origin == station and arrangement == con.arrangement_origin:
-                        out_edges_inside.append(variable_map[con])
-                else:
-                    if (
-                        con.destination == station
-                        and arrangement == con.arrangement_destination
-                    ):
-                        in_edges_outside.append(variable_map[con])
-                    if con.origin == station and arrangement == con.arrangement_origin:
-                        out_edges_outside.append(variable_map[con])
+            in_edges_outside = index.by_node.get(
+                (station, arrangement, False, True), ()
+            )
+            in_edges_inside = index.by_node.get((station, arrangement, True, True), ())
+            out_edges_outside = index.by_node.get(
+                (station, arrangement, False, False), ()
+            )
+            out_edges_inside = index.by_node.get(
+                (station, arrangement, True, False), ()
+            )
             m.addConstr(
                 gp.quicksum(in_edges_outside) == gp.quicksum(out_edges_inside),
                 name="Flow constraint into stations",
@@ -77,30 +188,38 @@ def flow_constraints(m: gp.Model, variable_map: dict[Connection, gp.Var]):
             # The constraint inside_in == inside_out is not needed since it is covered by the other two.
 
 
-def length_train(m: gp.Model, variable_map: dict[Connection, gp.Var]):
+def length_train(
+    m: gp.Model,
+    variable_map: dict[Connection, gp.Var],
+    instance: Instance,
+    index: ConnectionIndex | None = None,
+):
+    index = index or ConnectionIndex(variable_map)
     # A train composition should not exced the maximal amount of trains a station can support.
-    for station in stations:
-        edges_into = (
-            var
-            for con, var in variable_map.items()
-            if con.destination == station and not con.inside
-        )
+    for station in instance.stations:
+        edges_into = index.into_station.get(station, ())
         m.addConstr(
             gp.quicksum(edges_into) <= station.max_train_len,
             name="Respect the stations max train length",
         )
 
 
-def valid_positioning(m: gp.Model, variable_map: dict[Connection, gp.Var]):
+def valid_positioning(
+    m: gp.Model,
+    variable_map: dict[Connection, gp.Var],
+    instance: Instance,
+    index: ConnectionIndex | None = None,
+):
+    index = index or ConnectionIndex(variable_map)
     # Ensure positions are valid.
     # 1 >= trains at pos 1 >= trains at pos 2 >= ...
-    for stationA in stations:
-        for stationB in stations:
-            position_map = [[] for _ in range(max_train_len_global)]
-            for con, var in variable_map.items():
-                if con.destination != stationA or con.origin != stationB or con.inside:
-                    continue
-                position_map[con.arrangement_origin[2]].append(var)
+    max_train_len_global: int = instance.max_train_len_global
+    for stationA in instance.stations:
+        for stationB in instance.stations:
+            position_map = [
+                index.by_position.get((stationA, stationB, i), ())
+                for i in range(max_train_len_global)
+            ]
 
             m.addConstr(
                 1 >= gp.quicksum(position_map[0]),
@@ -113,28 +232,283 @@ def valid_positioning(m: gp.Model, variable_map: dict[Connection, gp.Var]):
                 )
 
 
-def run_model(verbose=False):
-    with gp.Env(empty=True) as env:
-        if not verbose:
-            env.setParam("OutputFlag", 0)
-            env.setParam("LogToConsole", 0)
-        env.start()
-        with gp.Model(env=env) as m:
-            variable_map: dict[Connection, gp.Var] = configure_model(m)
+def _compact_rows(compact: CompactModel, lazy=False) -> Iterator[Row]:
+    """
+    The constraints of configure_model as rows over the compact connections.
+    The rows are read from indices grouping the connections.
+
+    -@ lazy: Leave out the rows of _lazy_rows.
+    """
+    cons: np.ndarray = compact.connections
+    num_stations: int = len(compact.stations)
+    no_vars: np.ndarray = np.zeros(0, dtype=np.int64)
+
+    # Fullfill timetable trips
+    by_pair = group_indices(
+        cons["origin"].astype(np.int64) * num_stations + cons["destination"]
+    )
+    for origin, destination in compact.trips.tolist():
+        yield (
+            [(by_pair.get(origin * num_stations + destination, no_vars), 1.0)],
+            GREATER_EQUAL,
+            1,
+            "Trips need to be implemented",
+        )
+
+    # Flow constraints trainstations, keyed by 2 * node + inside
+    out_edges = group_indices(
+        compact.node_ids(cons["origin"], cons["arrangement_origin"]) * 2
+        + cons["inside"]
+    )
+    in_edges = group_indices(
+        compact.node_ids(cons["destination"], cons["arrangement_destination"]) * 2
+        + cons["inside"]
+    )
+    for station in range(num_stations):
+        for arrangement in compact.allowed_arrangements_of(station).tolist():
+            node = int(compact.node_ids(np.int64(station), arrangement))
+            yield (
+                [
+                    (in_edges.get(2 * node, no_vars), 1.0),
+                    (out_edges.get(2 * node + 1, no_vars), -1.0),
+                ],
+                EQUAL,
+                0,
+                "Flow constraint into stations",
+            )
+            yield (
+                [
+                    (in_edges.get(2 * node + 1, no_vars), 1.0),
+                    (out_edges.get(2 * node, no_vars), -1.0),
+                ],
+                EQUAL,
+                0,
+                "Flow constraint out of stations",
+            )
+
+    if not lazy:
+        yield from _lazy_rows(compact)
 
-            tic = time.perf_counter()
-            m.optimize()
-            toc = time.perf_counter()
 
+def _lazy_rows(compact: CompactModel) -> Iterator[Row]:
+    """
+    The rows of length_train and valid_positioning, which can be added lazily.
+    """
+    cons: np.ndarray = compact.connections
+    num_stations: int = len(compact.stations)
+    max_train_len_global: int = compact.max_train_len
+    no_vars: np.ndarray = np.zeros(0, dtype=np.int64)
+
+    outside = np.flatnonzero(~cons["inside"])
+    # Length of trains
+    into_station = group_indices(cons["destination"][outside], outside)
+    for station in range(num_stations):
+        yield (
+            [(into_station.get(station, no_vars), 1.0)],
+            LESS_EQUAL,
+            int(compact.station_max_len[station]),
+            "Respect the stations max train length",
+        )
+
+    # Valid positioning, keyed by (destination, origin, position)
+    position_map = group_indices(
+        (
+            cons["destination"][outside].astype(np.int64) * num_stations
+            + cons["origin"][outside]
+        )
+        * max_train_len_global
+        + arrangement_position(
+            cons["arrangement_origin"][outside], max_train_len_global
+        ),
+        outside,
+    )
+    for pair in range(num_stations * num_stations):
+        key = pair * max_train_len_global
+        yield (
+            [(position_map.get(key, no_vars), 1.0)],
+            LESS_EQUAL,
+            1,
+            "Only one train can be at possition one",
+        )
+        for i in range(max_train_len_global - 1):
+            yield (
+                [
+                    (position_map.get(key + i, no_vars), 1.0),
+                    (position_map.get(key + i + 1, no_vars), -1.0),
+                ],
+                GREATER_EQUAL,
+                0,
+                f"Need at least as many trains at position {i + 1} as at position {i}",
+            )
+
+
+def configure_compact_model(
+    m: gp.Model,
+    compact: CompactModel,
+    matrix=False,
+    names: list[str] | None = None,
+    lazy=False,
+    naming="objects",
+) -> list[gp.Var]:
+    """
+    Configures the same model as configure_model directly from the arrays of a compact model.
+    The variables are in the order of compact.connections.
+
+    -@ matrix: Add variables, objective and constraints in bulk with the matrix API.
+    -@ names: Names of the variables. Per default they are named by naming.
+    -@ lazy: Leave out the rows of _lazy_rows.
+    -@ naming: How the variables are named. See backends.variable_names.
+    """
+    if names is None:
+        names = variable_names(naming, compact.num_connections, compact.connection)
+    weights: np.ndarray = compact.connections["weight"]
+    if matrix:
+        x: gp.MVar = m.addMVar(
+            compact.num_connections,
+            vtype="B",
+            name=None if names is None else np.array(names),
+        )
+        m.setObjective(weights @ x, gp.GRB.MINIMIZE)
+        add_matrix_rows(m, x, _compact_rows(compact, lazy))
+        return x.tolist()
+
+    variables: list[gp.Var] = [
+        m.addVar(vtype="B", name="" if names is None else names[i])
+        for i in range(compact.num_connections)
+    ]
+    m.setObjective(gp.LinExpr(weights.tolist(), variables), gp.GRB.MINIMIZE)
+    add_rows(m, variables, _compact_rows(compact, lazy))
+    return variables
+
+
+def optimize_lazy(
+    m: gp.Model,
+    variable_map: dict[Connection, gp.Var],
+    instance: Instance | None = None,
+):
+    """
+    Optimizes a model configured with lazy=True. The rows of length_train and
+    valid_positioning are added when an incumbent violates them.
+    """
+    compact = CompactModel.from_instance(
+        instance or example_instance(), connections=variable_map
+    )
+    m.Params.LazyConstraints = 1
+    m.optimize(lazy_callback(list(variable_map.values()), _lazy_rows(compact)))
+
+
+def configure_backend(
+    backend: Backend,
+    compact: CompactModel,
+    names: list[str] | None = None,
+    lazy=False,
+) -> np.ndarray:
+    """
+    Configures the model of configure_compact_model on a solver backend.
+    Returns the indices of the variables in the order of compact.connections.
+
+    -@ names: Names of the variables. Per default they are unnamed.
+    -@ lazy: Leave out the rows of _lazy_rows. Solve with backend.solve_lazy.
+    """
+    variables = backend.add_variables(compact.connections["weight"], names)
+    backend.add_rows(_compact_rows(compact, lazy))
+    return variables
+
+
+def run_model(
+    verbose=False,
+    instance: Instance | None = None,
+    backend="gurobi",
+    lazy=False,
+    timer: PhaseTimer | None = None,
+    model_cache: ModelCache | None = None,
+    naming="none",
+):
+    """
+    -@ backend: Name of the solver backend. See backends.get_backend.
+    -@ lazy: Add the length and positioning constraints only when violated.
+    -@ timer: Records the time of building and solving the model and its size.
+    -@ model_cache: Read the built model and its solution from this cache and store
+        them there. Only used with Gurobi, without lazy constraints and without naming
+        the variables after their objects, which the model files can not hold.
+    -@ naming: How the variables are named. The chosen connections are decoded from the
+        indices of the variables either way. See backends.variable_names.
+    """
+    instance = instance or example_instance()
+    with get_backend(backend, verbose=verbose) as solver:
+        fingerprint: str | None = None
+        path: str | None = None
+        compact: CompactModel | None = None
+        if (
+            model_cache is not None
+            and isinstance(solver, GurobiBackend)
+            and not lazy
+            and naming != "objects"
+        ):
+            fingerprint = model_fingerprint(instance, "graph", naming=naming)
+            solution = model_cache.load_solution(fingerprint)
+            if solution is not None:
+                count(timer, "solutions loaded from cache", 1)
+                if verbose:
+                    print("Loaded solution from cache")
+                    print_solution(
+                        solution["objective_value"],
+                        model_cache.model_objects(
+                            fingerprint, instance, solution["chosen"]
+                        ),
+                        0,
+                    )
+                return
+            path = model_cache.model_path(fingerprint)
+
+        if path is not None:
+            with phase(timer, "model cache"):
+                solver.read(path)
             if verbose:
-                print(f"Optimal objective value: {m.objVal}")
-                print("Choosen edges:")
-                for var in sorted(
-                    filter(lambda v: v.X, variable_map.values()),
-                    key=lambda v: v.VarName,
-                ):
-                    print(var.VarName)
-                print(f"\nRuntime: {toc - tic}s")
+                print("Loaded model from cache")
+        else:
+            with phase(timer, "compact model"):
+                cons: list[Connection] = list(instance.connections)
+                compact = CompactModel.from_instance(instance, connections=cons)
+            with phase(timer, "backend model"):
+                configure_backend(
+                    solver,
+                    compact,
+                    names=variable_names(
+                        naming, compact.num_connections, compact.connection
+                    ),
+                    lazy=lazy,
+                )
+            if fingerprint is not None:
+                with phase(timer, "model cache store"):
+                    model_cache.store_model(fingerprint, solver.model, instance, cons)
+        count_model(timer, solver)
+
+        tic = time.perf_counter()
+        with phase(timer, "optimize"):
+            if lazy:
+                status = solver.solve_lazy(_lazy_rows(compact))
+            else:
+                status = solver.solve()
+        toc = time.perf_counter()
+        if status == OPTIMAL:
+            values = solver.values()
+            if fingerprint is not None:
+                model_cache.store_solution(
+                    fingerprint, solver.objective_value, values.tolist()
+                )
+
+        if verbose:
+            if status != OPTIMAL:
+                print(f"Model is {status}")
+                return
+            if compact is not None:
+                chosen = chosen_objects(values, compact.connection)
+            else:
+                chosen = model_cache.model_objects(
+                    fingerprint, instance, chosen_indices(values)
+                )
+            print_solution(solver.objective_value, chosen, toc - tic)
 
 
 if __name__ == "__main__":
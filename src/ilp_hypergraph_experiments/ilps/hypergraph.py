@@ -1,11 +1,54 @@
-from ilp_hypergraph_experiments.model import connections, timetable_trips, stations
-from ilp_hypergraph_experiments.model_objects import Hyperedge, Connection, TrainStation
+from ilp_hypergraph_experiments.instance import Instance, example_instance
+from ilp_hypergraph_experiments.model_objects import (
+    Hyperedge,
+    Connection,
+    TrainStation,
+    TrainArrangment,
+)
+from ilp_hypergraph_experiments.compact import CompactModel, group_indices
+from ilp_hypergraph_experiments.cache import (
+    HyperedgeCache,
+    ModelCache,
+    canonical_connections,
+    instance_fingerprint,
+    model_fingerprint,
+)
+from ilp_hypergraph_experiments.ilps.matrix import (
+    EQUAL,
+    LESS_EQUAL,
+    Row,
+    add_rows,
+    add_matrix_rows,
+    rows_to_matrix,
+    violated_rows,
+)
+from ilp_hypergraph_experiments.ilps.backends import (
+    Backend,
+    GurobiBackend,
+    OPTIMAL,
+    count_model,
+    get_backend,
+    variable_name,
+    variable_names,
+)
+from ilp_hypergraph_experiments.ilps.reporting import (
+    chosen_indices,
+    chosen_objects,
+    print_solution,
+)
+from ilp_hypergraph_experiments.ilps import graph
+from ilp_hypergraph_experiments.timing import PhaseTimer, count, phase
 from ilp_hypergraph_experiments.settings import max_train_len_global
-from itertools import product, combinations_with_replacement
+from concurrent.futures import ProcessPoolExecutor
+from itertools import batched, product, combinations
 import gurobipy as gp
+import numpy as np
+import scipy.sparse as sp
+import math
+import os
 import time
 
-from typing import Iterable
+from typing import Iterable, Iterator, Sequence
 
 
 def _write(hs: Iterable[Hyperedge]):
@@ -13,7 +56,8 @@ def _write(hs: Iterable[Hyperedge]):
         f.write("\n".join(str(h) for h in sorted(hs, key=lambda h: len(h.arces))))
 
 
-def filter_length_train(hyperedge: Hyperedge) -> bool:
+def filter_length_train(hyperedge: Hyperedge, instance: Instance) -> bool:
+    max_train_len_global: int = instance.max_train_len_global
     for station, arces in hyperedge.origin_arces.items():
         if station.max_train_len < len(arces) or max_train_len_global < len(arces):
             return False
@@ -38,14 +82,14 @@ def filter_invalid_positioning(hyperedge: Hyperedge) -> bool:
     return True
 
 
-def filter_invalid_timetable_trip(hyperedge: Hyperedge) -> bool:
+def filter_invalid_timetable_trip(hyperedge: Hyperedge, instance: Instance) -> bool:
     """
     If a hyperedge describes the train movement in a timetable trip, the trains can't change
     there composition.
     """
     if hyperedge.inside:
         return True
-    for trip in timetable_trips:
+    for trip in instance.timetable_trips:
         if hyperedge.has_arc_from_to(trip.origin, trip.destination):
             for arc in hyperedge.arces:
                 if arc.arrangement_origin != arc.arrangement_destination:
@@ -53,6 +97,93 @@ def filter_invalid_timetable_trip(hyperedge: Hyperedge) -> bool:
     return True
 
 
+def filter_hyperedges(
+    hyperedges: Iterable[Hyperedge],
+    instance: Instance,
+    timer: PhaseTimer | None = None,
+) -> list[Hyperedge]:
+    """
+    Removes the hyperedges rejected by any of the filters above.
+
+    -@ timer: Runs the filters one after another to record the time and the number of
+        removed hyperedges of each. This holds all hyperedges in memory at once.
+    """
+    if timer is not None:
+        hyperedges = list(hyperedges)
+        count(timer, "hyperedges generated", len(hyperedges))
+        for name, keep in (
+            ("filter_length_train", lambda h: filter_length_train(h, instance)),
+            ("filter_invalid_positioning", filter_invalid_positioning),
+            (
+                "filter_invalid_timetable_trip",
+                lambda h: filter_invalid_timetable_trip(h, instance),
+            ),
+        ):
+            with phase(timer, name):
+                kept = list(filter(keep, hyperedges))
+            count(timer, f"{name} removed", len(hyperedges) - len(kept))
+            hyperedges = kept
+        return hyperedges
+    return list(iter_filtered_hyperedges(hyperedges, instance))
+
+
+def iter_filtered_hyperedges(
+    hyperedges: Iterable[Hyperedge], instance: Instance
+) -> Iterator[Hyperedge]:
+    """
+    Lazily passes on the hyperedges accepted by all of the filters above.
+    """
+    return filter(
+        lambda h: filter_length_train(h, instance)
+        and filter_invalid_positioning(h)
+        and filter_invalid_timetable_trip(h, instance),
+        hyperedges,
+    )
+
+
+# Origin nodes, destination nodes and whether the hyperedge is inside a station.
+type DominanceKey = tuple[
+    frozenset[tuple[TrainStation, TrainArrangment]],
+    frozenset[tuple[TrainStation, TrainArrangment]],
+    bool,
+]
+
+
+def dominance_key(hyperedge: Hyperedge) -> DominanceKey:
+    """
+    The constraints of the model only depend on this key of a hyperedge, so hyperedges
+    with the same key only differ in their weight.
+    """
+    return (
+        frozenset(hyperedge.origins),
+        frozenset(hyperedge.destinations),
+        hyperedge.inside,
+    )
+
+
+def prune_dominated(
+    hyperedges: Iterable[Hyperedge], verbose=False, timer: PhaseTimer | None = None
+) -> list[Hyperedge]:
+    """
+    Keeps only the cheapest hyperedge of all hyperedges with the same dominance_key,
+    since the others can't be part of an optimal solution.
+    The kept hyperedges are in the order the keys first occur.
+
+    -@ timer: Counts the removed hyperedges.
+    """
+    cheapest: dict[DominanceKey, Hyperedge] = {}
+    total: int = 0
+    for h in hyperedges:
+        total += 1
+        key = dominance_key(h)
+        if key not in cheapest or h.weight < cheapest[key].weight:
+            cheapest[key] = h
+    if verbose:
+        print("Dominated hyperedges removed: ", total - len(cheapest))
+    count(timer, "hyperedges pruned", total - len(cheapest))
+    return list(cheapest.values())
+
+
 def _well_ordere(positions: tuple[int]) -> bool:
     if len(positions) != len(set(positions)):
         return False
@@ -61,51 +192,355 @@ def _well_ordere(positions: tuple[int]) -> bool:
     return True
 
 
-def generate_hyperedges(verbose=False) -> set[Hyperedge]:
-    hyperedges: list[Hyperedge] = []
-    arces_between: dict[TrainStation, dict[TrainStation, Connection]] = {
+def generate_hyperedges(
+    instance: Instance | None = None, verbose=False
+) -> set[Hyperedge]:
+    return set(iter_hyperedges(instance, verbose=verbose))
+
+
+def _arces_between(
+    instance: Instance,
+) -> dict[TrainStation, dict[TrainStation, list[Connection]]]:
+    stations: tuple[TrainStation, ...] = instance.stations
+    arces_between: dict[TrainStation, dict[TrainStation, list[Connection]]] = {
         s: dict((s1, []) for s1 in stations) for s in stations
     }
-    for con in connections:
+    for con in instance.connections:
         arces_between[con.origin][con.destination].append(con)
-    for orig, dest in product(stations, repeat=2):
-        for i in range(1, max_train_len_global + 1):
-            hyperedges.extend(
-                (
-                    Hyperedge(*arces)
-                    for arces in combinations_with_replacement(
-                        arces_between[orig][dest], r=i
-                    )
-                )
+    return arces_between
+
+
+def iter_hyperedges(
+    instance: Instance | None = None, verbose=False
+) -> Iterator[Hyperedge]:
+    """
+    Lazily generates all hyperedges of up to max_train_len_global arces between each pair
+    of stations, the candidates of filter_hyperedges.
+    Combinations repeating an arc are the same hyperedge as the combination of its
+    distinct arces, so each hyperedge is generated once.
+    """
+    instance = instance or example_instance()
+    arces_between = _arces_between(instance)
+    generated: int = 0
+    for orig, dest in product(instance.stations, repeat=2):
+        for i in range(1, instance.max_train_len_global + 1):
+            for arces in combinations(arces_between[orig][dest], i):
+                generated += 1
+                yield Hyperedge(*arces)
+        if verbose:
+            print("Number of hyperedges: ", generated)
+
+
+# Properties of an arc deciding the valid hyperedges:
+# (origin position, destination position, inside, keeps its arrangement)
+type ArcRow = tuple[int, int, bool, bool]
+
+
+def _arc_row(arc: Connection) -> ArcRow:
+    return (
+        arc.arrangement_origin[2],
+        arc.arrangement_destination[2],
+        arc.inside,
+        arc.arrangement_origin == arc.arrangement_destination,
+    )
+
+
+def _build_by_position(
+    rows: list[ArcRow],
+    by_position: list[list[int]],
+    chosen: list[int],
+    dest_positions: set[int],
+    has_outside: bool,
+) -> Iterator[tuple[int, ...]]:
+    """
+    Extends the chosen arces by one train at the next free origin position.
+    The origin positions are well-ordered by construction. The destination positions are
+    distinct by construction and therefore well-ordered iff the biggest one fits the length.
+    """
+    position = len(chosen)
+    if has_outside and max(dest_positions) < position:
+        yield tuple(chosen)
+    if position == len(by_position):
+        return
+    for arc in by_position[position]:
+        dest_position = rows[arc][1]
+        if dest_position in dest_positions:
+            # Every extension would have two trains at the same position.
+            continue
+        chosen.append(arc)
+        dest_positions.add(dest_position)
+        yield from _build_by_position(
+            rows, by_position, chosen, dest_positions, has_outside or not rows[arc][2]
+        )
+        dest_positions.discard(dest_position)
+        chosen.pop()
+
+
+def _enumerate_arc_ids(
+    rows: list[ArcRow], max_len: int, is_trip: bool, part: int = 0, parts: int = 1
+) -> Iterator[tuple[int, ...]]:
+    """
+    Enumerates the valid hyperedges between two stations as indices into rows.
+    Each hyperedge is reached from exactly one choice of its first arc.
+
+    -@ part, parts: Only follow the first choices with index part modulo parts.
+    """
+    first_choice: int = 0
+    # Hyperedges only inside a station are not bound to positioning or timetable trips.
+    inside: list[int] = [i for i, row in enumerate(rows) if row[2]]
+    for k, first in enumerate(inside):
+        if first_choice % parts == part:
+            for i in range(max_len):
+                for rest in combinations(inside[k + 1 :], i):
+                    yield (first, *rest)
+        first_choice += 1
+
+    # All other hyperedges are build up train by train along the origin positions.
+    if max_len < 1:
+        return
+    by_position: list[list[int]] = [[] for _ in range(max_len)]
+    for i, (origin_position, dest_position, _, keeps_arrangement) in enumerate(rows):
+        if is_trip and not keeps_arrangement:
+            continue
+        if origin_position < max_len and dest_position < max_len:
+            by_position[origin_position].append(i)
+    for first in by_position[0]:
+        if first_choice % parts == part:
+            yield from _build_by_position(
+                rows, by_position, [first], {rows[first][1]}, not rows[first][2]
             )
+        first_choice += 1
+
+
+def enumerate_hyperedges_between(
+    orig: TrainStation,
+    dest: TrainStation,
+    arces: Iterable[Connection],
+    is_trip: bool = False,
+    max_train_len: int = max_train_len_global,
+) -> Iterator[Hyperedge]:
+    """
+    Constructs all hyperedges from orig to dest passing filter_length_train,
+    filter_invalid_positioning and filter_invalid_timetable_trip.
+    Instead of filtering afterwards, a partial hyperedge breaking a rule is never extended.
+
+    -@ is_trip: The stations are the origin and destination of a timetable trip.
+    -@ max_train_len: The maximum length of a train in the model.
+    """
+    max_len = min(orig.max_train_len, dest.max_train_len, max_train_len)
+    arces = list(arces)
+    rows: list[ArcRow] = [_arc_row(arc) for arc in arces]
+    for arc_ids in _enumerate_arc_ids(rows, max_len, is_trip):
+        yield Hyperedge(*(arces[i] for i in arc_ids))
+
+
+def generate_hyperedges_constructive(
+    instance: Instance | None = None, verbose=False
+) -> list[Hyperedge]:
+    """
+    Generates the same hyperedges as get_filtered_hyperedges with filtering, but without
+    building the invalid ones first.
+    """
+    return list(iter_hyperedges_constructive(instance, verbose=verbose))
+
+
+def iter_hyperedges_constructive(
+    instance: Instance | None = None,
+    verbose=False,
+    trips: Iterable[tuple[TrainStation, TrainStation]] | None = None,
+) -> Iterator[Hyperedge]:
+    """
+    Lazily generates the hyperedges of generate_hyperedges_constructive one pair of
+    stations after another.
+    Combinations repeating an arc are the same hyperedge and therefore only generated once.
+
+    -@ trips: Pairs of stations bound by filter_invalid_timetable_trip. Per default the
+        ones of the timetable trips.
+    """
+    instance = instance or example_instance()
+    arces_between = _arces_between(instance)
+    if trips is None:
+        trips = ((trip.origin, trip.destination) for trip in instance.timetable_trips)
+    trips: set[tuple[TrainStation, TrainStation]] = set(trips)
+    generated: int = 0
+    for orig, dest in product(instance.stations, repeat=2):
+        for h in enumerate_hyperedges_between(
+            orig,
+            dest,
+            arces_between[orig][dest],
+            (orig, dest) in trips,
+            instance.max_train_len_global,
+        ):
+            generated += 1
+            yield h
         if verbose:
-            print("Number of hyperedges: ", len(hyperedges))
-    return set(hyperedges)
+            print("Number of hyperedges: ", generated)
+
+
+def stream_hyperedges(
+    instance: Instance | None = None, constructive=True
+) -> Iterator[Hyperedge]:
+    """
+    Lazily generates the hyperedges of get_filtered_hyperedges without the cache, so only
+    the hyperedges kept by the consumer stay in memory.
+
+    -@ constructive: See get_filtered_hyperedges.
+    """
+    instance = instance or example_instance()
+    if constructive:
+        return iter_hyperedges_constructive(instance)
+    return iter_filtered_hyperedges(iter_hyperedges(instance), instance)
+
+
+# Work of a worker: global arc ids, their rows, max length, is trip, part, parts
+type EnumerationTask = tuple[list[int], list[ArcRow], int, bool, int, int]
+
 
+def _enumerate_task(task: EnumerationTask) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Runs in a worker process and returns the hyperedges as CSR style arrays of arc ids.
+    """
+    ids, rows, max_len, is_trip, part, parts = task
+    indptr: list[int] = [0]
+    arces: list[int] = []
+    for arc_ids in _enumerate_arc_ids(rows, max_len, is_trip, part, parts):
+        arces.extend(ids[i] for i in arc_ids)
+        indptr.append(len(arces))
+    return np.array(indptr, dtype=np.int64), np.array(arces, dtype=np.int32)
+
+
+def generate_hyperedges_parallel(
+    instance: Instance | None = None,
+    workers: int | None = None,
+    verbose=False,
+    chunks_per_worker: int = 4,
+) -> list[Hyperedge]:
+    """
+    Generates the same hyperedges as generate_hyperedges_constructive in worker processes.
+    Each station pair is a task and heavy pairs are split by the first arc of the
+    hyperedges. The hyperedges are merged in task order, so the result is deterministic.
+
+    -@ workers: Number of worker processes. Per default one per CPU.
+    -@ chunks_per_worker: Heavy pairs are split until there are about this many tasks
+        per worker.
+    """
+    instance = instance or example_instance()
+    workers = workers or os.cpu_count() or 1
+    cons: list[Connection] = canonical_connections(instance.connections)
+    ids_between: dict[tuple[TrainStation, TrainStation], list[int]] = {}
+    for i, con in enumerate(cons):
+        ids_between.setdefault((con.origin, con.destination), []).append(i)
+    trips: set[tuple[TrainStation, TrainStation]] = set(
+        (trip.origin, trip.destination) for trip in instance.timetable_trips
+    )
+
+    pairs: list[tuple[list[int], list[ArcRow], int, bool]] = []
+    for orig, dest in product(instance.stations, repeat=2):
+        ids = ids_between.get((orig, dest))
+        if not ids:
+            continue
+        max_len = min(
+            orig.max_train_len, dest.max_train_len, instance.max_train_len_global
+        )
+        rows = [_arc_row(cons[i]) for i in ids]
+        pairs.append((ids, rows, max_len, (orig, dest) in trips))
 
-def get_filtered_hyperedges(verbose=False) -> set[Hyperedge]:
+    # The number of combinations bounds the work of a pair.
+    costs: list[int] = [len(ids) ** max_len for ids, _, max_len, _ in pairs]
+    target: float = max(1, sum(costs) / (workers * chunks_per_worker))
+    tasks: list[EnumerationTask] = []
+    for (ids, rows, max_len, is_trip), cost in zip(pairs, costs):
+        parts = max(1, min(len(ids), math.ceil(cost / target)))
+        tasks.extend(
+            (ids, rows, max_len, is_trip, part, parts) for part in range(parts)
+        )
     if verbose:
-        print("Generating hyperedges...")
-    hyperedges = generate_hyperedges(verbose=verbose)
+        print(f"Enumerating {len(tasks)} tasks on {workers} workers")
+
+    hyperedges: list[Hyperedge] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for indptr, arces in executor.map(_enumerate_task, tasks):
+            bounds: list[int] = indptr.tolist()
+            arces: list[int] = arces.tolist()
+            hyperedges.extend(
+                Hyperedge(*(cons[arc] for arc in arces[bounds[i] : bounds[i + 1]]))
+                for i in range(len(bounds) - 1)
+            )
     if verbose:
-        print("Filtering hyperedges...", end=" ", flush=True)
-    hyperedges: list[Hyperedge] = list(
-        filter(
-            lambda h: filter_length_train(h)
-            and filter_invalid_positioning(h)
-            and filter_invalid_timetable_trip(h),
-            hyperedges,
+        print("Number of hyperedges: ", len(hyperedges))
+    return hyperedges
+
+
+def get_filtered_hyperedges(
+    instance: Instance | None = None,
+    verbose=False,
+    constructive=True,
+    use_cache=True,
+    workers: int | None = 1,
+    timer: PhaseTimer | None = None,
+) -> list[Hyperedge]:
+    """
+    -@ instance: The instance to generate the hyperedges of. Per default the example
+        instance.
+    -@ constructive: Skip invalid hyperedges while generating them instead of filtering
+        all possible combinations afterwards.
+    -@ use_cache: Load the hyperedges from the disk cache if the instance did not change
+        and store them there otherwise.
+    -@ workers: Number of processes generating the hyperedges constructively.
+        None uses one per CPU.
+    -@ timer: Records the time of the filters and counts the hyperedges.
+    """
+    instance = instance or example_instance()
+    if use_cache:
+        cache = HyperedgeCache()
+        fingerprint: str = instance_fingerprint(instance)
+        cons: list[Connection] = canonical_connections(instance.connections)
+        hyperedges = cache.load(fingerprint, cons)
+        if hyperedges is not None:
+            if verbose:
+                print("Loaded hyperedges from cache: ", len(hyperedges))
+            count(timer, "hyperedges loaded from cache", len(hyperedges))
+            return hyperedges
+        hyperedges = get_filtered_hyperedges(
+            instance,
+            verbose=verbose,
+            constructive=constructive,
+            use_cache=False,
+            workers=workers,
+            timer=timer,
         )
+        cache.store(fingerprint, cons, hyperedges)
+        return hyperedges
+
+    if constructive:
+        if verbose:
+            print("Generating valid hyperedges...")
+        if workers == 1:
+            hyperedges: list[Hyperedge] = generate_hyperedges_constructive(
+                instance, verbose=verbose
+            )
+        else:
+            hyperedges: list[Hyperedge] = generate_hyperedges_parallel(
+                instance, workers=workers, verbose=verbose
+            )
+        if verbose:
+            print("Hyperedges generated: ", len(hyperedges))
+        count(timer, "hyperedges generated", len(hyperedges))
+        return hyperedges
+
+    if verbose:
+        print("Generating and filtering hyperedges...")
+    hyperedges: list[Hyperedge] = filter_hyperedges(
+        iter_hyperedges(instance, verbose=verbose), instance, timer=timer
     )
     if verbose:
-        print("done")
         print("Hyperedges remaining: ", len(hyperedges))
     return hyperedges
 
 
-def time_generate_hyperedges() -> float:
+def time_generate_hyperedges(instance: Instance | None = None) -> float:
     tic = time.perf_counter()
-    hyperedges = get_filtered_hyperedges()
+    hyperedges = get_filtered_hyperedges(instance)
     toc = time.perf_counter()
     for x in hyperedges[:10]:
         print(x)
@@ -114,38 +549,142 @@ def time_generate_hyperedges() -> float:
     return toc - tic
 
 
-def configure_model(m: gp.Model, verbose=False) -> dict[Hyperedge, gp.Var]:
-    hyperedges: set[Hyperedge] = get_filtered_hyperedges(verbose=verbose)
+def configure_model(
+    m: gp.Model,
+    instance: Instance | None = None,
+    verbose=False,
+    matrix=False,
+    hyperedges: Iterable[Hyperedge] | None = None,
+    timer: PhaseTimer | None = None,
+    warm_start: str | None = None,
+    prune=True,
+    stream=False,
+    chunk_size: int | None = None,
+    naming="objects",
+) -> dict[Hyperedge, gp.Var]:
+    """
+    -@ instance: The instance to model. Per default the example instance.
+    -@ matrix: Build the same model in bulk with the matrix API.
+    -@ hyperedges: The hyperedges to model. Per default get_filtered_hyperedges.
+    -@ timer: Records the time of each phase of building the model and its size.
+    -@ warm_start: Source of a MIP start, 'graph' or 'greedy'. See start_values.
+    -@ prune: Remove the hyperedges dominated by a cheaper one. See prune_dominated.
+    -@ stream: Generate the hyperedges lazily with stream_hyperedges while
+        creating the variables instead of using get_filtered_hyperedges. Only the
+        hyperedges of the model are held in memory, but the time of generating them
+        counts to the phase consuming them.
+    -@ chunk_size: Create the variables of chunk_size hyperedges at once with their
+        weight as objective coefficient. See add_hyperedge_variables.
+    -@ naming: How the variables are named. Named after their hyperedges, the names list
+        all arces. See backends.variable_names.
+    """
+    instance = instance or example_instance()
+    if hyperedges is None:
+        if stream:
+            hyperedges = stream_hyperedges(instance)
+        else:
+            with phase(timer, "hyperedges"):
+                hyperedges = get_filtered_hyperedges(
+                    instance, verbose=verbose, timer=timer
+                )
+    if prune:
+        with phase(timer, "pruning"):
+            hyperedges = prune_dominated(hyperedges, verbose=verbose, timer=timer)
+    if matrix:
+        hyperedges: list[Hyperedge] = list(hyperedges)
+        with phase(timer, "compact model"):
+            compact = CompactModel.from_instance(instance, hyperedges=hyperedges)
+        with phase(timer, "matrix model"):
+            variables = configure_compact_model(
+                m,
+                compact,
+                verbose=verbose,
+                matrix=True,
+                names=variable_names(naming, len(hyperedges), hyperedges.__getitem__),
+                naming=naming,
+            )
+        variable_map = dict(zip(hyperedges, variables))
+        count_model(timer, m)
+        if warm_start:
+            with phase(timer, "warm start"):
+                set_start(m, variable_map, instance, warm_start, verbose=verbose)
+        return variable_map
     if verbose:
         print("Configuring model")
 
         print("Generating variables...", end=" ", flush=True)
-    variable_map: dict[Hyperedge, gp.Var] = dict(
-        (h, m.addVar(vtype="B", name=str(h))) for h in hyperedges
-    )
+    with phase(timer, "variables"):
+        if chunk_size is None:
+            variable_map: dict[Hyperedge, gp.Var] = dict(
+                (h, m.addVar(vtype="B", name=variable_name(naming, i, h)))
+                for i, h in enumerate(hyperedges)
+            )
+        else:
+            variable_map = add_hyperedge_variables(m, hyperedges, chunk_size, naming)
     if verbose:
         print("done")
 
         print("Configuring objective function", end="", flush=True)
-    m.setObjective(
-        gp.quicksum(h.weight * var for h, var in variable_map.items()),
-        gp.GRB.MINIMIZE,
-    )
+    with phase(timer, "objective"):
+        if chunk_size is None:
+            m.setObjective(
+                gp.quicksum(h.weight * var for h, var in variable_map.items()),
+                gp.GRB.MINIMIZE,
+            )
+        else:
+            # The weights are already the objective coefficients of the variables.
+            m.ModelSense = gp.GRB.MINIMIZE
     if verbose:
         print(", timetable fullfillment", end="", flush=True)
-    fullfill_timetable_trips(m, variable_map)
+    with phase(timer, "fullfill_timetable_trips"):
+        fullfill_timetable_trips(m, variable_map, instance)
     if verbose:
         print(", flow constraints", end="", flush=True)
-    flow_constraints(m, variable_map)
+    with phase(timer, "flow_constraints"):
+        flow_constraints(m, variable_map, instance)
     if verbose:
         print(", enforcing of single hyperedge in trainstations")
-    single_inside_hyperedge(m, variable_map)
+    with phase(timer, "single_inside_hyperedge"):
+        single_inside_hyperedge(m, variable_map, instance)
+    count_model(timer, m)
+    if warm_start:
+        with phase(timer, "warm start"):
+            set_start(m, variable_map, instance, warm_start, verbose=verbose)
 
     return variable_map
 
 
-def fullfill_timetable_trips(m: gp.Model, variable_map: dict[Hyperedge, gp.Var]):
-    for trip in timetable_trips:
+def add_hyperedge_variables(
+    m: gp.Model,
+    hyperedges: Iterable[Hyperedge],
+    chunk_size: int = 10_000,
+    naming="objects",
+) -> dict[Hyperedge, gp.Var]:
+    """
+    Creates a binary variable per hyperedge with its weight as objective coefficient.
+    The hyperedges are consumed lazily, chunk_size of them at a time, so besides the
+    hyperedges of the model at most a chunk of their names and weights is in memory.
+
+    -@ naming: How the variables are named. See backends.variable_names.
+    """
+    variable_map: dict[Hyperedge, gp.Var] = {}
+    for chunk in batched(hyperedges, chunk_size):
+        variables = m.addMVar(
+            len(chunk),
+            vtype=gp.GRB.BINARY,
+            obj=[h.weight for h in chunk],
+            name=variable_names(
+                naming, len(chunk), chunk.__getitem__, start=len(variable_map)
+            ),
+        ).tolist()
+        variable_map.update(zip(chunk, variables))
+    return variable_map
+
+
+def fullfill_timetable_trips(
+    m: gp.Model, variable_map: dict[Hyperedge, gp.Var], instance: Instance
+):
+    for trip in instance.timetable_trips:
         possible_hyperedges: tuple[gp.Var] = tuple(
             var
             for h, var in variable_map.items()
@@ -157,8 +696,10 @@ def fullfill_timetable_trips(m: gp.Model, variable_map: dict[Hyperedge, gp.Var])
         )
 
 
-def single_inside_hyperedge(m: gp.Model, variable_map: dict[Hyperedge, gp.Var]):
-    for station in stations:
+def single_inside_hyperedge(
+    m: gp.Model, variable_map: dict[Hyperedge, gp.Var], instance: Instance
+):
+    for station in instance.stations:
         hyperedge_inside: list[Hyperedge] = []
         for h, var in variable_map.items():
             if h.inside and h.comes_from_station(station):
@@ -169,48 +710,405 @@ def single_inside_hyperedge(m: gp.Model, variable_map: dict[Hyperedge, gp.Var]):
         )
 
 
-def flow_constraints(m: gp.Model, variable_map: dict[Hyperedge, gp.Var]):
-    for station in stations:
+def flow_constraints(
+    m: gp.Model, variable_map: dict[Hyperedge, gp.Var], instance: Instance
+):
+    # Index the variables once by the nodes of their hyperedges.
+    # Key: (station, arrangement, inside, into station)
+    flow_index: dict[tuple[TrainStation, TrainArrangment, bool, bool], list[gp.Var]]
+    flow_index = {}
+    for h, var in variable_map.items():
+        for node in h.origins:
+            flow_index.setdefault((*node, h.inside, False), []).append(var)
+        for node in h.destinations:
+            flow_index.setdefault((*node, h.inside, True), []).append(var)
+
+    for station in instance.stations:
         for arrangement in station.allowed_arrangements:
-            inside_into: list[Hyperedge] = []
-            inside_out: list[Hyperedge] = []
-            outside_into: list[Hyperedge] = []
-            outside_out: list[Hyperedge] = []
-            for h in variable_map.keys():
-                if h.inside:
-                    if h.contains_origin_node(station, arrangement):
-                        inside_out.append(h)
-                    if h.contains_destination_node(station, arrangement):
-                        inside_into.append(h)
-                else:
-                    if h.contains_origin_node(station, arrangement):
-                        outside_out.append(h)
-                    if h.contains_destination_node(station, arrangement):
-                        outside_into.append(h)
-
-            m.addConstr(
-                gp.quicksum(variable_map[h] for h in outside_into)
-                == gp.quicksum(variable_map[h] for h in inside_out)
+            outside_into = flow_index.get((station, arrangement, False, True), ())
+            outside_out = flow_index.get((station, arrangement, False, False), ())
+            inside_into = flow_index.get((station, arrangement, True, True), ())
+            inside_out = flow_index.get((station, arrangement, True, False), ())
+            m.addConstr(gp.quicksum(outside_into) == gp.quicksum(inside_out))
+            m.addConstr(gp.quicksum(inside_into) == gp.quicksum(outside_out))
+
+
+def _compact_rows(compact: CompactModel) -> Iterator[Row]:
+    """
+    The constraints of configure_model as rows over the compact hyperedges.
+    """
+    cons: np.ndarray = compact.connections
+    num_stations: int = len(compact.stations)
+    no_vars: np.ndarray = np.zeros(0, dtype=np.int64)
+
+    # Timetable fullfillment by hyperedges outside of stations
+    owners, pairs = compact.hyperedge_incidence(
+        cons["origin"].astype(np.int64) * num_stations + cons["destination"]
+    )
+    outside = ~compact.hyperedge_inside[owners]
+    by_pair = group_indices(pairs[outside], owners[outside])
+    for origin, destination in compact.trips.tolist():
+        yield (
+            [(by_pair.get(origin * num_stations + destination, no_vars), 1.0)],
+            EQUAL,
+            1,
+            "Trips need to be implemented",
+        )
+
+    # Flow constraints, keyed by 2 * node + inside
+    owners, nodes = compact.hyperedge_incidence(
+        compact.node_ids(cons["origin"], cons["arrangement_origin"])
+    )
+    out_index = group_indices(nodes * 2 + compact.hyperedge_inside[owners], owners)
+    owners, nodes = compact.hyperedge_incidence(
+        compact.node_ids(cons["destination"], cons["arrangement_destination"])
+    )
+    into_index = group_indices(nodes * 2 + compact.hyperedge_inside[owners], owners)
+    for station in range(num_stations):
+        for arrangement in compact.allowed_arrangements_of(station).tolist():
+            node = int(compact.node_ids(np.int64(station), arrangement))
+            yield (
+                [
+                    (into_index.get(2 * node, no_vars), 1.0),
+                    (out_index.get(2 * node + 1, no_vars), -1.0),
+                ],
+                EQUAL,
+                0,
+                "",
             )
-            m.addConstr(
-                gp.quicksum(variable_map[h] for h in inside_into)
-                == gp.quicksum(variable_map[h] for h in outside_out)
+            yield (
+                [
+                    (into_index.get(2 * node + 1, no_vars), 1.0),
+                    (out_index.get(2 * node, no_vars), -1.0),
+                ],
+                EQUAL,
+                0,
+                "",
             )
 
+    # Single hyperedge inside of a station
+    owners, origins = compact.hyperedge_incidence(cons["origin"])
+    inside = compact.hyperedge_inside[owners]
+    by_station = group_indices(origins[inside], owners[inside])
+    for station in range(num_stations):
+        yield (
+            [(by_station.get(station, no_vars), 1.0)],
+            LESS_EQUAL,
+            1,
+            "Only one hyperedge inside a train station",
+        )
+
+
+def configure_compact_model(
+    m: gp.Model,
+    compact: CompactModel,
+    verbose=False,
+    matrix=False,
+    names: list[str] | None = None,
+    naming="objects",
+) -> list[gp.Var]:
+    """
+    Configures the same model as configure_model directly from the hyperedges of a
+    compact model. The variables are in the order of the compact hyperedges.
+
+    -@ matrix: Add variables, objective and constraints in bulk with the matrix API.
+    -@ names: Names of the variables. Per default they are named by naming.
+    -@ naming: How the variables are named. See backends.variable_names.
+    """
+    if verbose:
+        print("Configuring compact model")
+    if names is None:
+        names = variable_names(naming, compact.num_hyperedges, compact.hyperedge)
+    if matrix:
+        x: gp.MVar = m.addMVar(
+            compact.num_hyperedges,
+            vtype="B",
+            name=None if names is None else np.array(names),
+        )
+        m.setObjective(compact.hyperedge_weight @ x, gp.GRB.MINIMIZE)
+        add_matrix_rows(m, x, _compact_rows(compact))
+        return x.tolist()
+
+    variables: list[gp.Var] = [
+        m.addVar(vtype="B", name="" if names is None else names[i])
+        for i in range(compact.num_hyperedges)
+    ]
+    m.setObjective(
+        gp.LinExpr(compact.hyperedge_weight.tolist(), variables), gp.GRB.MINIMIZE
+    )
+    add_rows(m, variables, _compact_rows(compact))
+    return variables
+
 
-def run_hyper_model(verbose=False):
-    with gp.Model() as m:
-        variable_map: dict[Connection, gp.Var] = configure_model(m, verbose=verbose)
+def hyperedges_of_connections(connections: Iterable[Connection]) -> list[Hyperedge]:
+    """
+    Groups the connections of a graph model solution into the hyperedges moving the
+    same trains, one per origin, destination and whether they are inside a station.
+    """
+    groups: dict[tuple[TrainStation, TrainStation, bool], list[Connection]] = {}
+    for con in connections:
+        groups.setdefault((con.origin, con.destination, con.inside), []).append(con)
+    return [
+        Hyperedge(*arces, inside=inside) for (_, _, inside), arces in groups.items()
+    ]
 
+
+def greedy_trip_cover(
+    hyperedges: Iterable[Hyperedge], instance: Instance
+) -> list[Hyperedge]:
+    """
+    The cheapest hyperedge servicing each timetable trip.
+    """
+    cheapest: dict[tuple[TrainStation, TrainStation], Hyperedge] = {}
+    for h in hyperedges:
+        if h.inside or not h.arces:
+            continue
+        arc: Connection = next(iter(h.arces))
+        pair = (arc.origin, arc.destination)
+        if pair not in cheapest or h.weight < cheapest[pair].weight:
+            cheapest[pair] = h
+    trips: set[tuple[TrainStation, TrainStation]] = set(
+        (trip.origin, trip.destination) for trip in instance.timetable_trips
+    )
+    return [cheapest[pair] for pair in trips if pair in cheapest]
+
+
+def graph_solution(
+    instance: Instance, backend="gurobi", time_limit: float | None = None
+) -> list[Connection] | None:
+    """
+    The connections of an optimal solution of the graph model or None.
+    """
+    cons: list[Connection] = list(instance.connections)
+    compact = CompactModel.from_instance(instance, connections=cons)
+    with get_backend(backend) as solver:
+        variables = graph.configure_backend(solver, compact)
+        if solver.solve(time_limit) != OPTIMAL:
+            return None
+        values: np.ndarray = solver.values()[variables]
+    return [cons[i] for i in np.flatnonzero(values > 0.5)]
+
+
+def is_feasible(compact: CompactModel, values: np.ndarray) -> bool:
+    """
+    Whether the values of the hyperedges satisfy all constraints of the model.
+    """
+    matrix, senses, rhs, _ = rows_to_matrix(_compact_rows(compact), len(values))
+    return not violated_rows(matrix, senses, rhs, values).any()
+
+
+def start_values(
+    hyperedges: Sequence[Hyperedge],
+    instance: Instance,
+    source="graph",
+    backend="gurobi",
+    verbose=False,
+    compact: CompactModel | None = None,
+) -> np.ndarray:
+    """
+    Values of a MIP start for the hyperedges. NaN leaves a hyperedge open for the solver
+    to complete.
+    The graph model counts the trains per arc and the hypergraph model per hyperedge, so
+    a graph solution is not always a solution of the hypergraph model. It is only used
+    as complete start if it is feasible.
+
+    -@ source: 'graph' maps a solution of the graph model to hyperedges and falls back
+        to 'greedy' if it is not feasible. 'greedy' fixes the cheapest hyperedge of each
+        timetable trip.
+    -@ backend: Solver of the graph model.
+    -@ compact: The compact model of the hyperedges to check the graph solution with.
+    """
+    if source not in ("graph", "greedy"):
+        raise RuntimeError(f"Unknown warm start '{source}'. Use graph or greedy.")
+    # Hyperedges with the same dominance key have the same constraints, so the graph
+    # solution also maps to pruned hyperedges.
+    index: dict[DominanceKey, int] = dict(
+        (dominance_key(h), i) for i, h in enumerate(hyperedges)
+    )
+
+    solution = graph_solution(instance, backend) if source == "graph" else None
+    if solution is not None:
+        start: list[Hyperedge] = hyperedges_of_connections(solution)
+        keys: list[DominanceKey] = [dominance_key(h) for h in start]
+        if all(key in index for key in keys):
+            values: np.ndarray = np.zeros(len(hyperedges))
+            values[[index[key] for key in keys]] = 1
+            if compact is None:
+                compact = CompactModel.from_instance(instance, hyperedges=hyperedges)
+            if is_feasible(compact, values):
+                if verbose:
+                    print(f"Warm start from graph model: {len(start)} hyperedges")
+                return values
+        if verbose:
+            print("Graph solution is no hypergraph solution")
+
+    values = np.full(len(hyperedges), np.nan)
+    found: list[int] = [
+        index[dominance_key(h)] for h in greedy_trip_cover(hyperedges, instance)
+    ]
+    values[found] = 1
+    if verbose:
+        print(f"Greedy warm start: {len(found)} hyperedges")
+    return values
+
+
+def set_start(
+    m: gp.Model,
+    variable_map: dict[Hyperedge, gp.Var],
+    instance: Instance,
+    source="graph",
+    verbose=False,
+):
+    """
+    Sets the Start attributes of the variables. See start_values.
+    """
+    values = start_values(list(variable_map), instance, source, verbose=verbose)
+    variables: list[gp.Var] = list(variable_map.values())
+    m.setAttr(
+        "Start",
+        variables,
+        np.where(np.isnan(values), gp.GRB.UNDEFINED, values).tolist(),
+    )
+
+
+def configure_backend(
+    backend: Backend, compact: CompactModel, names: list[str] | None = None
+) -> np.ndarray:
+    """
+    Configures the model of configure_compact_model on a solver backend.
+    Returns the indices of the variables in the order of the hyperedges of compact.
+
+    -@ names: Names of the variables. Per default they are unnamed.
+    """
+    variables = backend.add_variables(compact.hyperedge_weight, names)
+    backend.add_rows(_compact_rows(compact))
+    return variables
+
+
+def column_coefficients(compact: CompactModel) -> sp.csc_matrix:
+    """
+    Coefficients of the hyperedges of compact in the rows of configure_backend with one
+    column per hyperedge.
+    """
+    matrix, _, _, _ = rows_to_matrix(_compact_rows(compact), compact.num_hyperedges)
+    return matrix.tocsc()
+
+
+def run_hyper_model(
+    verbose=False,
+    instance: Instance | None = None,
+    backend="gurobi",
+    warm_start: str | None = None,
+    prune=True,
+    timer: PhaseTimer | None = None,
+    use_cache=True,
+    model_cache: ModelCache | None = None,
+    naming="none",
+):
+    """
+    -@ backend: Name of the solver backend. See backends.get_backend.
+    -@ warm_start: Source of a MIP start, 'graph' or 'greedy'. See start_values.
+    -@ prune: Remove the hyperedges dominated by a cheaper one. See prune_dominated.
+    -@ timer: Records the time of building and solving the model and its size.
+    -@ use_cache: Load the hyperedges from the disk cache. See get_filtered_hyperedges.
+    -@ model_cache: Read the built model and its solution from this cache and store
+        them there. Only used with Gurobi, without a warm start and without naming the
+        variables after their objects, which the model files can not hold.
+    -@ naming: How the variables are named. The chosen hyperedges are decoded from the
+        indices of the variables either way. See backends.variable_names.
+    """
+    instance = instance or example_instance()
+    with get_backend(backend, verbose=verbose) as solver:
+        fingerprint: str | None = None
+        path: str | None = None
+        compact: CompactModel | None = None
+        if (
+            model_cache is not None
+            and isinstance(solver, GurobiBackend)
+            and not warm_start
+            and naming != "objects"
+        ):
+            fingerprint = model_fingerprint(
+                instance, "hypergraph", prune=prune, naming=naming
+            )
+            solution = model_cache.load_solution(fingerprint)
+            if solution is not None:
+                count(timer, "solutions loaded from cache", 1)
+                if verbose:
+                    print("Loaded solution from cache")
+                    print_solution(
+                        solution["objective_value"],
+                        model_cache.model_objects(
+                            fingerprint, instance, solution["chosen"]
+                        ),
+                        0,
+                    )
+                return
+            path = model_cache.model_path(fingerprint)
+
+        if path is not None:
+            with phase(timer, "model cache"):
+                solver.read(path)
+            if verbose:
+                print("Loaded model from cache")
+        else:
+            with phase(timer, "hyperedges"):
+                hyperedges: list[Hyperedge] = get_filtered_hyperedges(
+                    instance, verbose=verbose, use_cache=use_cache, timer=timer
+                )
+            if prune:
+                with phase(timer, "pruning"):
+                    hyperedges = prune_dominated(
+                        hyperedges, verbose=verbose, timer=timer
+                    )
+            with phase(timer, "compact model"):
+                compact = CompactModel.from_instance(instance, hyperedges=hyperedges)
+            with phase(timer, "backend model"):
+                variables = configure_backend(
+                    solver,
+                    compact,
+                    names=variable_names(
+                        naming, len(hyperedges), hyperedges.__getitem__
+                    ),
+                )
+            if fingerprint is not None:
+                with phase(timer, "model cache store"):
+                    model_cache.store_model(
+                        fingerprint, solver.model, instance, hyperedges
+                    )
+        count_model(timer, solver)
+
+        if warm_start:
+            with phase(timer, "warm start"):
+                values = np.full(solver.num_variables, np.nan)
+                values[variables] = start_values(
+                    hyperedges,
+                    instance,
+                    warm_start,
+                    backend=backend,
+                    verbose=verbose,
+                    compact=compact,
+                )
+                solver.set_start(values)
         tic = time.perf_counter()
-        m.optimize()
+        with phase(timer, "optimize"):
+            status = solver.solve()
         toc = time.perf_counter()
+        if status == OPTIMAL:
+            values = solver.values()
+            if fingerprint is not None:
+                model_cache.store_solution(
+                    fingerprint, solver.objective_value, values.tolist()
+                )
 
         if verbose:
-            print(f"Optimal objective value: {m.objVal}")
-            print("Choosen edges:")
-            for var in sorted(
-                filter(lambda v: v.X, variable_map.values()), key=lambda v: v.VarName
-            ):
-                print(var.VarName)
-            print(f"\nRuntime: {toc - tic}s")
+            if status != OPTIMAL:
+                print(f"Model is {status}")
+                return
+            if compact is not None:
+                chosen = chosen_objects(values, hyperedges)
+            else:
+                chosen = model_cache.model_objects(
+                    fingerprint, instance, chosen_indices(values)
+                )
+            print_solution(solver.objective_value, chosen, toc - tic)
@@ -0,0 +1,470 @@
+from ilp_hypergraph_experiments.instance import Instance, example_instance
+from ilp_hypergraph_experiments.model_objects import (
+    Connection,
+    Hyperedge,
+    TrainArrangment,
+)
+from ilp_hypergraph_experiments.ilps.backends import (
+    count_model,
+    gurobi_status,
+    variable_name,
+)
+from ilp_hypergraph_experiments.ilps.hypergraph import enumerate_hyperedges_between
+from ilp_hypergraph_experiments.timing import PhaseTimer, phase
+from abc import ABC, abstractmethod
+from collections import Counter
+from itertools import product
+import gurobipy as gp
+
+from typing import Any, Iterable, Self
+
+# Names of the origin and destination station of connections or a timetable trip.
+type StationPair = tuple[str, str]
+# Name of a station and one of its arrangements, a node of the flow constraints.
+type Node = tuple[str, TrainArrangment]
+# The objects a variable stands for, connections or hyperedges.
+type ModelObject = Connection | Hyperedge
+
+
+def _connections_by_pair(instance: Instance) -> dict[StationPair, list[Connection]]:
+    by_pair: dict[StationPair, list[Connection]] = {}
+    for con in instance.connections:
+        by_pair.setdefault((con.origin.name, con.destination.name), []).append(con)
+    return by_pair
+
+
+def _trip_pairs(instance: Instance) -> Counter[StationPair]:
+    return Counter(
+        (trip.origin.name, trip.destination.name) for trip in instance.timetable_trips
+    )
+
+
+def _stations_key(instance: Instance) -> Any:
+    # Everything of an instance the rows of the stations depend on.
+    return (
+        instance.train_types,
+        instance.max_train_len_global,
+        sorted(
+            (s.name, s.max_train_len, sorted(s.allowed_arrangements))
+            for s in instance.stations
+        ),
+    )
+
+
+class IncrementalModel(ABC):
+    """
+    A built Gurobi model that follows changes of its instance in place.
+    The variables are indexed by the pair of stations of their connections, the rows of
+    the timetable trips by their pair of stations and the flow constraints by their
+    node. A change of the instance only rebuilds the variables of the pairs of stations
+    whose connections or timetable trips changed, and the next optimization starts from
+    the solution of the previous one.
+    Subclasses define the variables between two stations and their columns.
+    """
+
+    # Sense of the rows of the timetable trips.
+    trip_sense: str = gp.GRB.EQUAL
+
+    def __init__(
+        self,
+        instance: Instance | None = None,
+        verbose=False,
+        env: gp.Env | None = None,
+        timer: PhaseTimer | None = None,
+        naming="objects",
+    ):
+        """
+        -@ instance: The instance to model. Per default the example instance.
+        -@ env: Environment of the model. Per default an own one is started.
+        -@ timer: Records the time of each phase of building the model and its size.
+        -@ naming: How the variables are named. With 'index' each new variable gets the
+            next index, so removed variables leave gaps. See backends.variable_names.
+        """
+        self.instance: Instance = instance or example_instance()
+        self.naming: str = naming
+        # Variables created so far, the index of the next one.
+        self._num_created: int = 0
+        self._own_env: gp.Env | None = None
+        if env is None:
+            env = self._own_env = gp.Env(empty=True)
+            if not verbose:
+                env.setParam("OutputFlag", 0)
+            env.start()
+        self.model: gp.Model = gp.Model(env=env)
+        self.model.ModelSense = gp.GRB.MINIMIZE
+
+        self.variables: dict[ModelObject, gp.Var] = {}
+        self.by_pair: dict[StationPair, list[ModelObject]] = {}
+        self.trip_constrs: dict[StationPair, list[gp.Constr]] = {}
+        self.flow_constrs: dict[Node, tuple[gp.Constr, gp.Constr]] = {}
+        # Values of the variables in the last solution, the start of the next one.
+        self.solution: dict[ModelObject, float] = {}
+
+        with phase(timer, "station constraints"):
+            for station in self.instance.stations:
+                for arrangement in station.allowed_arrangements:
+                    self.flow_constrs[(station.name, arrangement)] = (
+                        self._add_row(gp.GRB.EQUAL, 0, "Flow constraint into stations"),
+                        self._add_row(
+                            gp.GRB.EQUAL, 0, "Flow constraint out of stations"
+                        ),
+                    )
+            self._add_station_rows()
+        trips: Counter[StationPair] = _trip_pairs(self.instance)
+        with phase(timer, "variables"):
+            by_pair = _connections_by_pair(self.instance)
+            for origin, destination in product(self.instance.stations, repeat=2):
+                pair: StationPair = (origin.name, destination.name)
+                self._set_pair(pair, by_pair.get(pair, []), pair in trips)
+        with phase(timer, "fullfill_timetable_trips"):
+            for pair, num_trips in trips.items():
+                for _ in range(num_trips):
+                    self._add_trip_row(pair)
+        count_model(timer, self.model)
+
+    def _add_row(self, sense: str, rhs: float, name: str) -> gp.Constr:
+        # Rows start empty, the variables are added to them with their columns.
+        return self.model.addLConstr(gp.LinExpr(), sense, rhs, name)
+
+    @abstractmethod
+    def _add_station_rows(self): ...
+
+    @abstractmethod
+    def _objects_between(
+        self, pair: StationPair, connections: list[Connection], is_trip: bool
+    ) -> list[ModelObject]:
+        """
+        The objects with a variable between the pair of stations.
+
+        -@ connections: The connections between the stations.
+        -@ is_trip: The stations are the origin and destination of a timetable trip.
+        """
+
+    @abstractmethod
+    def _column(self, obj: ModelObject, pair: StationPair) -> gp.Column:
+        """
+        Coefficients of the variable of the object in the existing rows.
+        """
+
+    @abstractmethod
+    def _trip_variables(self, pair: StationPair) -> list[gp.Var]:
+        """
+        Variables in the rows of the timetable trips between the pair of stations.
+        """
+
+    def _add_flow_terms(
+        self,
+        column: gp.Column,
+        origins: Iterable[Node],
+        destinations: Iterable[Node],
+        inside: bool,
+    ):
+        # Into stations: outside into == inside out. Out of stations: inside into == outside out.
+        for node in destinations:
+            column.addTerms(1, self.flow_constrs[node][1 if inside else 0])
+        for node in origins:
+            column.addTerms(-1, self.flow_constrs[node][0 if inside else 1])
+
+    def _add_trip_row(self, pair: StationPair):
+        self.trip_constrs.setdefault(pair, []).append(
+            self.model.addLConstr(
+                gp.quicksum(self._trip_variables(pair)),
+                self.trip_sense,
+                1,
+                "Trips need to be implemented",
+            )
+        )
+
+    def _set_pair(
+        self, pair: StationPair, connections: list[Connection], is_trip: bool
+    ):
+        """
+        Replaces the variables between the pair of stations. Variables of objects kept
+        by the key only change their cost if the weight changed.
+        """
+        old: dict[Any, ModelObject] = dict(
+            (obj.key, obj) for obj in self.by_pair.get(pair, ())
+        )
+        objects = self._objects_between(pair, connections, is_trip)
+        for obj in objects:
+            previous: ModelObject | None = old.pop(obj.key, None)
+            if previous is None:
+                self.variables[obj] = self.model.addVar(
+                    vtype="B",
+                    obj=obj.weight,
+                    name=variable_name(self.naming, self._num_created, obj),
+                    column=self._column(obj, pair),
+                )
+                self._num_created += 1
+                continue
+            # Key the variable by the new object with the current weight.
+            var: gp.Var = self.variables.pop(previous)
+            if previous.weight != obj.weight:
+                var.Obj = obj.weight
+            self.variables[obj] = var
+            if previous in self.solution:
+                self.solution[obj] = self.solution.pop(previous)
+        for obj in old.values():
+            self.model.remove(self.variables.pop(obj))
+            self.solution.pop(obj, None)
+        if objects:
+            self.by_pair[pair] = objects
+        else:
+            self.by_pair.pop(pair, None)
+
+    def update(self, instance: Instance):
+        """
+        Changes the model in place to the one of the instance.
+        The instance can add or remove timetable trips, connections and distances, but
+        must have the same stations and settings.
+        """
+        if _stations_key(instance) != _stations_key(self.instance):
+            raise RuntimeError(
+                "The stations or settings of the instance changed, which needs a new model."
+            )
+        old_cons: dict[Any, Connection] = dict(
+            (con.key, con) for con in self.instance.connections
+        )
+        new_cons: dict[Any, Connection] = dict(
+            (con.key, con) for con in instance.connections
+        )
+        changed: set[StationPair] = set(
+            (key[0], key[1]) for key in old_cons.keys() ^ new_cons.keys()
+        )
+        changed.update(
+            (key[0], key[1])
+            for key in old_cons.keys() & new_cons.keys()
+            if old_cons[key].weight != new_cons[key].weight
+        )
+        old_trips: Counter[StationPair] = _trip_pairs(self.instance)
+        new_trips: Counter[StationPair] = _trip_pairs(instance)
+        changed.update(
+            pair
+            for pair in old_trips.keys() ^ new_trips.keys()
+            if old_trips[pair] == 0 or new_trips[pair] == 0
+        )
+
+        # Removed trips first, so new variables are only added to the remaining rows.
+        for pair in list(self.trip_constrs):
+            constrs: list[gp.Constr] = self.trip_constrs[pair]
+            while len(constrs) > new_trips[pair]:
+                self.model.remove(constrs.pop())
+            if not constrs:
+                del self.trip_constrs[pair]
+        by_pair = _connections_by_pair(instance)
+        for pair in changed:
+            self._set_pair(pair, by_pair.get(pair, []), pair in new_trips)
+        for pair, num_trips in new_trips.items():
+            for _ in range(num_trips - len(self.trip_constrs.get(pair, ()))):
+                self._add_trip_row(pair)
+        self.instance = instance
+
+    def _change(self, data: dict[str, Any]):
+        self.update(Instance.from_dict(data))
+
+    def add_trip(self, origin: str, destination: str):
+        data: dict[str, Any] = self.instance.to_dict()
+        data["timetable_trips"].append([origin, destination])
+        self._change(data)
+
+    def remove_trip(self, origin: str, destination: str):
+        """
+        Removes one timetable trip from origin to destination.
+        """
+        data: dict[str, Any] = self.instance.to_dict()
+        if [origin, destination] not in data["timetable_trips"]:
+            raise RuntimeError(
+                f"There is no timetable trip from '{origin}' to '{destination}'."
+            )
+        data["timetable_trips"].remove([origin, destination])
+        self._change(data)
+
+    def set_distance(self, origin: str, destination: str, distance: int | None):
+        """
+        -@ distance: The new distance. None makes the stations unreachable.
+        """
+        data: dict[str, Any] = self.instance.to_dict()
+        data["distance"].setdefault(origin, {})[destination] = distance
+        if distance is None:
+            del data["distance"][origin][destination]
+        self._change(data)
+
+    def add_connection_rule(self, rule: dict[str, Any]):
+        """
+        -@ rule: Connections inside or between stations. See Instance.
+        """
+        data: dict[str, Any] = self.instance.to_dict()
+        data["connections"].append(dict(rule))
+        self._change(data)
+
+    def remove_connection_rule(self, rule: dict[str, Any]):
+        data: dict[str, Any] = self.instance.to_dict()
+        if dict(rule) not in data["connections"]:
+            raise RuntimeError(f"The instance has no connection rule {rule}.")
+        data["connections"].remove(dict(rule))
+        self._change(data)
+
+    def optimize(self, time_limit: float | None = None) -> str:
+        """
+        Optimizes the model starting from the last solution. Variables added since then
+        are left to Gurobi to complete the start.
+        Returns the status of the model as in backends.
+        """
+        if time_limit is not None:
+            self.model.Params.TimeLimit = time_limit
+        objects: list[ModelObject] = list(self.variables)
+        variables: list[gp.Var] = list(self.variables.values())
+        if self.solution:
+            self.model.update()
+            self.model.setAttr(
+                "Start",
+                variables,
+                [self.solution.get(obj, gp.GRB.UNDEFINED) for obj in objects],
+            )
+        self.model.optimize()
+        if self.model.SolCount > 0:
+            self.solution = dict(zip(objects, self.model.getAttr("X", variables)))
+        return gurobi_status(self.model)
+
+    @property
+    def objective_value(self) -> float:
+        return self.model.ObjVal
+
+    def chosen(self) -> list[ModelObject]:
+        """
+        The objects chosen by the last solution.
+        """
+        return [obj for obj, value in self.solution.items() if value > 0.5]
+
+    def close(self):
+        self.model.dispose()
+        if self._own_env is not None:
+            self._own_env.dispose()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class IncrementalGraphModel(IncrementalModel):
+    """
+    The graph model of graph.configure_model with a variable per connection.
+    """
+
+    trip_sense: str = gp.GRB.GREATER_EQUAL
+
+    def _add_station_rows(self):
+        stations = self.instance.stations
+        max_train_len_global: int = self.instance.max_train_len_global
+        self.length_constrs: dict[str, gp.Constr] = dict(
+            (
+                station.name,
+                self._add_row(
+                    gp.GRB.LESS_EQUAL,
+                    station.max_train_len,
+                    "Respect the stations max train length",
+                ),
+            )
+            for station in stations
+        )
+        # Keyed by (destination, origin). The first row limits the trains at position
+        # one, row i + 1 needs at least as many trains at position i as at i + 1.
+        self.position_constrs: dict[StationPair, list[gp.Constr]] = {}
+        for stationA, stationB in product(stations, repeat=2):
+            self.position_constrs[(stationA.name, stationB.name)] = [
+                self._add_row(
+                    gp.GRB.LESS_EQUAL, 1, "Only one train can be at possition one"
+                )
+            ] + [
+                self._add_row(
+                    gp.GRB.GREATER_EQUAL,
+                    0,
+                    f"Need at least as many trains at position {i + 1} as at position {i}",
+                )
+                for i in range(max_train_len_global - 1)
+            ]
+
+    def _objects_between(
+        self, pair: StationPair, connections: list[Connection], is_trip: bool
+    ) -> list[Connection]:
+        return connections
+
+    def _column(self, con: Connection, pair: StationPair) -> gp.Column:
+        column = gp.Column()
+        for constr in self.trip_constrs.get(pair, ()):
+            column.addTerms(1, constr)
+        self._add_flow_terms(
+            column,
+            [(con.origin.name, con.arrangement_origin)],
+            [(con.destination.name, con.arrangement_destination)],
+            con.inside,
+        )
+        if not con.inside:
+            column.addTerms(1, self.length_constrs[con.destination.name])
+            rows: list[gp.Constr] = self.position_constrs[
+                (con.destination.name, con.origin.name)
+            ]
+            position: int = con.arrangement_origin[2]
+            if position == 0:
+                column.addTerms(1, rows[0])
+            else:
+                column.addTerms(-1, rows[position])
+            if position + 1 < len(rows):
+                column.addTerms(1, rows[position + 1])
+        return column
+
+    def _trip_variables(self, pair: StationPair) -> list[gp.Var]:
+        return [self.variables[con] for con in self.by_pair.get(pair, ())]
+
+
+class IncrementalHypergraphModel(IncrementalModel):
+    """
+    The hypergraph model of hypergraph.configure_model with a variable per hyperedge of
+    enumerate_hyperedges_between. Dominated hyperedges are not pruned, as a change of
+    the weights can make them the cheaper ones.
+    """
+
+    def _add_station_rows(self):
+        self.inside_constrs: dict[str, gp.Constr] = dict(
+            (
+                station.name,
+                self._add_row(
+                    gp.GRB.LESS_EQUAL, 1, "Only one hyperedge inside a train station"
+                ),
+            )
+            for station in self.instance.stations
+        )
+
+    def _objects_between(
+        self, pair: StationPair, connections: list[Connection], is_trip: bool
+    ) -> list[Hyperedge]:
+        return list(
+            enumerate_hyperedges_between(
+                self.instance.get_station(pair[0]),
+                self.instance.get_station(pair[1]),
+                connections,
+                is_trip,
+                self.instance.max_train_len_global,
+            )
+        )
+
+    def _column(self, h: Hyperedge, pair: StationPair) -> gp.Column:
+        column = gp.Column()
+        if h.inside:
+            for station in set(arc.origin.name for arc in h.arces):
+                column.addTerms(1, self.inside_constrs[station])
+        else:
+            for constr in self.trip_constrs.get(pair, ()):
+                column.addTerms(1, constr)
+        self._add_flow_terms(
+            column,
+            [(station.name, arrangement) for station, arrangement in h.origins],
+            [(station.name, arrangement) for station, arrangement in h.destinations],
+            h.inside,
+        )
+        return column
+
+    def _trip_variables(self, pair: StationPair) -> list[gp.Var]:
+        return [self.variables[h] for h in self.by_pair.get(pair, ()) if not h.inside]
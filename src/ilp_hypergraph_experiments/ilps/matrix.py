@@ -0,0 +1,127 @@
+import numpy as np
+import scipy.sparse as sp
+
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    import gurobipy as gp
+
+# Senses of rows, the same characters as the ones of Gurobi, so rows can be built and
+# solved without it.
+LESS_EQUAL: str = "<"
+GREATER_EQUAL: str = ">"
+EQUAL: str = "="
+
+# A linear constraint given by its terms as (variable indices, coefficient),
+# its sense, its right hand side and its name.
+type Row = tuple[list[tuple[np.ndarray, float]], str, float, str]
+
+
+def add_rows(m: "gp.Model", variables: "list[gp.Var]", rows: Iterable[Row]):
+    """
+    Adds the rows one by one as linear constraints.
+    """
+    import gurobipy as gp
+
+    for terms, sense, rhs, name in rows:
+        coefficients: list[float] = []
+        row_vars: list[gp.Var] = []
+        for indices, coefficient in terms:
+            coefficients.extend(coefficient for _ in range(len(indices)))
+            row_vars.extend(variables[i] for i in indices)
+        m.addLConstr(gp.LinExpr(coefficients, row_vars), sense, rhs, name)
+
+
+def rows_to_matrix(
+    rows: Iterable[Row], num_columns: int
+) -> tuple[sp.csr_matrix, np.ndarray, np.ndarray, list[str]]:
+    """
+    Assembles the rows into a sparse constraint matrix with senses, right hand sides and names.
+    """
+    indptr: list[int] = [0]
+    indices: list[np.ndarray] = []
+    data: list[np.ndarray] = []
+    senses: list[str] = []
+    rhs: list[float] = []
+    names: list[str] = []
+    for terms, sense, row_rhs, name in rows:
+        length = indptr[-1]
+        for columns, coefficient in terms:
+            indices.append(np.asarray(columns, dtype=np.int64))
+            data.append(np.full(len(columns), coefficient, dtype=np.float64))
+            length += len(columns)
+        indptr.append(length)
+        senses.append(sense)
+        rhs.append(row_rhs)
+        names.append(name)
+    matrix = sp.csr_matrix(
+        (
+            np.concatenate(data) if data else np.zeros(0),
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+            np.array(indptr, dtype=np.int64),
+        ),
+        shape=(len(senses), num_columns),
+    )
+    matrix.sum_duplicates()
+    return matrix, np.array(senses), np.array(rhs, dtype=np.float64), names
+
+
+def add_matrix_rows(m: "gp.Model", x: "gp.MVar", rows: Iterable[Row]) -> "gp.MConstr":
+    """
+    Adds all rows at once with the matrix API.
+    """
+    matrix, senses, rhs, names = rows_to_matrix(rows, x.shape[0])
+    constrs = m.addMConstr(matrix, x, senses, rhs)
+    m.setAttr("ConstrName", constrs.tolist(), names)
+    return constrs
+
+
+def violated_rows(
+    matrix: sp.csr_matrix,
+    senses: np.ndarray,
+    rhs: np.ndarray,
+    values: np.ndarray,
+    tolerance: float = 1e-6,
+) -> np.ndarray:
+    """
+    Mask of the rows of rows_to_matrix the values violate.
+    """
+    lhs: np.ndarray = matrix @ values
+    return np.where(
+        senses == LESS_EQUAL,
+        lhs > rhs + tolerance,
+        np.where(
+            senses == GREATER_EQUAL,
+            lhs < rhs - tolerance,
+            np.abs(lhs - rhs) > tolerance,
+        ),
+    )
+
+
+def lazy_callback(variables: "list[gp.Var]", rows: Iterable[Row]) -> callable:
+    """
+    Gurobi callback adding the rows violated by a new incumbent as lazy constraints.
+    The model needs the parameter LazyConstraints set.
+    """
+    import gurobipy as gp
+
+    matrix, senses, rhs, _ = rows_to_matrix(rows, len(variables))
+
+    def callback(m: gp.Model, where: int):
+        if where != gp.GRB.Callback.MIPSOL:
+            return
+        values = np.array(m.cbGetSolution(variables))
+        for i in np.flatnonzero(violated_rows(matrix, senses, rhs, values)).tolist():
+            start, end = matrix.indptr[i], matrix.indptr[i + 1]
+            expr = gp.LinExpr(
+                matrix.data[start:end].tolist(),
+                [variables[j] for j in matrix.indices[start:end].tolist()],
+            )
+            if senses[i] == LESS_EQUAL:
+                m.cbLazy(expr <= rhs[i])
+            elif senses[i] == GREATER_EQUAL:
+                m.cbLazy(expr >= rhs[i])
+            else:
+                m.cbLazy(expr == rhs[i])
+
+    return callback
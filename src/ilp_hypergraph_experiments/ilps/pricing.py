@@ -0,0 +1,768 @@
+from ilp_hypergraph_experiments.instance import Instance, example_instance
+from ilp_hypergraph_experiments.model_objects import Hyperedge
+from ilp_hypergraph_experiments.compact import (
+    CompactModel,
+    arrangement_position,
+    group_indices,
+)
+from ilp_hypergraph_experiments.ilps.matrix import GREATER_EQUAL, LESS_EQUAL, Row
+from ilp_hypergraph_experiments.ilps.backends import (
+    Backend,
+    OPTIMAL,
+    INFEASIBLE,
+    UNKNOWN,
+    count_model,
+    get_backend,
+)
+from ilp_hypergraph_experiments.ilps import hypergraph
+from ilp_hypergraph_experiments.ilps.reporting import print_chosen
+from ilp_hypergraph_experiments.timing import PhaseTimer, count, phase
+from itertools import combinations, permutations
+import numpy as np
+import scipy.sparse as sp
+import math
+import time
+
+from typing import Self, Sequence
+
+# A column of the master problem: (sorted connection ids, inside)
+type Column = tuple[tuple[int, ...], bool]
+
+
+def columns_model(compact: CompactModel, columns: Sequence[Column]) -> CompactModel:
+    """
+    Compact model with the columns as hyperedges over the connections of compact.
+    """
+    return CompactModel(
+        compact.stations,
+        compact.connections,
+        compact.trips,
+        hyperedge_indptr=np.cumsum(
+            [0] + [len(arces) for arces, _ in columns], dtype=np.int64
+        ),
+        hyperedge_arces=np.array(
+            [arc for arces, _ in columns for arc in arces], dtype=np.int32
+        ),
+        hyperedge_inside=np.array([inside for _, inside in columns], dtype=np.bool_),
+        max_train_len=compact.max_train_len,
+    )
+
+
+def _pair_max_len(compact: CompactModel, origins: np.ndarray, destinations: np.ndarray):
+    # Same as in enumerate_hyperedges_between.
+    return np.minimum(
+        np.minimum(
+            compact.station_max_len[origins], compact.station_max_len[destinations]
+        ),
+        compact.max_train_len,
+    )
+
+
+def seed_columns(compact: CompactModel) -> list[Column]:
+    """
+    The valid hyperedges of a single connection, which start the restricted master problem.
+    """
+    cons: np.ndarray = compact.connections
+    num_stations: int = len(compact.stations)
+    trip_pairs = np.isin(
+        cons["origin"].astype(np.int64) * num_stations + cons["destination"],
+        compact.trips[:, 0].astype(np.int64) * num_stations + compact.trips[:, 1],
+    )
+    outside = (
+        ~cons["inside"]
+        & (arrangement_position(cons["arrangement_origin"], compact.max_train_len) == 0)
+        & (
+            arrangement_position(cons["arrangement_destination"], compact.max_train_len)
+            == 0
+        )
+        & (_pair_max_len(compact, cons["origin"], cons["destination"]) >= 1)
+        & (
+            ~trip_pairs
+            | (cons["arrangement_origin"] == cons["arrangement_destination"])
+        )
+    )
+    return [
+        ((i,), bool(cons["inside"][i]))
+        for i in np.flatnonzero(cons["inside"] | outside)
+    ]
+
+
+class InsidePricing(object):
+    """
+    Pricing problem of the hyperedges inside a station. The constraints of a node only
+    count it once, no matter how many connections of a hyperedge share it, so the cost
+    of a hyperedge is no sum over its connections.
+    Small problems are solved by evaluating all sets of connections at once and bigger
+    ones as binary program over the connections and the nodes they use.
+    """
+
+    def __init__(
+        self,
+        arces: np.ndarray,
+        origin_nodes: np.ndarray,
+        destination_nodes: np.ndarray,
+        max_len: int,
+        backend="gurobi",
+        max_enumerated: int = 200_000,
+    ):
+        """
+        -@ arces: Ids of the inside connections of the station.
+        -@ origin_nodes, destination_nodes: Node ids of the connections.
+        -@ max_enumerated: Most sets of connections to evaluate instead of solving a
+            binary program.
+        """
+        self.arces: np.ndarray = arces
+        self.origins, self.origin_of = np.unique(origin_nodes, return_inverse=True)
+        self.destinations, self.destination_of = np.unique(
+            destination_nodes, return_inverse=True
+        )
+        self.max_len: int = max_len
+        self.solver: Backend | None = None
+        n: int = len(arces)
+        if sum(math.comb(n, k) for k in range(1, max_len + 1)) <= max_enumerated:
+            self._enumerate_sets()
+        else:
+            self._build_program(backend)
+
+    def _enumerate_sets(self):
+        # Sets of connections as rows padded with the index n, which costs nothing.
+        n: int = len(self.arces)
+        self.sets: np.ndarray = np.array(
+            [
+                subset + (n,) * (self.max_len - k)
+                for k in range(1, self.max_len + 1)
+                for subset in combinations(range(n), k)
+            ],
+            dtype=np.int64,
+        ).reshape(-1, self.max_len)
+        self.set_origins: np.ndarray = self._distinct_nodes(self.origin_of)
+        self.set_destinations: np.ndarray = self._distinct_nodes(self.destination_of)
+
+    def _distinct_nodes(self, node_of: np.ndarray) -> np.ndarray:
+        # Nodes of each set, with repeated ones replaced by the padding index.
+        padding: int = int(node_of.max()) + 1
+        nodes = np.sort(np.append(node_of, padding)[self.sets], axis=1)
+        nodes[:, 1:][nodes[:, 1:] == nodes[:, :-1]] = padding
+        return nodes
+
+    def _build_program(self, backend: str):
+        n: int = len(self.arces)
+        self.solver = get_backend(backend)
+        x = self.solver.add_variables(np.zeros(n))
+        u = self.solver.add_variables(np.zeros(len(self.origins)))
+        v = self.solver.add_variables(np.zeros(len(self.destinations)))
+
+        rows: list[Row] = []
+        # A node is used iff one of its connections is chosen.
+        for node_vars, node_of in ((u, self.origin_of), (v, self.destination_of)):
+            for i in range(n):
+                rows.append(
+                    (
+                        [
+                            (x[i : i + 1], 1.0),
+                            (node_vars[node_of[i] : node_of[i] + 1], -1.0),
+                        ],
+                        LESS_EQUAL,
+                        0,
+                        "",
+                    )
+                )
+            for node, arc_ids in group_indices(node_of).items():
+                rows.append(
+                    (
+                        [(node_vars[node : node + 1], 1.0), (x[arc_ids], -1.0)],
+                        LESS_EQUAL,
+                        0,
+                        "",
+                    )
+                )
+        rows.append(([(x, 1.0)], GREATER_EQUAL, 1, ""))
+        rows.append(([(x, 1.0)], LESS_EQUAL, self.max_len, ""))
+        self.solver.add_rows(rows)
+
+    def price(
+        self,
+        weights: np.ndarray,
+        into_duals: np.ndarray,
+        out_duals: np.ndarray,
+        limit: float,
+    ) -> Column | None:
+        """
+        The cheapest inside hyperedge if its cost without the dual of the station is
+        below limit.
+
+        -@ weights: Weights of all connections.
+        -@ into_duals, out_duals: Duals of the flow constraints per node id.
+        """
+        arc_costs = weights[self.arces]
+        origin_costs = into_duals[self.origins]
+        destination_costs = -out_duals[self.destinations]
+        if self.solver is None:
+            costs = (
+                np.append(arc_costs, 0)[self.sets].sum(axis=1)
+                + np.append(origin_costs, 0)[self.set_origins].sum(axis=1)
+                + np.append(destination_costs, 0)[self.set_destinations].sum(axis=1)
+            )
+            k = int(np.argmin(costs))
+            if costs[k] >= limit:
+                return None
+            chosen = self.sets[k][self.sets[k] < len(self.arces)]
+            return (tuple(sorted(self.arces[chosen].tolist())), True)
+
+        # Lower bound without solving: A node is shared by at most max_len connections,
+        # so each connection pays at least a share of the cost of its nodes.
+        shares = np.sort(
+            arc_costs
+            + self._share(origin_costs)[self.origin_of]
+            + self._share(destination_costs)[self.destination_of]
+        )
+        if shares[0] + np.minimum(shares[1 : self.max_len], 0).sum() >= limit:
+            return None
+        self.solver.set_objective(
+            np.concatenate((arc_costs, origin_costs, destination_costs))
+        )
+        status = self.solver.solve()
+        if status != OPTIMAL:
+            raise RuntimeError(f"Pricing problem of an inside hyperedge is {status}.")
+        if self.solver.objective_value >= limit:
+            return None
+        chosen = self.solver.values()[: len(self.arces)] > 0.5
+        return (tuple(sorted(self.arces[chosen].tolist())), True)
+
+    def _share(self, costs: np.ndarray) -> np.ndarray:
+        return np.where(costs < 0, costs, costs / self.max_len)
+
+    def close(self):
+        if self.solver is not None:
+            self.solver.close()
+
+
+class OutsidePricing(object):
+    """
+    Pricing problem of the hyperedges leaving a station towards another one.
+    Such a hyperedge has one connection per origin position of a train of length L and
+    its destination positions are a permutation of them. As each connection has its own
+    origin and destination node, the reduced cost of a hyperedge is the sum of the ones
+    of its connections, so the cheapest hyperedge of a length takes the cheapest
+    connection of each pair of positions along the best permutation.
+    """
+
+    def __init__(
+        self,
+        arces: np.ndarray,
+        origin_positions: np.ndarray,
+        destination_positions: np.ndarray,
+        outside: np.ndarray,
+        max_len: int,
+    ):
+        """
+        -@ arces: Ids of the connections that can be part of a hyperedge.
+        -@ outside: Whether each connection leaves the station.
+        """
+        self.arces: np.ndarray = arces
+        self.origin_positions: np.ndarray = origin_positions
+        self.destination_positions: np.ndarray = destination_positions
+        self.outside: np.ndarray = outside
+        self.max_len: int = max_len
+        self.permutations: list[np.ndarray] = [
+            np.array(list(permutations(range(length))), dtype=np.int64)
+            for length in range(1, max_len + 1)
+        ]
+
+    def _cheapest(
+        self, costs: np.ndarray, mask: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        # Cheapest connection per (origin position, destination position).
+        best = np.full((self.max_len, self.max_len), np.inf)
+        best_arc = np.full((self.max_len, self.max_len), -1, dtype=np.int64)
+        for i in np.flatnonzero(mask)[np.argsort(-costs[mask], kind="stable")]:
+            # Descending order, so the cheapest connection is written last.
+            best[self.origin_positions[i], self.destination_positions[i]] = costs[i]
+            best_arc[self.origin_positions[i], self.destination_positions[i]] = i
+        return best, best_arc
+
+    def price(self, reduced_costs: np.ndarray) -> list[tuple[float, Column]]:
+        """
+        The cheapest hyperedge of each permutation of the positions and its cost without
+        the duals of the trips.
+
+        -@ reduced_costs: Reduced cost of all connections.
+        """
+        costs = reduced_costs[self.arces]
+        best, best_arc = self._cheapest(costs, np.ones(len(costs), dtype=np.bool_))
+        best_outside, best_outside_arc = self._cheapest(costs, self.outside)
+        # Extra cost of taking an outside connection, if the cheapest one is inside.
+        finite = np.isfinite(best)
+        extra = np.where(finite, best_outside - np.where(finite, best, 0), np.inf)
+        is_outside = np.zeros_like(best, dtype=np.bool_)
+        is_outside[best_arc >= 0] = self.outside[best_arc[best_arc >= 0]]
+
+        found: list[tuple[float, Column]] = []
+        for perms in self.permutations:
+            positions = np.arange(perms.shape[1])
+            total = best[positions, perms].sum(axis=1)
+            perm_extra = extra[positions, perms]
+            has_outside = is_outside[positions, perms].any(axis=1)
+            # Hyperedges need at least one connection leaving the station.
+            total = np.where(has_outside, total, total + perm_extra.min(axis=1))
+            for k in np.flatnonzero(np.isfinite(total)).tolist():
+                perm = perms[k]
+                chosen = best_arc[positions, perm].copy()
+                if not has_outside[k]:
+                    p = int(np.argmin(perm_extra[k]))
+                    chosen[p] = best_outside_arc[p, perm[p]]
+                found.append(
+                    (
+                        float(total[k]),
+                        (tuple(sorted(self.arces[chosen].tolist())), False),
+                    )
+                )
+        return found
+
+
+class PricingProblems(object):
+    """
+    The pricing problems of all pairs of stations against the duals of the rows of
+    hypergraph.configure_backend.
+    """
+
+    def __init__(self, compact: CompactModel, backend="gurobi"):
+        self.compact: CompactModel = compact
+        cons: np.ndarray = compact.connections
+        num_stations: int = len(compact.stations)
+        self.num_trips: int = len(compact.trips)
+        self.weights: np.ndarray = cons["weight"].astype(np.float64)
+        self.origin_nodes: np.ndarray = compact.node_ids(
+            cons["origin"], cons["arrangement_origin"]
+        )
+        self.destination_nodes: np.ndarray = compact.node_ids(
+            cons["destination"], cons["arrangement_destination"]
+        )
+        # Node ids of the flow constraints in the order of their rows.
+        self.flow_nodes: np.ndarray = compact.node_ids(
+            np.repeat(np.arange(num_stations), np.diff(compact.allowed_indptr)).astype(
+                np.int64
+            ),
+            compact.allowed_arrangements,
+        )
+        self.num_nodes: int = num_stations * compact.num_arrangement_ids
+        trip_pairs: np.ndarray = (
+            compact.trips[:, 0].astype(np.int64) * num_stations + compact.trips[:, 1]
+        )
+        self.trip_rows: dict[int, np.ndarray] = group_indices(trip_pairs)
+
+        origin_positions = arrangement_position(
+            cons["arrangement_origin"], compact.max_train_len
+        )
+        destination_positions = arrangement_position(
+            cons["arrangement_destination"], compact.max_train_len
+        )
+        keeps_arrangement = (
+            cons["arrangement_origin"] == cons["arrangement_destination"]
+        )
+        pairs = cons["origin"].astype(np.int64) * num_stations + cons["destination"]
+
+        # (pair, pricing problem)
+        self.outside: list[tuple[int, OutsidePricing]] = []
+        # (station, pricing problem)
+        self.inside: list[tuple[int, InsidePricing]] = []
+        for pair, arces in group_indices(pairs).items():
+            origin, destination = divmod(pair, num_stations)
+            max_len = int(
+                _pair_max_len(compact, np.array(origin), np.array(destination))
+            )
+            inside = arces[cons["inside"][arces]]
+            if len(inside) and max_len >= 1:
+                self.inside.append(
+                    (
+                        origin,
+                        InsidePricing(
+                            inside,
+                            self.origin_nodes[inside],
+                            self.destination_nodes[inside],
+                            max_len,
+                            backend,
+                        ),
+                    )
+                )
+            usable = (origin_positions[arces] < max_len) & (
+                destination_positions[arces] < max_len
+            )
+            if pair in self.trip_rows:
+                usable &= keeps_arrangement[arces]
+            arces = arces[usable]
+            if not cons["inside"][arces].all():
+                self.outside.append(
+                    (
+                        pair,
+                        OutsidePricing(
+                            arces,
+                            origin_positions[arces],
+                            destination_positions[arces],
+                            ~cons["inside"][arces],
+                            max_len,
+                        ),
+                    )
+                )
+
+    def price(
+        self,
+        duals: np.ndarray,
+        tolerance: float = 1e-6,
+        known: set[Column] | None = None,
+    ) -> list[Column]:
+        """
+        New hyperedges with negative reduced cost, at most one per inside pricing
+        problem and one per permutation of the positions of an outside one.
+
+        -@ known: Hyperedges that are not new.
+        """
+        known = known or set()
+        trip_duals = duals[: self.num_trips]
+        flow_duals = duals[self.num_trips : self.num_trips + 2 * len(self.flow_nodes)]
+        station_duals = duals[self.num_trips + 2 * len(self.flow_nodes) :]
+        # The first flow row of a node counts the outside hyperedges into it and the
+        # inside ones out of it, the second one the inside ones into it and the
+        # outside ones out of it.
+        into_duals = np.zeros(self.num_nodes)
+        into_duals[self.flow_nodes] = flow_duals[0::2]
+        out_duals = np.zeros(self.num_nodes)
+        out_duals[self.flow_nodes] = flow_duals[1::2]
+
+        found: list[Column] = []
+        reduced_costs = (
+            self.weights
+            - into_duals[self.destination_nodes]
+            + out_duals[self.origin_nodes]
+        )
+        for pair, problem in self.outside:
+            trips = self.trip_rows.get(pair)
+            trip_dual = trip_duals[trips].sum() if trips is not None else 0
+            for cost, column in problem.price(reduced_costs):
+                if cost - trip_dual < -tolerance and column not in known:
+                    found.append(column)
+        for station, problem in self.inside:
+            column = problem.price(
+                self.weights,
+                into_duals,
+                out_duals,
+                station_duals[station] - tolerance,
+            )
+            if column is not None and column not in known:
+                found.append(column)
+        return found
+
+    def close(self):
+        for _, problem in self.inside:
+            problem.close()
+
+
+class PricingResult(object):
+    """
+    Solution of the hypergraph model found by column generation.
+    """
+
+    def __init__(
+        self,
+        status: str,
+        objective_value: float | None,
+        lower_bound: float,
+        hyperedges: list[Hyperedge],
+        iterations: int,
+        num_columns: int,
+    ):
+        """
+        -@ lower_bound: Optimal value of the linear relaxation over all hyperedges.
+        -@ hyperedges: The chosen hyperedges.
+        -@ num_columns: Number of hyperedges in the final master problem.
+        """
+        self.status: str = status
+        self.objective_value: float | None = objective_value
+        self.lower_bound: float = lower_bound
+        self.hyperedges: list[Hyperedge] = hyperedges
+        self.iterations: int = iterations
+        self.num_columns: int = num_columns
+
+    @property
+    def gap(self) -> float | None:
+        if self.objective_value is None:
+            return None
+        return (self.objective_value - self.lower_bound) / max(
+            abs(self.objective_value), 1e-10
+        )
+
+
+class ColumnGeneration(object):
+    """
+    Restricted master problem of the hypergraph model over the generated hyperedges.
+    Artificial variables violate the timetable trips and flow constraints at a high
+    cost, so the restricted master problem is feasible before the right hyperedges are
+    found.
+    """
+
+    def __init__(
+        self,
+        instance: Instance,
+        backend="gurobi",
+        penalty: float = 1e6,
+        tolerance: float = 1e-6,
+        verbose=False,
+    ):
+        """
+        -@ penalty: Cost of an artificial variable.
+        -@ tolerance: Reduced cost below which a hyperedge is added.
+        """
+        self.compact: CompactModel = CompactModel.from_instance(instance)
+        self.tolerance: float = tolerance
+        self.verbose: bool = verbose
+        self.iterations: int = 0
+        self.problems: PricingProblems = PricingProblems(self.compact, backend)
+        self.master: Backend = get_backend(backend)
+        self.columns: list[Column] = []
+        self.known: set[Column] = set()
+        # Index of the variable of each column in the master problem.
+        self.variables: list[int] = []
+
+        seed = seed_columns(self.compact)
+        self.columns.extend(seed)
+        self.known.update(seed)
+        self.variables.extend(
+            hypergraph.configure_backend(
+                self.master, columns_model(self.compact, seed)
+            ).tolist()
+        )
+        # The trip and flow rows come first, followed by one row per station.
+        num_trips: int = len(self.compact.trips)
+        num_equal: int = self.master.num_rows - len(self.compact.stations)
+        equal = sp.identity(num_equal, format="csc")
+        artificial = sp.vstack(
+            (
+                sp.hstack((equal, -equal[:, num_trips:])),
+                sp.csc_matrix((len(self.compact.stations), 2 * num_equal - num_trips)),
+            )
+        ).tocsc()
+        self.artificial: np.ndarray = self.master.add_variables(
+            np.full(artificial.shape[1], penalty),
+            names=[f"artificial {i}" for i in range(artificial.shape[1])],
+            columns=artificial,
+            binary=False,
+        )
+        self.master.set_binary(False)
+
+    def add_columns(self, columns: list[Column]):
+        self.columns.extend(columns)
+        self.known.update(columns)
+        model = columns_model(self.compact, columns)
+        self.variables.extend(
+            self.master.add_variables(
+                model.hyperedge_weight,
+                columns=hypergraph.column_coefficients(model),
+                binary=False,
+            ).tolist()
+        )
+
+    def generate(self, max_iterations: int = 1000) -> str:
+        """
+        Solves the linear relaxation and adds the priced hyperedges until none has
+        negative reduced cost. Returns the status of the last relaxation.
+        """
+        for _ in range(max_iterations):
+            self.iterations += 1
+            status = self.master.solve()
+            if status != OPTIMAL:
+                return status
+            new: list[Column] = list(
+                dict.fromkeys(
+                    self.problems.price(self.master.duals(), self.tolerance, self.known)
+                )
+            )
+            if self.verbose:
+                print(
+                    f"Iteration {self.iterations}: LP {self.master.objective_value:.4f}, {len(new)} new hyperedges"
+                )
+            if not new:
+                return status
+            self.add_columns(new)
+        return self.master.solve()
+
+    def branch(
+        self,
+        max_nodes: int = 100,
+        max_iterations: int = 1000,
+        lower_bound: float = -math.inf,
+    ) -> np.ndarray | None:
+        """
+        Depth first search over fixings of hyperedges to one or zero, generating
+        hyperedges in every node. Branches on the hyperedge with the biggest fractional
+        value and tries fixing it to one first, so the first leaf is a dive.
+        Hyperedges fixed to zero are not generated again, so a node may miss better
+        hyperedges and the search is a heuristic.
+        Returns the values of the best integral solution or None.
+
+        -@ max_nodes: Number of solved nodes after which the search stops.
+        -@ lower_bound: The search stops once a solution reaches it.
+        """
+        best_value: float = math.inf
+        best: np.ndarray | None = None
+        # Fixings of the nodes as (variable, value)
+        stack: list[list[tuple[int, int]]] = [[]]
+        applied: list[int] = []
+        nodes: int = 0
+        # The weights are integers, so are the objective values of all solutions.
+        lower_bound = math.ceil(lower_bound - self.tolerance)
+        while stack and nodes < max_nodes and best_value > lower_bound:
+            fixings = stack.pop()
+            nodes += 1
+            self.master.set_bounds(
+                applied, np.zeros(len(applied)), np.ones(len(applied))
+            )
+            applied = [variable for variable, _ in fixings]
+            fixed = [value for _, value in fixings]
+            self.master.set_bounds(applied, fixed, fixed)
+            if self.generate(max_iterations) != OPTIMAL:
+                continue
+            values = self.master.values()
+            if (values[self.artificial] > self.tolerance).any() or math.ceil(
+                self.master.objective_value - self.tolerance
+            ) >= best_value:
+                continue
+            column_values = values[self.variables]
+            fractional = (column_values > self.tolerance) & (
+                column_values < 1 - self.tolerance
+            )
+            if not fractional.any():
+                best_value = self.master.objective_value
+                best = values
+                if self.verbose:
+                    print(f"Node {nodes}: solution {best_value}")
+                continue
+            variable = self.variables[
+                int(np.argmax(np.where(fractional, column_values, -1)))
+            ]
+            stack.append(fixings + [(variable, 0)])
+            stack.append(fixings + [(variable, 1)])
+        self.master.set_bounds(applied, np.zeros(len(applied)), np.ones(len(applied)))
+        if self.verbose:
+            print(f"Searched {nodes} nodes")
+        return best
+
+    def hyperedges(self, values: np.ndarray) -> list[Hyperedge]:
+        """
+        The hyperedges chosen by the values of the master problem.
+        """
+        model = columns_model(self.compact, self.columns)
+        return [
+            model.hyperedge(i)
+            for i in np.flatnonzero(values[self.variables] > 0.5).tolist()
+        ]
+
+    def close(self):
+        self.master.close()
+        self.problems.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def solve_column_generation(
+    instance: Instance | None = None,
+    backend="gurobi",
+    max_iterations: int = 1000,
+    max_nodes: int = 100,
+    penalty: float = 1e6,
+    tolerance: float = 1e-6,
+    time_limit: float | None = None,
+    verbose=False,
+    timer: PhaseTimer | None = None,
+) -> PricingResult:
+    """
+    Solves the hypergraph model without enumerating all hyperedges.
+    The linear relaxation is solved over a restricted set of hyperedges, starting with
+    seed_columns, and hyperedges with negative reduced cost are added until there are
+    none. A search over fixings of hyperedges then generates the hyperedges of integral
+    solutions and the binary program is solved over all generated hyperedges (price and
+    branch). Its solution is not always optimal, the lower bound tells how far off it
+    can be.
+
+    -@ max_iterations: Rounds of pricing per linear relaxation.
+    -@ max_nodes: Nodes searched by ColumnGeneration.branch. 0 turns it off.
+    -@ penalty, tolerance: See ColumnGeneration.
+    -@ time_limit: Time limit of the binary program.
+    -@ timer: Records the time of each phase and counts the generated hyperedges.
+    """
+    instance = instance or example_instance()
+    with phase(timer, "master problem"):
+        cg = ColumnGeneration(instance, backend, penalty, tolerance, verbose)
+    with cg:
+        with phase(timer, "pricing"):
+            status = cg.generate(max_iterations)
+        if status != OPTIMAL:
+            raise RuntimeError(f"Restricted master problem is {status}.")
+        lower_bound: float = cg.master.objective_value
+        if (cg.master.values()[cg.artificial] > tolerance).any():
+            # Not even the relaxation over all hyperedges has a solution.
+            return PricingResult(
+                INFEASIBLE, None, lower_bound, [], cg.iterations, len(cg.columns)
+            )
+        with phase(timer, "branching"):
+            start = cg.branch(max_nodes, max_iterations, lower_bound)
+
+        with phase(timer, "optimize"):
+            cg.master.set_binary(True)
+            if start is not None:
+                # Hyperedges generated after the solution was found are not part of it.
+                values = np.zeros(cg.master.num_variables)
+                values[: len(start)] = start
+                cg.master.set_start(values)
+            status = cg.master.solve(time_limit)
+        count(timer, "pricing iterations", cg.iterations)
+        count(timer, "hyperedges generated", len(cg.columns))
+        count_model(timer, cg.master)
+        objective_value: float | None = None
+        chosen: list[Hyperedge] = []
+        if status == OPTIMAL:
+            values = cg.master.values()
+            if (values[cg.artificial] > 0.5).any():
+                # No combination of the generated hyperedges is a solution.
+                status = UNKNOWN
+            else:
+                objective_value = cg.master.objective_value
+                chosen = cg.hyperedges(values)
+        return PricingResult(
+            status,
+            objective_value,
+            lower_bound,
+            chosen,
+            cg.iterations,
+            len(cg.columns),
+        )
+
+
+def run_priced_model(
+    verbose=False,
+    instance: Instance | None = None,
+    backend="gurobi",
+    timer: PhaseTimer | None = None,
+):
+    """
+    Solves the hypergraph model by column generation. See solve_column_generation.
+    """
+    tic = time.perf_counter()
+    result = solve_column_generation(
+        instance, backend=backend, verbose=verbose, timer=timer
+    )
+    toc = time.perf_counter()
+    if verbose:
+        print(
+            f"Generated {result.num_columns} hyperedges in {result.iterations} iterations"
+        )
+        print(f"Lower bound: {result.lower_bound}")
+        if result.objective_value is None:
+            print(f"Model is {result.status}")
+            return
+        print(f"Objective value: {result.objective_value} (gap {result.gap:.2%})")
+        print_chosen(result.hyperedges)
+        print(f"\nRuntime: {toc - tic}s")
@@ -0,0 +1,53 @@
+import numpy as np
+
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Sequence
+
+if TYPE_CHECKING:
+    import gurobipy as gp
+
+
+def solution_values(m: "gp.Model", variables: "Sequence[gp.Var]") -> np.ndarray:
+    """
+    Values of the variables in the solution of a Gurobi model, read in one call.
+    """
+    return np.array(m.getAttr("X", variables))
+
+
+def chosen_indices(values: np.ndarray) -> list[int]:
+    """
+    Indices of the binary variables set in a solution.
+    """
+    return np.flatnonzero(np.asarray(values) > 0.5).tolist()
+
+
+def chosen_objects(
+    values: np.ndarray, model_object: Callable[[int], Any] | Sequence[Any]
+) -> list[Any]:
+    """
+    Decodes the connections or hyperedges chosen by a solution from the indices of their
+    variables, so the variables need no names.
+
+    -@ model_object: The object of the variable with an index, such as
+        CompactModel.connection, or the objects in the order of the variables.
+    """
+    if not callable(model_object):
+        model_object = model_object.__getitem__
+    return [model_object(i) for i in chosen_indices(values)]
+
+
+def print_chosen(chosen: Iterable[Any]):
+    """
+    Prints the chosen connections or hyperedges in a stable order.
+    """
+    print("Choosen edges:")
+    for description in sorted(str(obj) for obj in chosen):
+        print(description)
+
+
+def print_solution(objective_value: float, chosen: Iterable[Any], runtime: float):
+    """
+    Prints an optimal solution with its chosen connections or hyperedges.
+    """
+    print(f"Optimal objective value: {objective_value}")
+    print_chosen(chosen)
+    print(f"\nRuntime: {runtime}s")
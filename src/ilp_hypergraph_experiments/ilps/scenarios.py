@@ -0,0 +1,443 @@
+from ilp_hypergraph_experiments.instance import Instance, example_instance
+from ilp_hypergraph_experiments.model_objects import (
+    Connection,
+    ConnectionKey,
+    Hyperedge,
+)
+from ilp_hypergraph_experiments.compact import CompactModel
+from ilp_hypergraph_experiments.cache import canonical_connections
+from ilp_hypergraph_experiments.ilps.backends import (
+    Backend,
+    GurobiBackend,
+    OPTIMAL,
+    INFEASIBLE,
+    count_model,
+    get_backend,
+)
+from ilp_hypergraph_experiments.ilps import hypergraph
+from ilp_hypergraph_experiments.timing import PhaseTimer, phase
+import gurobipy as gp
+import numpy as np
+import scipy.sparse as sp
+import json
+import time
+
+from typing import Any, Iterable, Self
+
+# Names of the origin and destination station of a timetable trip.
+type TripNames = tuple[str, str]
+
+
+def _trip_names(instance: Instance) -> set[TripNames]:
+    return set(
+        (trip.origin.name, trip.destination.name) for trip in instance.timetable_trips
+    )
+
+
+class Scenario(object):
+    """
+    Variant of a base instance given by its changes to it.
+    A scenario can only remove what the base instance has, so its connections are a
+    subset of the ones of the base instance, up to their weights.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        remove_trips: Iterable[TripNames] = (),
+        disable_stations: Iterable[str] = (),
+        distance: dict[str, dict[str, int | None]] | None = None,
+    ):
+        """
+        -@ remove_trips: Timetable trips not serviced in the scenario.
+        -@ disable_stations: Stations left out with all their trips and connections.
+        -@ distance: Changed distances from origin to destination. None makes the
+            stations unreachable.
+        """
+        self.name: str = name
+        self.remove_trips: set[TripNames] = set(map(tuple, remove_trips))
+        self.disable_stations: set[str] = set(disable_stations)
+        self.distance: dict[str, dict[str, int | None]] = distance or {}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Self:
+        return cls(
+            data["name"],
+            remove_trips=data.get("remove_trips", ()),
+            disable_stations=data.get("disable_stations", ()),
+            distance=data.get("distance"),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "remove_trips": [list(trip) for trip in sorted(self.remove_trips)],
+            "disable_stations": sorted(self.disable_stations),
+            "distance": self.distance,
+        }
+
+    def apply(self, instance: Instance) -> Instance:
+        """
+        The scenario as instance of its own.
+        """
+        trips: set[TripNames] = _trip_names(instance)
+        for origin, destination in self.remove_trips - trips:
+            raise RuntimeError(
+                f"Scenario '{self.name}' removes the trip from '{origin}' to '{destination}', which is no timetable trip."
+            )
+        for origin, adj in self.distance.items():
+            for destination, dist in adj.items():
+                if (
+                    dist is not None
+                    and instance.get_distance(
+                        instance.get_station(origin), instance.get_station(destination)
+                    )
+                    is None
+                ):
+                    raise RuntimeError(
+                        f"Scenario '{self.name}' connects '{origin}' to '{destination}', which the base instance does not."
+                    )
+        disabled: set[str] = self.disable_stations
+
+        data: dict[str, Any] = instance.to_dict()
+        data["stations"] = [s for s in data["stations"] if s["name"] not in disabled]
+        data["timetable_trips"] = [
+            [origin, destination]
+            for origin, destination in data["timetable_trips"]
+            if (origin, destination) not in self.remove_trips
+            and origin not in disabled
+            and destination not in disabled
+        ]
+        distance: dict[str, dict[str, int | None]] = data["distance"]
+        for origin, adj in self.distance.items():
+            distance.setdefault(origin, {}).update(adj)
+        data["distance"] = dict(
+            (
+                origin,
+                dict(
+                    (destination, dist)
+                    for destination, dist in adj.items()
+                    if dist is not None and destination not in disabled
+                ),
+            )
+            for origin, adj in distance.items()
+            if origin not in disabled
+        )
+        data["connections"] = [
+            rule
+            for rule in data["connections"]
+            if rule["origin"] not in disabled
+            and rule.get("destination", rule["origin"]) not in disabled
+        ]
+        return Instance.from_dict(data)
+
+
+def load_scenarios(path: str) -> list[Scenario]:
+    """
+    Loads a JSON list of scenarios in the format of Scenario.from_dict.
+    """
+    with open(path) as f:
+        return [Scenario.from_dict(data) for data in json.load(f)]
+
+
+class ScenarioResult(object):
+    """
+    Solution of the hypergraph model of a scenario.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        status: str,
+        objective_value: float | None,
+        hyperedges: list[Hyperedge],
+    ):
+        """
+        -@ hyperedges: The chosen hyperedges with the weights of the scenario.
+        """
+        self.name: str = name
+        self.status: str = status
+        self.objective_value: float | None = objective_value
+        self.hyperedges: list[Hyperedge] = hyperedges
+
+
+# Objective, lower and upper bounds of all variables in a scenario.
+type ScenarioChanges = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class ScenarioModel(object):
+    """
+    One hypergraph model of the base instance for all scenarios.
+    The connections and hyperedges are only build once. The model has the hyperedges of
+    all scenarios: between the stations of a trip that some scenario removes, the
+    hyperedges are not bound to filter_invalid_timetable_trip.
+    A scenario changes the weights of the hyperedges, fixes the ones it does not have to
+    zero and frees the rows of its removed trips. A trip row is an equation with a slack
+    variable, which is zero for trips and unbounded below for removed trips.
+    """
+
+    def __init__(
+        self,
+        instance: Instance,
+        scenarios: Iterable[Scenario],
+        backend="gurobi",
+        verbose=False,
+        timer: PhaseTimer | None = None,
+    ):
+        """
+        -@ backend: Name of the solver backend. See backends.get_backend.
+        -@ timer: Records the time of each phase of building the model.
+        """
+        self.scenarios: list[Scenario] = list(scenarios)
+        with phase(timer, "scenario instances"):
+            self.instances: list[Instance] = [
+                scenario.apply(instance) for scenario in self.scenarios
+            ]
+        # Trips of all scenarios keep filter_invalid_timetable_trip.
+        kept_trips: set[TripNames] = _trip_names(instance).intersection(
+            *map(_trip_names, self.instances)
+        )
+        with phase(timer, "connections"):
+            connections: list[Connection] = canonical_connections(instance.connections)
+        with phase(timer, "hyperedges"):
+            hyperedges = hypergraph.iter_hyperedges_constructive(
+                instance,
+                trips=[
+                    (instance.get_station(origin), instance.get_station(destination))
+                    for origin, destination in kept_trips
+                ],
+            )
+            self.compact: CompactModel = CompactModel.from_instance(
+                instance, connections=connections, hyperedges=hyperedges
+            )
+        self.keys: list[ConnectionKey] = [con.key for con in connections]
+
+        self.solver: Backend = get_backend(backend, verbose=verbose)
+        with phase(timer, "backend model"):
+            self.variables: np.ndarray = hypergraph.configure_backend(
+                self.solver, self.compact
+            )
+            num_trips: int = len(self.compact.trips)
+            # The trip rows come first.
+            self.slack: np.ndarray = self.solver.add_variables(
+                np.zeros(num_trips),
+                names=[f"removed trip {i}" for i in range(num_trips)],
+                columns=sp.vstack(
+                    (
+                        sp.identity(num_trips),
+                        sp.csc_matrix((self.solver.num_rows - num_trips, num_trips)),
+                    )
+                ).tocsc(),
+                binary=False,
+            )
+            self.solver.set_bounds(self.slack, np.zeros(num_trips), np.zeros(num_trips))
+        count_model(timer, self.solver)
+        with phase(timer, "scenario changes"):
+            self.changes: list[ScenarioChanges] = [
+                self._changes(scenario_instance) for scenario_instance in self.instances
+            ]
+
+    def _changes(self, instance: Instance) -> ScenarioChanges:
+        compact: CompactModel = self.compact
+        cons: np.ndarray = compact.connections
+        owner: np.ndarray = compact.hyperedge_owner
+        arces: np.ndarray = compact.hyperedge_arces
+
+        weight_of: dict[ConnectionKey, int] = dict(
+            (con.key, con.weight) for con in instance.connections
+        )
+        weights = np.array([weight_of.get(key, -1) for key in self.keys])
+        missing: np.ndarray = weights < 0
+        # Connections between the stations of a trip of the scenario changing their
+        # arrangement, which filter_invalid_timetable_trip forbids.
+        trips: set[TripNames] = _trip_names(instance)
+        names: list[str] = [station.name for station in compact.stations]
+        on_trip = np.array(
+            [
+                (names[origin], names[destination]) in trips
+                for origin, destination in zip(
+                    cons["origin"].tolist(), cons["destination"].tolist()
+                )
+            ],
+            dtype=np.bool_,
+        )
+        breaks_trip = on_trip & (
+            cons["arrangement_origin"] != cons["arrangement_destination"]
+        )
+
+        def any_arc(per_connection: np.ndarray) -> np.ndarray:
+            return (
+                np.bincount(
+                    owner,
+                    weights=per_connection[arces],
+                    minlength=compact.num_hyperedges,
+                )
+                > 0
+            )
+
+        invalid = any_arc(missing) | (any_arc(breaks_trip) & ~compact.hyperedge_inside)
+
+        n: int = self.solver.num_variables
+        objective = np.zeros(n)
+        objective[self.variables] = np.bincount(
+            owner,
+            weights=np.where(missing, 0, weights)[arces],
+            minlength=compact.num_hyperedges,
+        )
+        lower = np.zeros(n)
+        upper = np.ones(n)
+        upper[self.variables[invalid]] = 0
+        removed = np.array(
+            [
+                (names[origin], names[destination]) not in trips
+                for origin, destination in compact.trips.tolist()
+            ],
+            dtype=np.bool_,
+        )
+        # sum + slack == 1 with slack <= 1 unbounded below is sum >= 0.
+        lower[self.slack[removed]] = -np.inf
+        upper[self.slack] = removed
+        return objective, lower, upper
+
+    def _result(
+        self, i: int, status: str, objective_value: float, values: np.ndarray | None
+    ) -> ScenarioResult:
+        scenario: Scenario = self.scenarios[i]
+        if status != OPTIMAL:
+            return ScenarioResult(scenario.name, status, None, [])
+        by_key: dict[ConnectionKey, Connection] = dict(
+            (con.key, con) for con in self.instances[i].connections
+        )
+        chosen = np.flatnonzero(values[self.variables] > 0.5).tolist()
+        return ScenarioResult(
+            scenario.name,
+            status,
+            objective_value,
+            [
+                Hyperedge(
+                    *(
+                        by_key[self.keys[arc]]
+                        for arc in self.compact.hyperedge_arces_of(h).tolist()
+                    ),
+                    inside=bool(self.compact.hyperedge_inside[h]),
+                )
+                for h in chosen
+            ],
+        )
+
+    def solve(self, time_limit: float | None = None) -> list[ScenarioResult]:
+        """
+        Solves the scenarios one after another by changing the objective and bounds of
+        the model in place.
+
+        -@ time_limit: Time limit per scenario.
+        """
+        results: list[ScenarioResult] = []
+        indices = np.arange(self.solver.num_variables)
+        for i, (objective, lower, upper) in enumerate(self.changes):
+            self.solver.set_objective(objective)
+            self.solver.set_bounds(indices, lower, upper)
+            status = self.solver.solve(time_limit)
+            results.append(
+                self._result(
+                    i,
+                    status,
+                    self.solver.objective_value if status == OPTIMAL else None,
+                    self.solver.values() if status == OPTIMAL else None,
+                )
+            )
+        return results
+
+    def solve_multi_scenario(
+        self, time_limit: float | None = None
+    ) -> list[ScenarioResult]:
+        """
+        Solves all scenarios at once with the multi-scenario optimization of Gurobi.
+
+        -@ time_limit: Time limit of all scenarios together.
+        """
+        if not isinstance(self.solver, GurobiBackend):
+            raise RuntimeError("Solving multiple scenarios at once needs Gurobi.")
+        m: gp.Model = self.solver.model
+        variables: list[gp.Var] = self.solver.variables
+        m.NumScenarios = len(self.changes)
+        for i, (objective, lower, upper) in enumerate(self.changes):
+            m.Params.ScenarioNumber = i
+            m.setAttr("ScenNObj", variables, objective.tolist())
+            m.setAttr("ScenNLB", variables, lower.tolist())
+            m.setAttr("ScenNUB", variables, upper.tolist())
+        status = self.solver.solve(time_limit)
+
+        results: list[ScenarioResult] = []
+        for i in range(len(self.changes)):
+            m.Params.ScenarioNumber = i
+            objective_value: float = m.ScenNObjVal
+            if objective_value >= gp.GRB.INFINITY:
+                results.append(self._result(i, INFEASIBLE, objective_value, None))
+                continue
+            results.append(
+                self._result(
+                    i, status, objective_value, np.array(m.getAttr("ScenNX", variables))
+                )
+            )
+        return results
+
+    def close(self):
+        self.solver.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def solve_scenarios(
+    scenarios: Iterable[Scenario],
+    instance: Instance | None = None,
+    backend="gurobi",
+    multi_scenario=False,
+    time_limit: float | None = None,
+    verbose=False,
+    timer: PhaseTimer | None = None,
+) -> list[ScenarioResult]:
+    """
+    Solves the hypergraph model of each scenario of the base instance with one shared
+    model. See ScenarioModel.
+
+    -@ multi_scenario: Solve all scenarios at once with Gurobi instead of one after
+        another.
+    -@ timer: Records the time of each phase.
+    """
+    instance = instance or example_instance()
+    with ScenarioModel(instance, scenarios, backend, verbose, timer) as model:
+        with phase(timer, "optimize"):
+            if multi_scenario:
+                return model.solve_multi_scenario(time_limit)
+            return model.solve(time_limit)
+
+
+def run_scenarios(
+    scenarios: Iterable[Scenario],
+    verbose=False,
+    instance: Instance | None = None,
+    backend="gurobi",
+    multi_scenario=False,
+):
+    """
+    Solves the scenarios and prints the objective value of each.
+    """
+    tic = time.perf_counter()
+    results = solve_scenarios(
+        scenarios, instance, backend=backend, multi_scenario=multi_scenario
+    )
+    toc = time.perf_counter()
+    if verbose:
+        for result in results:
+            if result.objective_value is None:
+                print(f"Scenario '{result.name}': model is {result.status}")
+            else:
+                print(
+                    f"Scenario '{result.name}': objective value {result.objective_value} with {len(result.hyperedges)} hyperedges"
+                )
+        print(f"\nRuntime: {toc - tic}s")
@@ -0,0 +1,297 @@
+from ilp_hypergraph_experiments.model_objects import (
+    TrainStation,
+    TrainArrangment,
+    Connection,
+    ConnectionKey,
+    TimeTableTrip,
+    get_train_arrangements,
+)
+from ilp_hypergraph_experiments.settings import train_types, max_train_len_global
+from functools import cache, cached_property
+import json
+import os
+import tomllib
+
+from typing import Any, Iterable, Self
+
+# The instance of the seminar with the five stations A to E.
+example_instance_path: str = os.path.join(
+    os.path.dirname(__file__), "instances", "example.json"
+)
+
+# Kinds of connection rules and the station method generating their connections.
+connection_kinds: dict[str, str] = {
+    "direct": "get_connections",
+    "turnaround": "get_connections_turnaround",
+    "deadhead": "get_connections_deadhead_trip",
+}
+
+
+def _arrangement(arrangement: Iterable) -> TrainArrangment:
+    t, o, p = arrangement
+    return (int(t), bool(o), int(p))
+
+
+class Instance(object):
+    """
+    A rolling stock scheduling instance.
+    Holds the stations, the distances between them, the timetable trips, the rules
+    describing the connections and the settings of the model.
+    The connections are only build when they are first used.
+    """
+
+    def __init__(
+        self,
+        stations: Iterable[TrainStation],
+        timetable_trips: Iterable[TimeTableTrip],
+        distance: dict[TrainStation, dict[TrainStation, int | None]],
+        connection_rules: Iterable[dict[str, Any]] = (),
+        deadhead_extra_weight: int | None = None,
+        train_types: int = train_types,
+        max_train_len_global: int = max_train_len_global,
+    ):
+        """
+        -@ distance: Distance from origin to destination. Missing pairs are unreachable.
+        -@ connection_rules: Connections inside or between stations. See connection_kinds.
+        -@ deadhead_extra_weight: Connect all reachable stations by deadhead trips with
+            their distance plus this weight. None adds no such deadhead trips.
+        """
+        self.stations: tuple[TrainStation, ...] = tuple(stations)
+        self.timetable_trips: tuple[TimeTableTrip, ...] = tuple(timetable_trips)
+        self.distance: dict[TrainStation, dict[TrainStation, int | None]] = distance
+        self.connection_rules: tuple[dict[str, Any], ...] = tuple(connection_rules)
+        self.deadhead_extra_weight: int | None = deadhead_extra_weight
+        self.train_types: int = train_types
+        self.max_train_len_global: int = max_train_len_global
+
+        names: list[str] = sorted(map(lambda s: s.name, self.stations))
+        for i in range(len(names) - 1):
+            if names[i] == names[i + 1]:
+                raise RuntimeError(
+                    f"Got two trainstations with the same name '{names[i]}'."
+                )
+        for rule in self.connection_rules:
+            if rule.get("kind") not in connection_kinds:
+                raise RuntimeError(
+                    f"Unknown kind of connection '{rule.get('kind')}'. Use one of {', '.join(connection_kinds)}."
+                )
+
+    def get_station(self, name: str) -> TrainStation:
+        """
+        Helperfunction to simply search for a train station by name.
+        """
+        for station in self.stations:
+            if station.name == name:
+                return station
+        raise RuntimeError(f"Can't find station with name '{name}'.")
+
+    def get_distance(
+        self, stationA: TrainStation, stationB: TrainStation
+    ) -> int | None:
+        adj: dict[TrainStation, int] = self.distance.get(stationA)
+        if adj:
+            return adj.get(stationB)
+        else:
+            return None
+
+    def get_distance_trip(self, trip: TimeTableTrip) -> int | None:
+        return self.get_distance(trip.origin, trip.destination)
+
+    def _rule_connections(self, rule: dict[str, Any]) -> list[Connection]:
+        origin: TrainStation = self.get_station(rule["origin"])
+        destination: TrainStation = self.get_station(
+            rule.get("destination", rule["origin"])
+        )
+        kwargs: dict[str, Any] = {"inside": rule.get("inside", False)}
+        if rule["kind"] != "deadhead":
+            kwargs["preserve_position"] = rule.get("preserve_position", True)
+        return getattr(origin, connection_kinds[rule["kind"]])(
+            destination, rule["weight"], **kwargs
+        )
+
+    @cached_property
+    def connections(self) -> set[Connection]:
+        """
+        All connections of the instance.
+        Each timetable trip needs at least one connection between two stations.
+        Of connections with the same key only the one of minimal weight is kept.
+        """
+        # Connections with equal keys are the same arc, of which the cheapest is kept
+        # independent of the order of the rules.
+        connections: dict[ConnectionKey, Connection] = {}
+
+        def add(new: Iterable[Connection]):
+            for con in new:
+                known = connections.get(con.key)
+                if known is None or con.weight < known.weight:
+                    connections[con.key] = con
+
+        # Adds timetable trip turns
+        for trip in self.timetable_trips:
+            dist = self.get_distance_trip(trip)
+            if dist:
+                add(trip.get_all_connections(dist))
+
+        # Add all other connections between stations themself.
+        for rule in self.connection_rules:
+            add(self._rule_connections(rule))
+
+        # The connections between all other staions are modelled by deadhead trips with extra distance, if the stations are connected.
+        if self.deadhead_extra_weight is not None:
+            for origin in self.stations:
+                for dest in self.stations:
+                    if origin == dest:
+                        continue
+                    dist = self.get_distance(origin, dest)
+                    if dist is None:
+                        continue
+                    add(
+                        origin.get_connections_deadhead_trip(
+                            dest, weight=dist + self.deadhead_extra_weight
+                        )
+                    )
+        return set(connections.values())
+
+    def validate(self):
+        """
+        Test if the instance is configured right.
+        """
+        # Test if all timetable trips are connected by a Connection
+        for trip in self.timetable_trips:
+            stationA: TrainStation = trip.origin
+            stationB: TrainStation = trip.destination
+
+            trip_serviced: bool = False
+            for connection in self.connections:
+                if (
+                    connection.origin == stationA
+                    and connection.destination == stationB
+                    and connection.arrangement_origin in stationA.allowed_arrangements
+                    and connection.arrangement_destination
+                    in stationB.allowed_arrangements
+                ):
+                    trip_serviced = True
+                    break
+            if not trip_serviced:
+                raise RuntimeError(
+                    f"The timetable trip from '{stationA.name}' to '{stationB.name}' can't be serviced since they are not connection or no suitable train can be run between them two."
+                )
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Self:
+        settings: dict[str, int] = data.get("settings", {})
+        types: int = settings.get("train_types", train_types)
+        max_len: int = settings.get("max_train_len_global", max_train_len_global)
+        arrangements = get_train_arrangements(types, max_len)
+
+        stations: list[TrainStation] = []
+        for spec in data["stations"]:
+            possible = spec.get("possible_arrangements")
+            disallow = spec.get("disallow_arrangements")
+            stations.append(
+                TrainStation(
+                    spec["name"],
+                    max_train_len_station=spec.get("max_train_len", 1),
+                    possible_arrangements=(
+                        [_arrangement(arr) for arr in possible] if possible else None
+                    ),
+                    disallow_arrangements=(
+                        [_arrangement(arr) for arr in disallow] if disallow else None
+                    ),
+                    arrangements=arrangements,
+                    max_train_len_limit=max_len,
+                )
+            )
+        by_name: dict[str, TrainStation] = dict((s.name, s) for s in stations)
+
+        def station(name: str) -> TrainStation:
+            if name not in by_name:
+                raise RuntimeError(f"Can't find station with name '{name}'.")
+            return by_name[name]
+
+        trips: list[TimeTableTrip] = [
+            TimeTableTrip(station(origin), station(destination))
+            for origin, destination in data.get("timetable_trips", [])
+        ]
+        distance: dict[TrainStation, dict[TrainStation, int | None]] = dict(
+            (
+                station(origin),
+                dict((station(dest), dist) for dest, dist in adj.items()),
+            )
+            for origin, adj in data.get("distance", {}).items()
+        )
+        return cls(
+            stations,
+            trips,
+            distance,
+            connection_rules=data.get("connections", []),
+            deadhead_extra_weight=data.get("deadhead_extra_weight"),
+            train_types=types,
+            max_train_len_global=max_len,
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        all_arrangements = get_train_arrangements(
+            self.train_types, self.max_train_len_global
+        )
+        stations: list[dict[str, Any]] = []
+        for station in self.stations:
+            spec: dict[str, Any] = {
+                "name": station.name,
+                "max_train_len": station.max_train_len,
+            }
+            if station.allowed_arrangements != all_arrangements:
+                spec["possible_arrangements"] = [
+                    list(arr) for arr in sorted(station.allowed_arrangements)
+                ]
+            stations.append(spec)
+        return {
+            "settings": {
+                "train_types": self.train_types,
+                "max_train_len_global": self.max_train_len_global,
+            },
+            "stations": stations,
+            "timetable_trips": [
+                [trip.origin.name, trip.destination.name]
+                for trip in self.timetable_trips
+            ],
+            "distance": dict(
+                (
+                    origin.name,
+                    dict(
+                        (dest.name, dist)
+                        for dest, dist in adj.items()
+                        if dist is not None
+                    ),
+                )
+                for origin, adj in self.distance.items()
+            ),
+            "connections": [dict(rule) for rule in self.connection_rules],
+            "deadhead_extra_weight": self.deadhead_extra_weight,
+        }
+
+    @classmethod
+    def load(cls, path: str) -> Self:
+        """
+        Loads an instance from a JSON or TOML file.
+        """
+        if path.endswith(".toml"):
+            with open(path, "rb") as f:
+                return cls.from_dict(tomllib.load(f))
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path: str):
+        """
+        Saves the instance as JSON.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+@cache
+def example_instance() -> Instance:
+    """
+    The example instance, loaded on first use.
+    """
+    return Instance.load(example_instance_path)
@@ -6,14 +6,29 @@ from ilp_hypergraph_experiments.settings import train_types, max_train_len_globa
 # Contains (train_type, train_orientation, train_position)
 type TrainArrangment = tuple[int, bool, int]
 
-train_arrangements: FrozenSet[TrainArrangment] = frozenset(
-    (
-        (t, o, p)
-        for t in range(train_types)
-        for o in (True, False)
-        for p in range(max_train_len_global)
+# (origin name, destination name, origin arrangement, destination arrangement, inside)
+type ConnectionKey = tuple[str, str, TrainArrangment, TrainArrangment, bool]
+# (sorted keys of the arces, inside)
+type HyperedgeKey = tuple[tuple[ConnectionKey, ...], bool]
+
+
+def get_train_arrangements(
+    types: int = train_types, max_train_len: int = max_train_len_global
+) -> FrozenSet[TrainArrangment]:
+    """
+    All arrangements of the given number of train types and maximal train length.
+    """
+    return frozenset(
+        (
+            (t, o, p)
+            for t in range(types)
+            for o in (True, False)
+            for p in range(max_train_len)
+        )
     )
-)
+
+
+train_arrangements: FrozenSet[TrainArrangment] = get_train_arrangements()
 
 
 class TrainStation(object):
@@ -23,15 +38,21 @@ class TrainStation(object):
         max_train_len_station: int = 1,
         possible_arrangements: Iterable[TrainArrangment] | None = None,
         disallow_arrangements: Iterable[TrainArrangment] | None = None,
+        arrangements: Iterable[TrainArrangment] = train_arrangements,
+        max_train_len_limit: int = max_train_len_global,
     ):
+        """
+        -@ arrangements: All arrangements of the model.
+        -@ max_train_len_limit: The maximum length of a train in the model.
+        """
         self.name: str = name
-        if max_train_len_station > max_train_len_global:
+        if max_train_len_station > max_train_len_limit:
             raise RuntimeError(
-                f"The maximum length the station '{max_train_len_station}' can supports exceeds the maximum allowed train lenght of {max_train_len_global}."
+                f"The maximum length the station '{max_train_len_station}' can supports exceeds the maximum allowed train lenght of {max_train_len_limit}."
             )
         self.max_train_len: Final[int] = max_train_len_station
 
-        self.allowed_arrangements: set[TrainArrangment] = set(train_arrangements)
+        self.allowed_arrangements: set[TrainArrangment] = set(arrangements)
         if possible_arrangements:
             self.allowed_arrangements: set[TrainArrangment] = set(possible_arrangements)
         elif disallow_arrangements:
@@ -142,6 +163,18 @@ class Connection(object):
     Describes a connection between two stations outside of a timetable trip.
     """
 
+    __slots__ = (
+        "origin",
+        "destination",
+        "weight",
+        "arrangement_origin",
+        "arrangement_destination",
+        "inside",
+        "origin_node",
+        "destination_node",
+        "key",
+    )
+
     def __init__(
         self,
         origin: TrainStation,
@@ -161,10 +194,35 @@ class Connection(object):
             raise RuntimeError(
                 f"The connection between station {self.origin} and {self.destination} can't be a connection inside a trainstation."
             )
+        # The nodes of the connection, shared by all hyperedges containing it.
+        self.origin_node: tuple[TrainStation, TrainArrangment] = (
+            self.origin,
+            self.arrangement_origin,
+        )
+        self.destination_node: tuple[TrainStation, TrainArrangment] = (
+            self.destination,
+            self.arrangement_destination,
+        )
+        # Canonical key identifying the connection. The weight is not part of it.
+        self.key: ConnectionKey = (
+            self.origin.name,
+            self.destination.name,
+            tuple(self.arrangement_origin),
+            tuple(self.arrangement_destination),
+            self.inside,
+        )
 
     def __str__(self):
         return f"{self.origin.name} -> {self.destination.name} with {self.arrangement_origin} --{self.weight}--> {self.arrangement_destination}"
 
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Connection):
+            return NotImplemented
+        return self.key == other.key
+
 
 class TimeTableTrip(object):
     """
@@ -186,33 +244,57 @@ class TimeTableTrip(object):
 class Hyperedge(object):
     """
     Hyperedge between trainstations.
+    A hyperedge never maps from multiple stations to multiple stations, so it has an arc
+    between every origin and every destination station. The queries below are therefore
+    lookups in the origin and destination nodes and stations computed once.
     """
 
+    __slots__ = (
+        "arces",
+        "weight",
+        "inside",
+        "origins",
+        "destinations",
+        "origin_arces",
+        "destination_arces",
+        "key",
+    )
+
     def __init__(self, *connections: Connection, inside: bool = False):
-        self.arces: set[Connection] = set(con for con in connections if con is not None)
+        self.arces: frozenset[Connection] = frozenset(
+            con for con in connections if con is not None
+        )
         self.weight: int = sum((arc.weight for arc in self.arces))
         self.inside: bool = inside
         if all(con.inside for con in self.arces):
             self.inside: bool = True
-        self.origins: set[tuple[TrainStation, TrainArrangment]] = set(
-            ((arc.origin, arc.arrangement_origin) for arc in self.arces)
+        self.origins: frozenset[tuple[TrainStation, TrainArrangment]] = frozenset(
+            arc.origin_node for arc in self.arces
         )
-        self.destinations: set[tuple[TrainStation, TrainArrangment]] = set(
-            ((arc.destination, arc.arrangement_destination) for arc in self.arces)
+        self.destinations: frozenset[tuple[TrainStation, TrainArrangment]] = frozenset(
+            arc.destination_node for arc in self.arces
         )
-        self.origin_arces: dict[TrainStation, list[Connection]] = {}
-        self.destination_arces: dict[TrainStation, list[Connection]] = {}
+        origin_arces: dict[TrainStation, list[Connection]] = {}
+        destination_arces: dict[TrainStation, list[Connection]] = {}
         for arc in self.arces:
-            self.origin_arces.setdefault(arc.origin, [])
-            self.origin_arces[arc.origin].append(arc)
-            self.destination_arces.setdefault(arc.destination, [])
-            self.destination_arces[arc.destination].append(arc)
-        num_origins: int = len(set(s for (s, _) in self.origins))
-        num_destinations: int = len(set(s for (s, _) in self.destinations))
-        if num_origins > 1 and num_destinations > 1:
+            origin_arces.setdefault(arc.origin, []).append(arc)
+            destination_arces.setdefault(arc.destination, []).append(arc)
+        # The arces of each origin and destination station, its keys are the stations.
+        self.origin_arces: dict[TrainStation, tuple[Connection, ...]] = dict(
+            (station, tuple(arces)) for station, arces in origin_arces.items()
+        )
+        self.destination_arces: dict[TrainStation, tuple[Connection, ...]] = dict(
+            (station, tuple(arces)) for station, arces in destination_arces.items()
+        )
+        if len(self.origin_arces) > 1 and len(self.destination_arces) > 1:
             raise RuntimeError(
                 "Hypheredges can not map from multiple stations to multiple stations."
             )
+        # Canonical key identifying the hyperedge by its sorted arc keys.
+        self.key: HyperedgeKey = (
+            tuple(sorted(arc.key for arc in self.arces)),
+            self.inside,
+        )
 
     def __str__(self):
         res = f"Hyperedge of weight {self.weight}:"
@@ -220,11 +302,16 @@ class Hyperedge(object):
             res += "\n " + str(arc)
         return res
 
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Hyperedge):
+            return NotImplemented
+        return self.key == other.key
+
     def has_arc_from_to(self, origin: TrainStation, destination: TrainStation) -> bool:
-        for arc in self.arces:
-            if arc.origin == origin and arc.destination == destination:
-                return True
-        return False
+        return origin in self.origin_arces and destination in self.destination_arces
 
     def has_arc_from_to_arr(
         self,
@@ -233,10 +320,15 @@ class Hyperedge(object):
         destination: TrainStation,
         destination_arrangement: TrainArrangment,
     ) -> bool:
-        for arc in self.arces:
+        if (origin, origin_arrangement) not in self.origins or (
+            destination,
+            destination_arrangement,
+        ) not in self.destinations:
+            return False
+        # Both nodes are in the hyperedge, but maybe on different arces.
+        for arc in self.origin_arces[origin]:
             if (
-                arc.origin == origin
-                and arc.arrangement_origin == origin_arrangement
+                arc.arrangement_origin == origin_arrangement
                 and arc.destination == destination
                 and arc.arrangement_destination == destination_arrangement
             ):
@@ -246,33 +338,18 @@ class Hyperedge(object):
     def contains_destination_node(
         self, station: TrainStation, arrangement: TrainArrangment
     ) -> bool:
-        for arc in self.arces:
-            if (
-                arc.destination == station
-                and arc.arrangement_destination == arrangement
-            ):
-                return True
-        return False
+        return (station, arrangement) in self.destinations
 
     def contains_origin_node(
         self, station: TrainStation, arrangement: TrainArrangment
     ) -> bool:
-        for arc in self.arces:
-            if arc.origin == station and arc.arrangement_origin == arrangement:
-                return True
-        return False
+        return (station, arrangement) in self.origins
 
     def runs_to_station(self, station: TrainStation) -> bool:
-        for arc in self.arces:
-            if arc.destination == station:
-                return True
-        return False
+        return station in self.destination_arces
 
     def comes_from_station(self, station: TrainStation) -> bool:
-        for arc in self.arces:
-            if arc.origin == station:
-                return True
-        return False
+        return station in self.origin_arces
 
 
 if __name__ == "__main__":
@@ -0,0 +1,245 @@
+from ilp_hypergraph_experiments.instance import Instance, example_instance
+from ilp_hypergraph_experiments.compact import CompactModel
+from ilp_hypergraph_experiments.ilps import graph, hypergraph
+from ilp_hypergraph_experiments.ilps.backends import (
+    Backend,
+    GurobiBackend,
+    HighsBackend,
+    OPTIMAL,
+    get_backend,
+)
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import gurobipy as gp
+import argparse
+import json
+import os
+import time
+
+from typing import Any, Iterable
+
+# A job: (instance name, path of the instance or None for the example, model, repetition)
+type Job = tuple[str, str | None, str, int]
+
+# Models a job can solve.
+runner_models: tuple[str, ...] = ("graph", "hypergraph")
+
+# Solver environment of a worker process, shared by all its jobs.
+_env: gp.Env | None = None
+_backend: str = "gurobi"
+_threads: int = 1
+_use_cache: bool = False
+
+
+def collect_instances(paths: Iterable[str]) -> list[tuple[str, str]]:
+    """
+    Instance files given directly or as directories of JSON and TOML files.
+    Returns pairs of the name and the path of each instance.
+    """
+    instances: list[tuple[str, str]] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files: list[str] = sorted(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.endswith((".json", ".toml"))
+            )
+        else:
+            files = [path]
+        instances.extend((os.path.basename(f), f) for f in files)
+    return instances
+
+
+def thread_budget(
+    num_jobs: int,
+    cores: int | None = None,
+    workers: int | None = None,
+    threads: int | None = None,
+) -> tuple[int, int]:
+    """
+    Divides the cores between concurrent jobs and the threads of the solver of a job.
+    Returns the number of worker processes and the threads per worker.
+
+    -@ num_jobs: Number of jobs to run. There are never more workers than jobs.
+    -@ cores: Cores to use. Per default all of the machine.
+    -@ workers: Worker processes. Per default as many as the threads allow.
+    -@ threads: Threads per worker. Per default the cores divided by the workers, so
+        without either the cores are spread over as many concurrent jobs as possible.
+    """
+    cores = cores or os.cpu_count() or 1
+    if workers is None:
+        workers = cores if threads is None else cores // threads
+        workers = max(1, min(num_jobs, workers))
+    if threads is None:
+        threads = max(1, cores // workers)
+    return workers, threads
+
+
+def _init_worker(backend: str, threads: int, use_cache: bool):
+    global _env, _backend, _threads, _use_cache
+    _backend = backend
+    _threads = threads
+    _use_cache = use_cache
+    if backend == "gurobi":
+        _env = gp.Env(empty=True)
+        _env.setParam("OutputFlag", 0)
+        _env.setParam("Threads", threads)
+        _env.start()
+
+
+def _worker_backend() -> Backend:
+    if _env is not None:
+        return GurobiBackend(env=_env)
+    if _backend == "highs":
+        return HighsBackend(threads=_threads)
+    return get_backend(_backend)
+
+
+def solve_job(job: Job) -> dict[str, Any]:
+    """
+    Builds and solves the model of a job with the solver environment of the worker.
+    Returns the result as dict.
+    """
+    name, path, model, repetition = job
+    instance = Instance.load(path) if path else example_instance()
+    tic = time.perf_counter()
+    with _worker_backend() as solver:
+        if model == "graph":
+            compact = CompactModel.from_instance(instance)
+            graph.configure_backend(solver, compact)
+        else:
+            hyperedges = hypergraph.prune_dominated(
+                hypergraph.get_filtered_hyperedges(instance, use_cache=_use_cache)
+            )
+            compact = CompactModel.from_instance(instance, hyperedges=hyperedges)
+            hypergraph.configure_backend(solver, compact)
+        toc = time.perf_counter()
+        status = solver.solve()
+        solved = time.perf_counter()
+        return {
+            "instance": name,
+            "model": model,
+            "repetition": repetition,
+            "status": status,
+            "objective_value": solver.objective_value if status == OPTIMAL else None,
+            "variables": solver.num_variables,
+            "constraints": solver.num_rows,
+            "build_time": toc - tic,
+            "solve_time": solved - toc,
+            "backend": solver.name,
+            "threads": _threads,
+            "worker": os.getpid(),
+        }
+
+
+def run_jobs(
+    jobs: list[Job],
+    output: str | None = None,
+    backend="gurobi",
+    workers: int | None = None,
+    threads: int | None = None,
+    verbose=False,
+    use_cache=False,
+) -> list[dict[str, Any]]:
+    """
+    Solves the jobs in a pool of worker processes. Each worker starts one solver
+    environment with its share of the threads and solves one job after another.
+    Results are returned in the order they finish.
+
+    -@ output: JSON lines file the results are appended to as soon as they finish, so
+        several runs can share it.
+    -@ workers, threads: See thread_budget.
+    -@ use_cache: Load the hyperedges from the disk cache shared by all workers and
+        store them there. See get_filtered_hyperedges.
+    """
+    num_workers, num_threads = thread_budget(
+        len(jobs), workers=workers, threads=threads
+    )
+    if verbose:
+        print(
+            f"Solving {len(jobs)} jobs with {num_workers} workers of {num_threads} threads"
+        )
+    results: list[dict[str, Any]] = []
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_worker,
+        initargs=(backend, num_threads, use_cache),
+    ) as executor:
+        futures = [executor.submit(solve_job, job) for job in jobs]
+        out = open(output, "a") if output else None
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if out is not None:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                if verbose:
+                    print(
+                        f"{result['model']:<11} {result['instance']:<28} {result['status']:<10} {result['objective_value']} in {result['build_time'] + result['solve_time']:.2f}s"
+                    )
+        finally:
+            if out is not None:
+                out.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Solve the models of many instances concurrently in worker processes."
+    )
+    parser.add_argument(
+        "instances",
+        nargs="*",
+        help="JSON or TOML files of instances or directories of them. Per default the example instance.",
+    )
+    parser.add_argument(
+        "--models", nargs="+", choices=runner_models, default=list(runner_models)
+    )
+    parser.add_argument("-n", type=int, default=1, help="Repetitions of each job.")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Concurrent worker processes."
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Solver threads per worker. Per default the cores are divided between the workers.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["gurobi", "highs"],
+        default="gurobi",
+        help="Solver of the models.",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Load the hyperedges from the disk cache and store them there.",
+    )
+    parser.add_argument(
+        "-o", "--output", help="Append the results to this JSON lines file."
+    )
+    args = parser.parse_args()
+
+    instances: list[tuple[str, str | None]] = collect_instances(args.instances)
+    if not instances:
+        instances.append(("example", None))
+    jobs: list[Job] = [
+        (name, path, model, repetition)
+        for name, path in instances
+        for model in args.models
+        for repetition in range(args.n)
+    ]
+    run_jobs(
+        jobs,
+        output=args.output,
+        backend=args.backend,
+        workers=args.workers,
+        threads=args.threads,
+        verbose=True,
+        use_cache=args.cache,
+    )
+
+
+if __name__ == "__main__":
+    main()
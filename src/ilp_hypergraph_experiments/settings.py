@@ -5,3 +5,7 @@ train_types: Final[int] = 2
 
 # Give a maximum length a train can have in the model
 max_train_len_global: Final[int] = 3
+
+# How the variables of a model are named: after the connection or hyperedge they stand
+# for, by their index or not at all. The names of hyperedges list all their arces.
+variable_namings: Final[tuple[str, ...]] = ("objects", "index", "none")
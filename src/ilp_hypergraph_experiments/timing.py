@@ -0,0 +1,143 @@
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+from typing import Any, ContextManager, Iterator
+
+
+class Tracer(object):
+    """
+    Records spans and counters of a run and writes them as Chrome trace, which can be
+    opened in chrome://tracing or https://ui.perfetto.dev.
+    A span has its wall time, CPU time and, if memory is traced, the peak memory
+    allocated while it ran. Tracing memory slows down allocations noticeably.
+    """
+
+    def __init__(self, memory=False):
+        """
+        -@ memory: Trace the peak memory of spans with tracemalloc.
+        """
+        self.events: list[dict[str, Any]] = []
+        self.memory: bool = memory
+        self._start: float = time.perf_counter()
+        # Last value of each counter.
+        self.counters: dict[str, float] = {}
+        # Peak memory of the running spans, innermost last.
+        self._peaks: list[int] = []
+        self._stop_tracemalloc: bool = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._stop_tracemalloc = True
+
+    def _now(self) -> float:
+        # Microseconds since the start of the tracer, the unit of Chrome traces.
+        return (time.perf_counter() - self._start) * 1e6
+
+    def _event(self, name: str, ph: str, ts: float, **fields) -> dict[str, Any]:
+        return dict(
+            name=name,
+            ph=ph,
+            ts=ts,
+            pid=os.getpid(),
+            tid=threading.get_ident(),
+            **fields,
+        )
+
+    @contextmanager
+    def span(self, name: str, category: str = "phase") -> Iterator[None]:
+        if self.memory:
+            self._peaks.append(0)
+            tracemalloc.reset_peak()
+        cpu = time.process_time()
+        ts = self._now()
+        try:
+            yield
+        finally:
+            dur = self._now() - ts
+            args: dict[str, float] = {"cpu_ms": (time.process_time() - cpu) * 1e3}
+            if self.memory:
+                # reset_peak of a nested span forgets the peak before it, which the
+                # nested span passes on instead.
+                peak = max(tracemalloc.get_traced_memory()[1], self._peaks.pop())
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                args["peak_bytes"] = peak
+            self.events.append(
+                self._event(name, "X", ts, dur=dur, cat=category, args=args)
+            )
+
+    def count(self, name: str, value: float):
+        """
+        Sets the counter name to value.
+        """
+        self.counters[name] = value
+        self.events.append(self._event(name, "C", self._now(), args={name: value}))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {"counters": self.counters},
+        }
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    def close(self):
+        if self._stop_tracemalloc:
+            tracemalloc.stop()
+            self._stop_tracemalloc = False
+
+
+class PhaseTimer(object):
+    """
+    Accumulates the wall time of named phases in the order they first ran and the
+    values of counters. A tracer additionally records each phase as span and each
+    change of a counter.
+    """
+
+    def __init__(self, tracer: Tracer | None = None):
+        self.times: dict[str, float] = {}
+        self.counts: dict[str, float] = {}
+        self.tracer: Tracer | None = tracer
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        with self.tracer.span(name) if self.tracer is not None else nullcontext():
+            tic = time.perf_counter()
+            try:
+                yield
+            finally:
+                toc = time.perf_counter()
+                self.times[name] = self.times.get(name, 0.0) + toc - tic
+
+    def count(self, name: str, value: float):
+        self.counts[name] = self.counts.get(name, 0) + value
+        if self.tracer is not None:
+            self.tracer.count(name, self.counts[name])
+
+
+def phase(timer: PhaseTimer | None, name: str) -> ContextManager:
+    """
+    Times the phase if a timer is given.
+    """
+    return timer.phase(name) if timer is not None else nullcontext()
+
+
+def count(timer: PhaseTimer | None, name: str, value: float):
+    """
+    Adds value to the counter name if a timer is given.
+    """
+    if timer is not None:
+        timer.count(name, value)
+
+
+def span(tracer: Tracer | None, name: str) -> ContextManager:
+    """
+    Traces the span if a tracer is given.
+    """
+    return tracer.span(name) if tracer is not None else nullcontext()